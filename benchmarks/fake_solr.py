@@ -0,0 +1,186 @@
+"""
+A stand-in for Solr that replays recorded responses, so that the server can be
+benchmarked without a Solr index or a network. Each request is identified by its method,
+its path below the core, its query string and its body (with the keys of a JSON body
+sorted), and the response recorded for it is kept in a JSON file in the fixtures
+directory, named by a hash of these.
+
+No fixtures are kept in the repository, since they depend on the index they are
+recorded from, so they must be recorded before the first run, by passing the requests
+through to a real Solr core:
+
+    python -m benchmarks.fake_solr --fixtures benchmarks/fixtures \\
+        --record http://localhost:8983/solr/muscatplus_live
+
+and then replayed, by pointing the server at the stand-in:
+
+    python -m benchmarks.fake_solr --fixtures benchmarks/fixtures --port 8984
+    MP_SOLR_SERVER=http://localhost:8984/solr/muscatplus_live sanic search_server.server:app
+
+A request with no recorded response gets a 404, and is logged, so that missing fixtures
+are easy to find.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+import orjson
+from aiohttp import web
+
+log = logging.getLogger("mp_benchmarks")
+
+
+def fixture_key(method: str, path: str, query: list, body: bytes) -> str:
+    try:
+        canonical_body: bytes = orjson.dumps(
+            orjson.loads(body), option=orjson.OPT_SORT_KEYS
+        )
+    except orjson.JSONDecodeError:
+        canonical_body = body
+
+    query_string: str = "&".join(f"{k}={v}" for k, v in sorted(query))
+    request_id: bytes = f"{method} {path}?{query_string}\n".encode() + canonical_body
+
+    return hashlib.sha1(request_id).hexdigest()  # noqa: S324
+
+
+class FixtureStore:
+    def __init__(self, fixtures_dir: str):
+        self.fixtures_dir = Path(fixtures_dir)
+        self.fixtures_dir.mkdir(parents=True, exist_ok=True)
+        self.hits: int = 0
+        self.misses: int = 0
+        self.recorded: int = 0
+
+    def load(self, key: str) -> Optional[dict]:
+        path = Path(self.fixtures_dir, f"{key}.json")
+        if not path.is_file():
+            return None
+
+        return orjson.loads(path.read_bytes())
+
+    def save(self, key: str, fixture: dict) -> None:
+        path = Path(self.fixtures_dir, f"{key}.json")
+        path.write_bytes(orjson.dumps(fixture, option=orjson.OPT_INDENT_2))
+        self.recorded += 1
+
+
+def create_app(store: FixtureStore, upstream: Optional[str] = None) -> web.Application:
+    """
+    :param store: The recorded responses
+    :param upstream: The URL of a Solr core to record responses from, if they are
+        not already recorded
+    """
+
+    async def record(
+        session: aiohttp.ClientSession, request: web.Request, path: str, body: bytes
+    ) -> dict:
+        async with session.request(
+            request.method,
+            f"{upstream}/{path}",
+            params=list(request.query.items()),
+            data=body or None,
+            headers={"Content-Type": request.headers.get("Content-Type", "")},
+        ) as resp:
+            return {
+                "method": request.method,
+                "path": path,
+                "query": list(request.query.items()),
+                "body": body.decode("utf-8", errors="replace"),
+                "status": resp.status,
+                "content_type": resp.content_type,
+                "response": await resp.text(),
+            }
+
+    async def handle(request: web.Request) -> web.Response:
+        path: str = request.match_info["path"]
+        body: bytes = await request.read()
+        key: str = fixture_key(request.method, path, list(request.query.items()), body)
+
+        fixture: Optional[dict] = store.load(key)
+        if fixture is not None:
+            store.hits += 1
+        elif upstream:
+            fixture = await record(request.app["session"], request, path, body)
+            store.save(key, fixture)
+        else:
+            store.misses += 1
+            log.warning(
+                "No recorded response for %s %s (%s)", request.method, path, key
+            )
+            return web.json_response(
+                {"error": {"msg": f"No recorded response for {path}", "code": 404}},
+                status=404,
+            )
+
+        return web.Response(
+            text=fixture["response"],
+            status=fixture["status"],
+            content_type=fixture.get("content_type", "application/json"),
+        )
+
+    async def open_session(app: web.Application):
+        app["session"] = aiohttp.ClientSession() if upstream else None
+        yield
+        if app["session"]:
+            await app["session"].close()
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.cleanup_ctx.append(open_session)
+    # Everything below the core name, so that the fixtures do not depend on it.
+    app.router.add_route("*", "/solr/{core}/{path:.*}", handle)
+
+    return app
+
+
+async def start_fake_solr(
+    store: FixtureStore, port: int, upstream: Optional[str] = None
+) -> web.AppRunner:
+    runner = web.AppRunner(create_app(store, upstream), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    return runner
+
+
+async def main(args: argparse.Namespace) -> None:
+    store = FixtureStore(args.fixtures)
+    runner: web.AppRunner = await start_fake_solr(store, args.port, args.record)
+    log.info("Serving recorded Solr responses on port %s", args.port)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        log.info(
+            "%s responses replayed, %s recorded, %s missing",
+            store.hits,
+            store.recorded,
+            store.misses,
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="[%(asctime)s] [%(levelname)8s] %(message)s (%(filename)s:%(lineno)s)",
+        level=logging.INFO,
+    )
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--fixtures", required=True, help="The directory of recorded responses"
+    )
+    parser.add_argument("--port", type=int, default=8984)
+    parser.add_argument(
+        "--record",
+        help="Record the responses that are missing from this Solr core URL",
+    )
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(main(parser.parse_args()))
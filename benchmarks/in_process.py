@@ -0,0 +1,59 @@
+"""
+Runs the search server in this process, on a local port, with the Solr stand-in in
+front of the recorded responses. The server is the real application, with its
+configuration, listeners and middleware; only Solr is replaced.
+
+  >>> async with serve_in_process("benchmarks/fixtures") as (base_url, fixtures):
+  ...     ...  # make requests to base_url
+
+"""
+
+import importlib
+import os
+import socket
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from benchmarks.fake_solr import FixtureStore, start_fake_solr
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def serve_in_process(fixtures_dir: str, record_from: Optional[str] = None):
+    """
+    Starts the Solr stand-in and the search server, and yields the base URL of the server
+    and the fixture store, which counts the Solr responses replayed and missing.
+
+    :param fixtures_dir: The directory of recorded Solr responses
+    :param record_from: The URL of a Solr core to record any missing responses from
+    """
+    store = FixtureStore(fixtures_dir)
+    solr_port: int = free_port()
+    solr_runner = await start_fake_solr(store, solr_port, record_from)
+
+    # The Solr connection is created when the server is imported, so the stand-in must
+    # be set before then.
+    os.environ["MP_SOLR_SERVER"] = f"http://127.0.0.1:{solr_port}/solr/benchmarks"
+    app = importlib.import_module("search_server.server").app
+
+    port: int = free_port()
+    server = await app.create_server(
+        host="127.0.0.1", port=port, return_asyncio_server=True, access_log=False
+    )
+    await server.startup()
+    await server.before_start()
+    await server.after_start()
+
+    try:
+        yield f"http://127.0.0.1:{port}", store
+    finally:
+        await server.before_stop()
+        server.close()
+        await server.wait_closed()
+        await server.after_stop()
+        await solr_runner.cleanup()
@@ -0,0 +1,245 @@
+"""
+Micro-benchmarks of the pure-Python paths that every request goes through: compiling
+search requests, building facets, serializing search results, constructing identifiers,
+negotiating languages, translating titles, rendering incipits and serializing RDF. The
+cases are in `benchmarks.micro_cases`.
+
+Each case is timed like `timeit`: it is called enough times to run for a minimum time,
+and this is repeated a number of times. The fastest repetition is the one compared, since
+the slower ones are slowed by other things on the machine rather than by the code.
+
+The results are compared to a baseline, and a case that is slower by more than the
+threshold is reported as a regression, and makes the run fail. Neither the inputs nor a
+baseline are kept in the repository, since both depend on the index and the machine, so
+the inputs must be recorded, and a baseline saved with --save-baseline, before results
+can be compared; without a baseline, every case is reported as new:
+
+    python -m benchmarks.micro --record           # once, from the configured Solr core
+    python -m benchmarks.micro --save-baseline    # before a change
+    python -m benchmarks.micro --report micro-report.json   # after it
+
+"""
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import logging
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import orjson
+
+log = logging.getLogger("mp_benchmarks")
+
+DEFAULT_INPUTS_DIR: str = "benchmarks/fixtures/micro"
+DEFAULT_BASELINE: str = "benchmarks/baselines/micro.json"
+DEFAULT_THRESHOLD: float = 0.1
+
+
+async def _time_calls(func: Callable, number: int) -> float:
+    if inspect.iscoroutinefunction(func):
+        start: float = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(number):
+        res = func()
+        # Serializers return an awaitable from a plain lambda.
+        if inspect.isawaitable(res):
+            await res
+    return time.perf_counter() - start
+
+
+async def measure(func: Callable, repeat: int, min_time: float) -> dict:
+    """
+    Times a case, in microseconds per call.
+
+    :param func: The case
+    :param repeat: The number of times to repeat the timing
+    :param min_time: The minimum time, in seconds, for each repetition
+    """
+    # Find the number of calls that takes at least min_time, as timeit does.
+    number: int = 1
+    while True:
+        elapsed: float = await _time_calls(func, number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed else 10
+
+    timings: list[float] = [elapsed / number]
+    for _ in range(repeat - 1):
+        timings.append(await _time_calls(func, number) / number)
+
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_us": round(min(timings) * 1e6, 3),
+        "median_us": round(statistics.median(timings) * 1e6, 3),
+        "mean_us": round(statistics.fmean(timings) * 1e6, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> dict:
+    """
+    Compares the results to a baseline, marking each case as a regression, an
+    improvement, unchanged, or new.
+
+    :param results: The measurements of this run, by case name
+    :param baseline: The measurements of the baseline run, by case name
+    :param threshold: The fraction by which a case may be slower, or faster, before it
+        is a regression, or an improvement
+    """
+    compared: dict = {}
+    for name, result in results.items():
+        entry: dict = dict(result)
+        base: Optional[dict] = baseline.get(name)
+        if not base:
+            entry["status"] = "new"
+            compared[name] = entry
+            continue
+
+        change: float = result["min_us"] / base["min_us"] - 1
+        entry["baseline_us"] = base["min_us"]
+        entry["change"] = round(change, 4)
+
+        if change > threshold:
+            entry["status"] = "regression"
+        elif change < -threshold:
+            entry["status"] = "improvement"
+        else:
+            entry["status"] = "unchanged"
+
+        compared[name] = entry
+
+    return compared
+
+
+def format_report(compared: dict) -> str:
+    name_width: int = max([len(n) for n in compared] + [8])
+    lines: list[str] = [
+        f"{'name':<{name_width}} {'min_us':>12} {'baseline_us':>12} {'change':>8}  status"
+    ]
+    for name, entry in compared.items():
+        baseline_us: str = (
+            f"{entry['baseline_us']:.3f}" if "baseline_us" in entry else "-"
+        )
+        change: str = f"{entry['change']:+.1%}" if "change" in entry else "-"
+        lines.append(
+            f"{name:<{name_width}} {entry['min_us']:>12.3f} {baseline_us:>12} "
+            f"{change:>8}  {entry['status']}"
+        )
+
+    return "\n".join(lines)
+
+
+async def main(args: argparse.Namespace) -> int:
+    # These import the search server, which reads its configuration when imported.
+    app = importlib.import_module("search_server.server").app
+    micro_cases = importlib.import_module("benchmarks.micro_cases")
+    env = micro_cases.BenchEnvironment(app, args.inputs)
+
+    if args.record:
+        await micro_cases.record_inputs(env)
+
+    cases: dict[str, Callable] = await micro_cases.collect_cases(env)
+    if args.filter:
+        cases = {k: v for k, v in cases.items() if args.filter in k}
+
+    results: dict = {}
+    for name, func in cases.items():
+        log.info("Measuring %s", name)
+        results[name] = await measure(func, args.repeat, args.min_time)
+
+    # datetime.UTC needs Python 3.11.
+    created: str = datetime.now(timezone.utc).isoformat()  # noqa: UP017
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_bytes(
+            orjson.dumps(
+                {"created": created, "results": results},
+                option=orjson.OPT_INDENT_2,
+            )
+        )
+        log.info("Saved the baseline to %s", baseline_path)
+
+    baseline: dict = {}
+    if baseline_path.is_file():
+        baseline = orjson.loads(baseline_path.read_bytes()).get("results", {})
+    else:
+        log.warning("No baseline at %s; all the cases are new", baseline_path)
+
+    compared: dict = compare(results, baseline, args.threshold)
+    regressions: list[str] = [
+        k for k, v in compared.items() if v["status"] == "regression"
+    ]
+
+    print(format_report(compared))
+    if args.report:
+        report: dict = {
+            "created": created,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "threshold": args.threshold,
+            "regressions": regressions,
+            "results": compared,
+        }
+        Path(args.report).write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+    if regressions:
+        log.error("%s cases are slower than the baseline", len(regressions))
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="[%(asctime)s] [%(levelname)8s] %(message)s (%(filename)s:%(lineno)s)",
+        level=logging.INFO,
+    )
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputs",
+        default=DEFAULT_INPUTS_DIR,
+        help="The directory of recorded Solr responses used as inputs",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Record the inputs from the Solr core in the configuration",
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results of this run as the baseline",
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="The fraction by which a case may be slower than the baseline",
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="The minimum time, in seconds, of each repetition",
+    )
+    parser.add_argument("-k", "--filter", help="Only run the cases containing this")
+    parser.add_argument("--report", help="Write the comparison to this JSON file")
+
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,197 @@
+"""
+The functions measured by the micro-benchmarks. Each case is a callable taking no
+arguments, with its inputs prepared beforehand, so that only the function itself is
+timed.
+
+The search results, facets and incipits are taken from Solr responses recorded once
+from a real core, and kept in the inputs directory (see `record_inputs`); the cases that
+need them are skipped until they are recorded.
+"""
+
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+import orjson
+from sanic import Sanic
+from sanic.compat import Header
+from sanic.request import Request
+
+from search_server.helpers.linked_data import to_turtle
+from search_server.helpers.search_request import SearchRequest
+from search_server.helpers.vrv import get_pae_features, render_pae
+from search_server.resources.search.facets import get_facets
+from search_server.resources.search.search_results import (
+    SearchResults,
+    _render_with_highlighting,
+)
+from search_server.routes import blueprints
+from shared_helpers.display_translators import title_json_value_translator
+from shared_helpers.identifiers import get_identifier
+from shared_helpers.jsonld import RouteContextMap
+from shared_helpers.languages import filter_languages, negotiate_languages
+from shared_helpers.serializer_context import (
+    SerializerContext,
+    url_templates_from_blueprints,
+)
+from shared_helpers.solr_connection import execute_query
+
+log = logging.getLogger("mp_benchmarks")
+
+RESULT_ROWS: tuple = (20, 40, 100)
+INCIPIT_NOTES: str = "'CDEFGA"
+LANGUAGE_HEADERS: dict = {"X-API-Accept-Language": "en"}
+
+
+class RecordedResults:
+    """
+    Stands in for the results of a Solr search, from a recorded Solr response.
+    """
+
+    def __init__(self, raw_response: dict, rows: Optional[int] = None):
+        self.raw_response: dict = raw_response
+        self.hits: int = raw_response["response"]["numFound"]
+        self.docs: list[dict] = raw_response["response"]["docs"][:rows]
+
+
+class BenchEnvironment:
+    def __init__(self, app: Sanic, inputs_dir: str):
+        self.app = app
+        self.inputs_dir = Path(inputs_dir)
+
+    def request(self, path: str, headers: Optional[dict] = None) -> Request:
+        """
+        A request to the server, as it would be by the time it reaches a handler.
+        """
+        req = Request(
+            path.encode(),
+            Header({"host": "localhost:8000", **(headers or LANGUAGE_HEADERS)}),
+            "1.1",
+            "GET",
+            None,
+            self.app,
+        )
+        req.ctx.translations = negotiate_languages(req, self.app.ctx.translations)
+
+        return req
+
+    def search_response(self, mode: str) -> Optional[dict]:
+        path = Path(self.inputs_dir, f"search-{mode}.json")
+        if not path.is_file():
+            return None
+
+        return orjson.loads(path.read_bytes())
+
+
+def search_path(mode: str, rows: int = 20) -> str:
+    return f"/search/?mode={mode}&rows={rows}"
+
+
+async def record_inputs(env: BenchEnvironment) -> None:
+    """
+    Records the Solr responses to the searches the cases need, by compiling and
+    running them against the Solr core the server is configured with.
+    """
+    env.inputs_dir.mkdir(parents=True, exist_ok=True)
+
+    for mode in env.app.ctx.config["search"]["modes"]:
+        req: Request = env.request(search_path(mode, max(RESULT_ROWS)))
+        solr_res = await execute_query(SearchRequest(req).compile())
+        Path(env.inputs_dir, f"search-{mode}.json").write_bytes(
+            orjson.dumps(solr_res.raw_response)
+        )
+        log.info("Recorded %s results for %s", len(solr_res.docs), mode)
+
+
+async def collect_cases(env: BenchEnvironment) -> dict[str, Callable]:
+    """
+    Prepares the cases, by name. Synchronous and asynchronous callables are both
+    accepted.
+    """
+    cases: dict[str, Callable] = {}
+    modes: list[str] = list(env.app.ctx.config["search"]["modes"])
+    translations: dict = env.app.ctx.translations
+
+    for mode in modes:
+        compile_req: Request = env.request(f"{search_path(mode)}&q=mozart")
+        cases[f"SearchRequest.compile[{mode}]"] = lambda r=compile_req: SearchRequest(
+            r
+        ).compile()
+
+    for mode in modes:
+        raw_response: Optional[dict] = env.search_response(mode)
+        if raw_response is None:
+            log.warning("No recorded search for %s; skipping its cases", mode)
+            continue
+
+        facets_req: Request = env.request(search_path(mode))
+        facets_results = RecordedResults(raw_response)
+        cases[f"get_facets[{mode}]"] = lambda r=facets_req, o=facets_results: (
+            get_facets(r, o)
+        )
+
+        for rows in RESULT_ROWS:
+            rows_req: Request = env.request(search_path(mode, rows))
+            rows_results = RecordedResults(raw_response, rows)
+            cases[f"SearchResults[{mode},{rows}]"] = lambda r=rows_req, o=rows_results: (
+                SearchResults(o, context={"request": r}).data
+            )
+
+    search_req: Request = env.request(search_path("sources"))
+    ser_ctx = SerializerContext(
+        "http://localhost:8000", translations, url_templates_from_blueprints(blueprints)
+    )
+    cases["get_identifier[request]"] = lambda: get_identifier(
+        search_req, "sources.source", source_id="990041209"
+    )
+    cases["get_identifier[context]"] = lambda: get_identifier(
+        ser_ctx, "sources.source", source_id="990041209"
+    )
+
+    cases["negotiate_languages"] = lambda: negotiate_languages(search_req, translations)
+    cases["filter_languages[en,de,fr]"] = lambda: filter_languages(
+        {"en", "de", "fr"}, translations
+    )
+
+    sources_response: Optional[dict] = env.search_response("sources")
+    if sources_response:
+        titles: list[list] = [
+            d["standard_titles_json"]
+            for d in sources_response["response"]["docs"]
+            if "standard_titles_json" in d
+        ]
+        # One pass over the titles of a page of the largest size.
+        cases[f"title_json_value_translator[{len(titles)} titles]"] = lambda: [
+            title_json_value_translator(t, translations) for t in titles
+        ]
+
+        turtle_req: Request = env.request(search_path("sources"))
+        jsonld: dict = await SearchResults(
+            RecordedResults(sources_response), context={"request": turtle_req}
+        ).data
+        turtle_input: dict = {
+            "@context": RouteContextMap["__default"].context,
+            **jsonld,
+        }
+        cases["to_turtle[sources,20]"] = lambda: to_turtle(turtle_input)
+
+    incipits_response: Optional[dict] = env.search_response("incipits")
+    incipit_doc: Optional[dict] = next(
+        (
+            d
+            for d in (incipits_response or {}).get("response", {}).get("docs", [])
+            if d.get("original_pae_sni")
+        ),
+        None,
+    )
+    if incipit_doc:
+        pae: str = incipit_doc["original_pae_sni"]
+        cases["render_pae"] = lambda: render_pae(pae, use_crc=True)
+
+        notes_req: Request = env.request(f"{search_path('incipits')}&n={INCIPIT_NOTES}")
+        query_features: Optional[dict] = get_pae_features(notes_req)
+        cases["_render_with_highlighting"] = lambda: _render_with_highlighting(
+            notes_req, incipit_doc, query_features
+        )
+
+    return cases
@@ -0,0 +1,308 @@
+"""
+Replays a log of requests against the search server, to reproduce a mix of traffic,
+such as one taken from the production access logs, and reports the latency percentiles
+and errors, overall and for each kind of request.
+
+The log is a JSON-lines file with one request on each line:
+
+    {"path": "/search/", "query": "q=mozart&mode=sources", "headers": {"Accept": "application/ld+json"}}
+
+where the query may also be given as an object, and the headers are optional.
+
+By default the requests are sent by a number of clients, each sending its next request
+as soon as it has a response (a closed loop). With --rate, the requests are sent at a
+fixed rate, whether or not the earlier ones have been answered (an open loop), and the
+latency is counted from the time each request was due, so that a slow server is not
+hidden by the load generator waiting for it.
+
+The requests can be sent to a running server:
+
+    python -m benchmarks.replay access-log.jsonl --target http://localhost:8000 -c 8
+
+or to the server run in this process, with Solr replaced by recorded responses (see
+`benchmarks.run`):
+
+    python -m benchmarks.replay access-log.jsonl --fixtures benchmarks/fixtures --rate 50
+
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from typing import NamedTuple, Optional
+
+import aiohttp
+import orjson
+
+from benchmarks.in_process import serve_in_process
+from benchmarks.stats import format_table, summarize
+
+log = logging.getLogger("mp_benchmarks")
+
+DEFAULT_HEADERS: dict = {"Accept": "application/ld+json"}
+
+
+class LoggedRequest(NamedTuple):
+    path: str
+    headers: dict
+    group: str
+
+
+class Outcome(NamedTuple):
+    group: str
+    latency: Optional[float]
+    status: Optional[int]
+    error: Optional[str]
+
+
+def request_group(path: str) -> str:
+    """
+    The kind of request, for reporting: the first part of the path, and whether it is
+    the record or a list below it, e.g. "sources", "sources/*/incipits".
+    """
+    parts: list[str] = [p for p in path.split("/") if p]
+    if not parts:
+        return "front"
+
+    return "/".join(
+        [parts[0]] + ["*" if i % 2 == 0 else p for i, p in enumerate(parts[1:])]
+    )
+
+
+def load_log(log_path: str) -> list[LoggedRequest]:
+    entries: list[LoggedRequest] = []
+    with open(log_path, "rb") as log_file:
+        for line_num, line in enumerate(log_file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                entry: dict = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                log.warning("Skipping line %s: not JSON", line_num)
+                continue
+
+            path: Optional[str] = entry.get("path")
+            if not path:
+                log.warning("Skipping line %s: no path", line_num)
+                continue
+
+            group: str = request_group(path)
+            query = entry.get("query")
+            if isinstance(query, (dict, list)):
+                query = urllib.parse.urlencode(query, doseq=True)
+            if query:
+                path = f"{path}?{query}"
+
+            entries.append(
+                LoggedRequest(path, entry.get("headers") or DEFAULT_HEADERS, group)
+            )
+
+    return entries
+
+
+async def send(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    entry: LoggedRequest,
+    due: Optional[float] = None,
+) -> Outcome:
+    """
+    Sends a request, and times it from when it was due if it is given, or from when it
+    was sent.
+    """
+    start: float = due if due is not None else time.perf_counter()
+    try:
+        async with session.get(
+            f"{base_url}{entry.path}", headers=entry.headers
+        ) as resp:
+            await resp.read()
+    # Before Python 3.11, asyncio.TimeoutError is not the builtin TimeoutError.
+    except asyncio.TimeoutError:  # noqa: UP041
+        return Outcome(entry.group, None, None, "timeout")
+    except aiohttp.ClientError as e:
+        return Outcome(entry.group, None, None, type(e).__name__)
+
+    error: Optional[str] = f"HTTP {resp.status}" if resp.status >= 500 else None
+    return Outcome(entry.group, time.perf_counter() - start, resp.status, error)
+
+
+async def closed_loop(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    entries: list[LoggedRequest],
+    concurrency: int,
+) -> list[Outcome]:
+    outcomes: list[Outcome] = []
+    pending = iter(entries)
+
+    async def client() -> None:
+        for entry in pending:
+            outcomes.append(await send(session, base_url, entry))
+
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return outcomes
+
+
+async def open_loop(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    entries: list[LoggedRequest],
+    rate: float,
+) -> list[Outcome]:
+    interval: float = 1 / rate
+    start: float = time.perf_counter()
+    tasks: list[asyncio.Task] = []
+    late: int = 0
+
+    for num, entry in enumerate(entries):
+        due: float = start + num * interval
+        delay: float = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif delay < -interval:
+            late += 1
+
+        tasks.append(asyncio.create_task(send(session, base_url, entry, due)))
+
+    if late:
+        log.warning(
+            "%s requests were sent more than one interval late; the load generator "
+            "could not keep up with the rate",
+            late,
+        )
+
+    return list(await asyncio.gather(*tasks))
+
+
+def report(outcomes: list[Outcome], elapsed: float) -> dict:
+    """
+    Summarizes the outcomes, overall and by kind of request. Responses with a 5xx status,
+    timeouts and connection errors count as errors; 4xx responses are reported by
+    status, since a replayed log will have some.
+    """
+    by_group: dict[str, list[Outcome]] = defaultdict(list)
+    for outcome in outcomes:
+        by_group[outcome.group].append(outcome)
+
+    def summarize_outcomes(group_outcomes: list[Outcome]) -> dict:
+        summary: dict = summarize(
+            [o.latency for o in group_outcomes if o.latency is not None],
+            sum(1 for o in group_outcomes if o.error),
+            elapsed,
+            Counter(o.status for o in group_outcomes if o.status is not None),
+        )
+        summary["error_kinds"] = dict(
+            Counter(o.error for o in group_outcomes if o.error)
+        )
+        return summary
+
+    results: dict = {"all": summarize_outcomes(outcomes)}
+    for group in sorted(by_group):
+        results[group] = summarize_outcomes(by_group[group])
+
+    return results
+
+
+@asynccontextmanager
+async def target_server(args: argparse.Namespace):
+    if args.target:
+        yield args.target.rstrip("/")
+        return
+
+    async with serve_in_process(args.fixtures, args.record) as (base_url, fixtures):
+        yield base_url
+
+    if fixtures.misses:
+        log.warning(
+            "%s Solr requests had no recorded response; record them with --record",
+            fixtures.misses,
+        )
+
+
+async def main(args: argparse.Namespace) -> dict:
+    entries: list[LoggedRequest] = load_log(args.log)
+    if args.limit:
+        entries = entries[: args.limit]
+    if not entries:
+        raise SystemExit(f"No requests in {args.log}")
+
+    warmup: list[LoggedRequest] = entries[: args.warmup]
+    log.info("Replaying %s requests after %s warm-up", len(entries), len(warmup))
+
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+
+    session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+
+    async with target_server(args) as base_url, session:
+        await closed_loop(session, base_url, warmup, args.concurrency)
+
+        start: float = time.perf_counter()
+        if args.rate:
+            outcomes = await open_loop(session, base_url, entries, args.rate)
+        else:
+            outcomes = await closed_loop(session, base_url, entries, args.concurrency)
+        elapsed: float = time.perf_counter() - start
+
+    return report(outcomes, elapsed)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="[%(asctime)s] [%(levelname)8s] %(message)s (%(filename)s:%(lineno)s)",
+        level=logging.INFO,
+    )
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", help="A JSON-lines file of requests")
+
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--target", help="The base URL of a running server")
+    target_group.add_argument(
+        "--fixtures",
+        help="Run the server in this process, with the Solr responses recorded here",
+    )
+    parser.add_argument(
+        "--record",
+        help="With --fixtures, record any missing Solr responses from this core URL",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=4,
+        help="The number of clients sending requests in a closed loop",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Send this many requests a second, in an open loop, instead of -c clients",
+    )
+    parser.add_argument(
+        "-w",
+        "--warmup",
+        type=int,
+        default=20,
+        help="Send this many requests from the start of the log first, unmeasured",
+    )
+    parser.add_argument(
+        "-n", "--limit", type=int, help="Replay only this many requests"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="The timeout for each request"
+    )
+    parser.add_argument("--json", help="Write the results to this JSON file")
+
+    incoming_args = parser.parse_args()
+    replay_results: dict = asyncio.run(main(incoming_args))
+
+    print(format_table(replay_results))
+    if incoming_args.json:
+        with open(incoming_args.json, "wb") as json_out:
+            json_out.write(orjson.dumps(replay_results, option=orjson.OPT_INDENT_2))
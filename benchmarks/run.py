@@ -0,0 +1,138 @@
+"""
+End-to-end benchmarks of the search server. The server runs in this process, with Solr
+replaced by recorded responses (see `benchmarks.fake_solr`), so the benchmarks need no
+network and no index, and measure only the time spent in the server.
+
+Each scenario in `benchmarks.scenarios` is requested a number of times after a warm-up,
+with a number of requests in flight at once, and the throughput and latency percentiles
+are reported:
+
+    python -m benchmarks.run --fixtures benchmarks/fixtures --json bench.json
+
+No fixtures are kept in the repository, and without them every Solr request gets a 404,
+so they must be recorded before the first run, by running the benchmarks once against a
+real Solr core:
+
+    python -m benchmarks.run --fixtures benchmarks/fixtures \\
+        --record http://localhost:8983/solr/muscatplus_live
+
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Optional
+
+import aiohttp
+import orjson
+
+from benchmarks.in_process import serve_in_process
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.stats import format_table, summarize
+
+log = logging.getLogger("mp_benchmarks")
+
+
+async def run_scenario(
+    session: aiohttp.ClientSession,
+    url: str,
+    headers: dict,
+    iterations: int,
+    concurrency: int,
+    warmup: int,
+) -> dict:
+    for _ in range(warmup):
+        async with session.get(url, headers=headers) as resp:
+            await resp.read()
+
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    errors: int = 0
+    remaining: list[int] = [iterations]
+
+    async def worker() -> None:
+        nonlocal errors
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start: float = time.perf_counter()
+            try:
+                async with session.get(url, headers=headers) as resp:
+                    await resp.read()
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+
+            latencies.append(time.perf_counter() - start)
+            statuses[resp.status] += 1
+            if resp.status >= 400:
+                errors += 1
+
+    start: float = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed: float = time.perf_counter() - start
+
+    return summarize(latencies, errors, elapsed, statuses)
+
+
+async def main(args: argparse.Namespace) -> dict:
+    names: list[str] = args.scenario or list(SCENARIOS)
+    results: dict = {}
+
+    async with serve_in_process(args.fixtures, args.record) as (base_url, fixtures):
+        async with aiohttp.ClientSession() as session:
+            for name in names:
+                scenario: dict = SCENARIOS[name]
+                log.info("Running %s", name)
+                results[name] = await run_scenario(
+                    session,
+                    f"{base_url}{scenario['path']}",
+                    scenario["headers"],
+                    args.iterations,
+                    args.concurrency,
+                    args.warmup,
+                )
+
+        if fixtures.misses:
+            log.warning(
+                "%s Solr requests had no recorded response; record them with --record",
+                fixtures.misses,
+            )
+
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="[%(asctime)s] [%(levelname)8s] %(message)s (%(filename)s:%(lineno)s)",
+        level=logging.INFO,
+    )
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--fixtures", required=True, help="The directory of recorded Solr responses"
+    )
+    parser.add_argument(
+        "--record", help="Record any missing Solr responses from this Solr core URL"
+    )
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        help="Run only this scenario (can be repeated; default: all)",
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("-w", "--warmup", type=int, default=10)
+    parser.add_argument("--json", help="Write the results to this JSON file")
+
+    incoming_args = parser.parse_args()
+    bench_results: dict = asyncio.run(main(incoming_args))
+
+    print(format_table(bench_results))
+    json_path: Optional[str] = incoming_args.json
+    if json_path:
+        with open(json_path, "wb") as json_out:
+            json_out.write(orjson.dumps(bench_results, option=orjson.OPT_INDENT_2))
@@ -0,0 +1,32 @@
+"""
+The requests measured by the end-to-end benchmarks. The fixtures are not kept in the
+repository, so they must be recorded first (see `benchmarks.run`), from an index that has
+these records; if they are recorded from another index, these may need to be changed.
+"""
+
+JSON_LD: dict = {"Accept": "application/ld+json", "X-API-Accept-Language": "en"}
+
+SCENARIOS: dict[str, dict] = {
+    "search": {"path": "/search/?q=mozart", "headers": JSON_LD},
+    "search-sources": {
+        "path": "/search/?mode=sources&q=requiem&rows=40",
+        "headers": JSON_LD,
+    },
+    "probe": {"path": "/probe/?q=mozart&mode=sources", "headers": JSON_LD},
+    "suggest": {"path": "/suggest/?alias=scoring&q=vio", "headers": JSON_LD},
+    "source": {"path": "/sources/990041209/", "headers": JSON_LD},
+    "person": {"path": "/people/20000365/", "headers": JSON_LD},
+    "institution": {"path": "/institutions/30000004", "headers": JSON_LD},
+    "incipit-search": {
+        "path": "/search/?mode=incipits&n=%27CDEFGA",
+        "headers": JSON_LD,
+    },
+    "source-turtle": {
+        "path": "/sources/990041209/",
+        "headers": {"Accept": "text/turtle", "X-API-Accept-Language": "en"},
+    },
+    "person-ntriples": {
+        "path": "/people/20000365/",
+        "headers": {"Accept": "application/n-triples", "X-API-Accept-Language": "en"},
+    },
+}
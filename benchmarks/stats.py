@@ -0,0 +1,72 @@
+"""
+Latency statistics for the benchmarks and the load generator.
+"""
+
+import math
+from typing import Optional
+
+PERCENTILES: tuple = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """
+    The percentile of a sorted list, interpolating between the closest ranks.
+    """
+    if not sorted_values:
+        return 0.0
+
+    rank: float = (len(sorted_values) - 1) * pct / 100
+    lower: int = math.floor(rank)
+    upper: int = math.ceil(rank)
+    if lower == upper:
+        return sorted_values[lower]
+
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        rank - lower
+    )
+
+
+def summarize(
+    latencies: list[float], errors: int, elapsed: float, statuses: Optional[dict] = None
+) -> dict:
+    """
+    Summarizes the latencies, in seconds, of a run of requests.
+
+    :param latencies: The latencies of the requests that completed
+    :param errors: The number of requests that failed, or had an error status
+    :param elapsed: The wall time of the run, in seconds
+    :param statuses: The number of responses with each status code
+    :return: A dictionary of the statistics, with the latencies in milliseconds
+    """
+    ordered: list[float] = sorted(latencies)
+    summary: dict = {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(ordered, pct) * 1000, 2)
+    if statuses is not None:
+        summary["statuses"] = {str(k): v for k, v in sorted(statuses.items())}
+
+    return summary
+
+
+def format_table(results: dict) -> str:
+    """
+    Formats the summaries of several runs, by name, as a plain-text table.
+    """
+    columns: list = ["requests", "errors", "throughput", "mean_ms"]
+    columns += [f"p{pct}_ms" for pct in PERCENTILES] + ["max_ms"]
+
+    name_width: int = max([len(n) for n in results] + [8])
+    lines: list[str] = [
+        f"{'name':<{name_width}} " + " ".join(f"{c:>10}" for c in columns)
+    ]
+    for name, summary in results.items():
+        values: str = " ".join(f"{summary[c]:>10}" for c in columns)
+        lines.append(f"{name:<{name_width}} {values}")
+
+    return "\n".join(lines)
@@ -0,0 +1,199 @@
+"""
+Pre-generates the OpenGraph card images for all records into the image cache directory
+(`social.image_cache_dir`), so that link previews never wait for an image to be
+rasterized. The records are walked with a cursor, and each card is templated and
+rendered with resvg in a pool of worker processes.
+
+With --incremental, only the records that have been indexed since the last successful
+run are generated. The time a record was indexed is used rather than the time it was
+updated in Muscat, since a record edited before a run may only be indexed after it.
+
+    python -m data_export_server.generate_og_images --incremental
+
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import logging
+import os
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import uvloop
+import yaml
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from small_asc.client import Solr
+
+from data_export_server.resources.og_images import (
+    image_cache_path,
+    render_card_png,
+    render_card_svg,
+)
+from data_export_server.routes.opengraph import SOLR_FIELDS
+
+logging.basicConfig(
+    format="[%(asctime)s] [%(levelname)8s] %(message)s (%(filename)s:%(lineno)s)",
+    level=logging.INFO,
+)
+log = logging.getLogger("mp_dataexport")
+
+config: dict = yaml.safe_load(open("configuration.yml"))  # noqa: SIM115
+solr_conn = Solr(config["solr"]["server"])
+
+asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+# The timestamp of the last successful run, kept in the image cache directory.
+WATERMARK_FILE: str = ".last_generated"
+
+# Set up in each worker process by `init_worker`.
+_worker_ctx: dict = {}
+
+
+def init_worker() -> None:
+    _worker_ctx["template_env"] = Environment(
+        loader=FileSystemLoader("data_export_server/templates"),
+        autoescape=select_autoescape(["xml"]),
+    )
+
+
+def generate_image(
+    record: dict, cache_dir: str, resvg_path: str, font_path: str
+) -> bool:
+    rendered_svg: str = render_card_svg(record, _worker_ctx["template_env"])
+    return render_card_png(
+        rendered_svg, image_cache_path(cache_dir, record["id"]), resvg_path, font_path
+    )
+
+
+async def generate(
+    cache_dir: str, since: Optional[str], parallel_processes: int
+) -> tuple[int, int]:
+    """
+    Generates the images for all the records, or for the records indexed since a given time.
+
+    :return: A tuple of the number of images generated, and the number that failed
+    """
+    fq: list = [
+        "type:person OR type:source OR type:institution",
+        "!project_s:[* TO *]",
+    ]
+    if since:
+        fq.append(f"indexed:[{since} TO *]")
+
+    res = await solr_conn.search(
+        {
+            "query": "*:*",
+            "filter": fq,
+            "fields": SOLR_FIELDS,
+            "sort": "id asc",
+            "limit": 500,
+        },
+        cursor=True,
+    )
+    log.info("Generating images for %s records", res.hits)
+
+    resvg_path: str = config["social"]["resvg"]
+    font_path: str = config["social"]["font_path"]
+
+    loop = asyncio.get_running_loop()
+    # Bounds the records waiting for a worker, so that the cursor does not run ahead.
+    in_flight = asyncio.Semaphore(parallel_processes * 4)
+    counts: dict = {"generated": 0, "failed": 0}
+
+    async def run(executor, record: dict) -> None:
+        try:
+            success: bool = await loop.run_in_executor(
+                executor, generate_image, record, cache_dir, resvg_path, font_path
+            )
+        except Exception as e:
+            log.error("Exception raised generating %s: %s", record["id"], e)
+            success = False
+        finally:
+            in_flight.release()
+
+        if success:
+            counts["generated"] += 1
+        else:
+            log.error("Could not generate an image for %s", record["id"])
+            counts["failed"] += 1
+
+        if (counts["generated"] + counts["failed"]) % 10000 == 0:
+            log.info("Processed %s of %s records", sum(counts.values()), res.hits)
+
+    tasks: set = set()
+    with concurrent.futures.ProcessPoolExecutor(
+        parallel_processes, initializer=init_worker
+    ) as executor:
+        async for record in res:
+            await in_flight.acquire()
+            task = asyncio.create_task(run(executor, record))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+    return counts["generated"], counts["failed"]
+
+
+def main(args: argparse.Namespace) -> bool:
+    cache_dir: Optional[str] = config["social"].get("image_cache_dir")
+    if not cache_dir:
+        log.critical("There is no image cache directory (social.image_cache_dir) set.")
+        return False
+
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    watermark_path = Path(cache_dir, WATERMARK_FILE)
+
+    since: Optional[str] = None
+    if args.incremental:
+        if watermark_path.exists():
+            since = watermark_path.read_text().strip()
+            log.info("Generating images for records indexed since %s", since)
+        else:
+            log.warning("No previous run found; generating all images")
+
+    # Taken before the records are queried, so that records indexed during the run
+    # will be generated again by the next incremental run.
+    # datetime.UTC is only available from Python 3.11.
+    run_stamp: str = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")  # noqa: UP017
+
+    generated, failed = asyncio.run(generate(cache_dir, since, args.processes))
+    log.info("Generated %s images; %s failed", generated, failed)
+
+    # If anything failed the watermark is left where it was, so that the next
+    # incremental run will try those records again.
+    if failed:
+        return False
+
+    watermark_path.write_text(run_stamp)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Only generate images for records indexed since the last successful run",
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of parallel rendering processes (default: the number of CPUs)",
+    )
+
+    incoming_args = parser.parse_args()
+
+    start = timeit.default_timer()
+    result: bool = main(incoming_args)
+    elapsed: float = timeit.default_timer() - start
+    log.info("Total time to run: %.1fs", elapsed)
+
+    raise SystemExit(0 if result else 1)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from jinja2 import Environment
+
+from data_export_server.resources.opengraph import OpenGraphSvg
+from shared_helpers.resvg import render_svg
+
+"""
+Rendering and caching of the OpenGraph card images. Both the `og_image` route and the
+batch generation job use these, so that an image produced by one can be served by
+the other.
+"""
+
+
+def image_cache_path(cache_dir: str, record_id: str) -> Path:
+    return Path(cache_dir, f"{record_id}.png")
+
+
+def is_current(image_path: Path, indexed: Optional[str]) -> bool:
+    """
+    Checks whether a cached image was written after the record was last indexed. The
+    time it was indexed is used rather than the time it was updated in Muscat, since a
+    record edited before an image was written may only be indexed after it.
+    """
+    if not image_path.is_file():
+        return False
+
+    if not indexed:
+        return True
+
+    # Solr writes timestamps in UTC with a trailing "Z", which fromisoformat only
+    # accepts from Python 3.11.
+    record_indexed: datetime = datetime.fromisoformat(indexed.replace("Z", "+00:00"))
+    if record_indexed.tzinfo is None:
+        record_indexed = record_indexed.replace(tzinfo=timezone.utc)  # noqa: UP017
+
+    return image_path.stat().st_mtime >= record_indexed.timestamp()
+
+
+def render_card_svg(record: dict, template_env: Environment) -> str:
+    tmpl_data: dict = OpenGraphSvg(record).data
+    svg_tmpl = template_env.get_template("opengraph/card_image_template.svg.j2")
+
+    return svg_tmpl.render(**tmpl_data)
+
+
+def render_card_png(
+    rendered_svg: str, outpath: Path, resvg_path: str, font_path: str
+) -> bool:
+    """
+    Renders a card image to a temporary file next to its destination, and then moves it
+    into place, so that a partially written image is never served.
+
+    :return: True if the image was written
+    """
+    # The cache directory may not exist yet if the batch generation job has not run.
+    outpath.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmpfile = tempfile.mkstemp(dir=outpath.parent, suffix=".png.tmp")
+    os.close(fd)
+
+    render_success: bool = render_svg(rendered_svg, tmpfile, resvg_path, font_path)
+    if not render_success or os.path.getsize(tmpfile) == 0:
+        os.unlink(tmpfile)
+        return False
+
+    os.replace(tmpfile, outpath)
+
+    return True
@@ -0,0 +1,283 @@
+import asyncio
+import functools
+import gzip
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+from jinja2 import Environment, Template
+
+from shared_helpers.identifiers import ID_SUB, get_url_from_type
+from shared_helpers.index_version import get_index_version
+from shared_helpers.serializer_context import SerializerContext
+from shared_helpers.solr_connection import SolrConnection
+
+"""
+Builds a snapshot of the sitemaps for a given version of the index. The records are
+walked once, with a cursor, and every sitemap page and the sitemap index are written to
+gzip-compressed files in a directory named for the index version. The files can then be
+served as they are until the index changes, so that crawlers cost nothing in Solr.
+
+Only one process builds a snapshot at a time; the others will see the lock file and
+serve the sitemaps from Solr until the snapshot is ready. When they are served from Solr,
+the pages are selected by the (created, id) of their first record and of the first
+record of the next page, rather than by an offset, so that any page costs the same as
+the first.
+"""
+
+log = logging.getLogger("mp_dataexport")
+
+SITEMAP_FILTERS: list = [
+    "type:person OR type:source OR type:institution",
+    "!project_s:[* TO *]",
+]
+SITEMAP_INDEX_FILE: str = "sitemap.xml.gz"
+LOCK_FILE: str = "build.lock"
+# A lock older than this is assumed to be left over from a build that did not finish.
+STALE_LOCK_SECONDS: int = 60 * 60
+SITEMAP_SORT: str = "created asc, id asc"
+
+# The (created, id) of the first record on each sitemap page, and the version of the
+# index they were taken from.
+_page_boundaries: dict = {"version": None, "boundaries": []}
+_page_boundaries_lock: Optional[asyncio.Lock] = None
+
+
+def snapshot_path(snapshot_dir: str, index_version: str) -> Path:
+    return Path(snapshot_dir, re.sub(r"[^0-9A-Za-z]", "", index_version))
+
+
+def page_file(page_num: int) -> str:
+    return f"sitemap-page-{page_num}.xml.gz"
+
+
+def load_snapshot_file(
+    snapshot_dir: str, index_version: str, filename: str
+) -> Optional[bytes]:
+    path: Path = Path(snapshot_path(snapshot_dir, index_version), filename)
+    if not path.is_file():
+        return None
+
+    return path.read_bytes()
+
+
+def _acquire_lock(lock_path: Path) -> bool:
+    try:
+        fd: int = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            lock_age: float = time.time() - lock_path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+        if lock_age > STALE_LOCK_SECONDS:
+            log.warning("Removing a stale sitemap build lock from %s", str(lock_path))
+            lock_path.unlink(missing_ok=True)
+
+        return False
+
+    os.write(fd, str(os.getpid()).encode("ascii"))
+    os.close(fd)
+
+    return True
+
+
+def _write_gzip(tmpl: Template, path: Path, **tmpl_vars) -> None:
+    rendered: str = tmpl.render(**tmpl_vars)
+    with gzip.open(path, "wt", encoding="utf-8") as gz_out:
+        gz_out.write(rendered)
+
+
+async def _write_gzip_in_executor(tmpl: Template, path: Path, **tmpl_vars) -> None:
+    # Rendering and compressing a page takes long enough to hold up other requests.
+    await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(_write_gzip, tmpl, path, **tmpl_vars)
+    )
+
+
+async def build_sitemap_snapshot(
+    site: str,
+    page_size: int,
+    template_env: Environment,
+    snapshot_dir: str,
+    index_version: str,
+) -> bool:
+    """
+    Builds the sitemap snapshot for an index version, unless it already exists or
+    another process is building it.
+
+    :param site: The base URL of the site, used for all the URLs in the sitemaps
+    :param page_size: The number of URLs in each sitemap page
+    :param template_env: The Jinja environment with the sitemap templates
+    :param snapshot_dir: The directory where the snapshots are kept
+    :param index_version: The version of the index the snapshot is built from
+    :return: True if a snapshot was built
+    """
+    target: Path = snapshot_path(snapshot_dir, index_version)
+    if target.exists():
+        return False
+
+    Path(snapshot_dir).mkdir(parents=True, exist_ok=True)
+    lock_path: Path = Path(snapshot_dir, LOCK_FILE)
+    if not _acquire_lock(lock_path):
+        log.debug("Another process is building the sitemap snapshot")
+        return False
+
+    try:
+        # Another worker may have seen a newer index version, and removed the snapshot
+        # for the version this one has cached. Do not build an outdated snapshot.
+        if await get_index_version(refresh=True) != index_version:
+            return False
+
+        log.info("Building the sitemap snapshot for index version %s", index_version)
+        start: float = time.monotonic()
+        building: Path = target.with_name(f"{target.name}.tmp")
+        shutil.rmtree(building, ignore_errors=True)
+        building.mkdir(parents=True)
+
+        # URLs are built from the site, rather than from a request.
+        url_ctx = SerializerContext(site, {}, {})
+        page_tmpl: Template = template_env.get_template("sitemaps/sitemap.xml.j2")
+
+        res = await SolrConnection.search(
+            {
+                "query": "*:*",
+                "filter": SITEMAP_FILTERS,
+                "fields": ["id", "type", "updated"],
+                "sort": SITEMAP_SORT,
+                "limit": 1000,
+            },
+            cursor=True,
+            handler="/query",
+        )
+
+        num_pages: int = 0
+        urlentries: list = []
+        async for result in res:
+            resid: str = re.sub(ID_SUB, "", result["id"])
+            url: Optional[str] = get_url_from_type(url_ctx, result["type"], resid)
+            if not url:
+                continue
+
+            urlentries.append({"url": url, "updated": result.get("updated")})
+
+            if len(urlentries) >= page_size:
+                num_pages += 1
+                await _write_gzip_in_executor(
+                    page_tmpl,
+                    Path(building, page_file(num_pages)),
+                    urlentries=urlentries,
+                )
+                urlentries = []
+
+        if urlentries:
+            num_pages += 1
+            await _write_gzip_in_executor(
+                page_tmpl, Path(building, page_file(num_pages)), urlentries=urlentries
+            )
+
+        root_tmpl: Template = template_env.get_template("sitemaps/root.xml.j2")
+        await _write_gzip_in_executor(
+            root_tmpl,
+            Path(building, SITEMAP_INDEX_FILE),
+            sitemap_pages=num_pages,
+            site=site,
+        )
+
+        os.replace(building, target)
+
+        # Remove the snapshots for previous versions of the index.
+        for old in Path(snapshot_dir).iterdir():
+            if old.is_dir() and old != target:
+                shutil.rmtree(old, ignore_errors=True)
+
+        log.info("Built %s sitemap pages in %.1fs", num_pages, time.monotonic() - start)
+    finally:
+        lock_path.unlink(missing_ok=True)
+
+    return True
+
+
+def _get_page_boundaries_lock() -> asyncio.Lock:
+    # Created on first use, since before Python 3.10 a lock is bound to the event loop
+    # that exists when it is created, which at import is not the one the server runs.
+    global _page_boundaries_lock
+    if _page_boundaries_lock is None:
+        _page_boundaries_lock = asyncio.Lock()
+
+    return _page_boundaries_lock
+
+
+async def get_page_boundaries(page_size: int) -> list[tuple[str, str]]:
+    """
+    Returns the (created, id) of the first record on each sitemap page. The boundaries are
+    found in a single cursor pass over the records, and kept until the index version
+    changes, so the pages do not shift while the index is being updated.
+
+    :param page_size: The number of URLs in each sitemap page
+    :return: A list of boundaries, one for each page
+    """
+    index_version: Optional[str] = await get_index_version()
+
+    async with _get_page_boundaries_lock():
+        if (
+            _page_boundaries["boundaries"]
+            and _page_boundaries["version"] == index_version
+        ):
+            return _page_boundaries["boundaries"]
+
+        res = await SolrConnection.search(
+            {
+                "query": "*:*",
+                "filter": SITEMAP_FILTERS,
+                "fields": ["id", "created"],
+                "sort": SITEMAP_SORT,
+                "limit": 10000,
+            },
+            cursor=True,
+            handler="/query",
+        )
+
+        boundaries: list[tuple[str, str]] = []
+        num_records: int = 0
+        async for result in res:
+            if num_records % page_size == 0:
+                boundaries.append((result["created"], result["id"]))
+            num_records += 1
+
+        log.info("Found %s sitemap page boundaries", len(boundaries))
+        _page_boundaries["version"] = index_version
+        _page_boundaries["boundaries"] = boundaries
+
+    return boundaries
+
+
+def keyset_filters(
+    lower: tuple[str, str], upper: Optional[tuple[str, str]]
+) -> list[str]:
+    """
+    Selects the records that sort on or after a page boundary, and before the boundary
+    of the next page, if there is one. Bounding the page at both ends means records
+    added or removed since the boundaries were found only change the pages they fall
+    on, rather than shifting every later page.
+
+    :param lower: The (created, id) of the first record on the page
+    :param upper: The (created, id) of the first record on the next page, or None for
+        the last page
+    """
+    created, docid = lower
+    filters: list[str] = [
+        f'created:{{{created} TO *] OR (created:"{created}" AND id:["{docid}" TO *])'
+    ]
+
+    if upper:
+        next_created, next_docid = upper
+        filters.append(
+            f'created:[* TO {next_created}}} OR (created:"{next_created}" AND id:[* TO "{next_docid}"}})'
+        )
+
+    return filters
@@ -4,7 +4,15 @@ from typing import Optional
 
 from sanic import Blueprint, response
 
-from data_export_server.resources.opengraph import OpenGraph, OpenGraphSvg
+from data_export_server.resources.og_images import (
+    image_cache_path,
+    is_current,
+    render_card_png,
+    render_card_svg,
+)
+from data_export_server.resources.opengraph import OpenGraph
+from shared_helpers.caches import LRUCache
+from shared_helpers.identifiers import get_site
 from shared_helpers.resvg import render_svg
 from shared_helpers.solr_connection import SolrConnection
 
@@ -62,46 +70,50 @@ def render_og_tmpl(req, record_obj: dict) -> str:
     return rendered_template
 
 
-@opengraph_blueprint.route("/sources/<source_id:str>")
-async def og_source(req, source_id: str) -> response.HTTPResponse:
-    source_record: dict = await SolrConnection.get(
-        f"source_{source_id}", fields=SOLR_FIELDS, handler="/fetch"
-    )
+async def og_card_response(req, record_id: str) -> response.HTTPResponse:
+    """
+    Responds with the OpenGraph card for a record. Rendered cards are cached by record,
+    bot, and the time the record was last updated, so a burst of bots following a shared
+    link only fetches the 'updated' field from Solr.
+    """
+    card_cache: LRUCache = req.app.ctx.og_card_cache
+    bot: str = req.headers.get("X-RO-BotIdentifier", BotIdentifiers.GOOGLE)
 
-    if not source_record:
+    record_stamp: Optional[dict] = await SolrConnection.get(
+        record_id, fields=["updated"], handler="/fetch"
+    )
+    if not record_stamp:
         return response.text("Not Found.", status=404)
 
-    resp: str = render_og_tmpl(req, source_record)
-
-    return response.html(resp)
-
+    cache_key: tuple = (record_id, bot, record_stamp.get("updated"), get_site(req))
+    if cached_card := card_cache.get(cache_key):
+        return response.html(cached_card)
 
-@opengraph_blueprint.route("/people/<person_id:str>")
-async def og_person(req, person_id: str):
-    person_record: dict = await SolrConnection.get(
-        f"person_{person_id}", fields=SOLR_FIELDS, handler="/fetch"
+    record: Optional[dict] = await SolrConnection.get(
+        record_id, fields=SOLR_FIELDS, handler="/fetch"
     )
-
-    if not person_record:
+    if not record:
         return response.text("Not Found.", status=404)
 
-    resp: str = render_og_tmpl(req, person_record)
+    resp: str = render_og_tmpl(req, record)
+    card_cache.set(cache_key, resp)
 
     return response.html(resp)
 
 
-@opengraph_blueprint.route("/institutions/<institution_id:str>")
-async def og_institution(req, institution_id: str):
-    institution_record: dict = await SolrConnection.get(
-        f"institution_{institution_id}", fields=SOLR_FIELDS, handler="/fetch"
-    )
+@opengraph_blueprint.route("/sources/<source_id:str>")
+async def og_source(req, source_id: str) -> response.HTTPResponse:
+    return await og_card_response(req, f"source_{source_id}")
 
-    if not institution_record:
-        return response.text("Not Found.", status=404)
 
-    resp: str = render_og_tmpl(req, institution_record)
+@opengraph_blueprint.route("/people/<person_id:str>")
+async def og_person(req, person_id: str):
+    return await og_card_response(req, f"person_{person_id}")
 
-    return response.html(resp)
+
+@opengraph_blueprint.route("/institutions/<institution_id:str>")
+async def og_institution(req, institution_id: str):
+    return await og_card_response(req, f"institution_{institution_id}")
 
 
 @opengraph_blueprint.route("/img/<image_name:str>/")
@@ -120,6 +132,21 @@ async def og_image(req, image_name: str):
     #  7. Respond to the request with the PNG data.
     #  8. Delete the tempfile
     record_id: str = image_name.removesuffix(".png")
+
+    # Images are kept in the cache directory, either by an earlier request or by the
+    # batch generation job, and are used until the record is indexed again.
+    cache_dir: Optional[str] = cfg["social"].get("image_cache_dir")
+    if cache_dir:
+        cached_image = image_cache_path(cache_dir, record_id)
+        record_stamp: Optional[dict] = await SolrConnection.get(
+            record_id, fields=["indexed"], handler="/fetch"
+        )
+        if not record_stamp:
+            return response.text(f"Could not retrieve {record_id}", status=404)
+
+        if is_current(cached_image, record_stamp.get("indexed")):
+            return response.raw(cached_image.read_bytes(), content_type="image/png")
+
     record: Optional[dict] = await SolrConnection.get(
         record_id, fields=SOLR_FIELDS, handler="/fetch"
     )
@@ -127,12 +154,18 @@ async def og_image(req, image_name: str):
     if not record:
         return response.text(f"Could not retrieve {record_id}", status=404)
 
-    tmpl_data: dict = OpenGraphSvg(record, context={"request": req}).data
+    rendered_svg: str = render_card_svg(record, req.app.ctx.template_env)
 
-    svg_tmpl = req.app.ctx.template_env.get_template(
-        "opengraph/card_image_template.svg.j2"
-    )
-    rendered_svg: str = svg_tmpl.render(**tmpl_data)
+    if cache_dir:
+        if not render_card_png(
+            rendered_svg,
+            cached_image,
+            cfg["social"]["resvg"],
+            cfg["social"]["font_path"],
+        ):
+            return response.text("Failure to create image", status=500)
+
+        return response.raw(cached_image.read_bytes(), content_type="image/png")
 
     # Create the temporary image file
     fd, tmpfile = tempfile.mkstemp()
@@ -1,31 +1,79 @@
-import math
+import gzip
 import re
 from typing import Optional
 
 from sanic import Blueprint, response
 
 from small_asc.client import Results
+from data_export_server.resources.sitemap import (
+    SITEMAP_FILTERS,
+    SITEMAP_INDEX_FILE,
+    SITEMAP_SORT,
+    build_sitemap_snapshot,
+    get_page_boundaries,
+    keyset_filters,
+    load_snapshot_file,
+    page_file,
+    snapshot_path,
+)
 from shared_helpers.identifiers import get_site, ID_SUB, get_url_from_type
+from shared_helpers.index_version import get_index_version
 from shared_helpers.solr_connection import SolrConnection
 
 sitemap_blueprint: Blueprint = Blueprint("sitemap")
 
 
+async def snapshot_response(req, filename: str) -> Optional[response.HTTPResponse]:
+    """
+    Returns a sitemap file from the snapshot for the current index version. If there is
+    no snapshot yet, a build is started in the background and None is returned, so that
+    the sitemap can be queried from Solr in the meantime.
+    """
+    snapshot_dir: Optional[str] = req.app.ctx.config["sitemap"].get("snapshot_dir")
+    if not snapshot_dir:
+        return None
+
+    index_version: Optional[str] = await get_index_version()
+    if not index_version:
+        return None
+
+    if not snapshot_path(snapshot_dir, index_version).exists():
+        req.app.add_task(
+            build_sitemap_snapshot(
+                get_site(req),
+                req.app.ctx.config["sitemap"]["pagesize"],
+                req.app.ctx.template_env,
+                snapshot_dir,
+                index_version,
+            )
+        )
+        return None
+
+    content: Optional[bytes] = load_snapshot_file(snapshot_dir, index_version, filename)
+    if content is None:
+        return response.text("Not Found.", status=404)
+
+    # Nearly all crawlers accept gzip, so the files are sent as they are stored.
+    if "gzip" in req.headers.get("Accept-Encoding", ""):
+        return response.raw(
+            content,
+            content_type="application/xml",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+
+    return response.raw(gzip.decompress(content), content_type="application/xml")
+
+
 @sitemap_blueprint.route("sitemap.xml")
 async def sitemap_root(req):
+    if snapshot := await snapshot_response(req, SITEMAP_INDEX_FILE):
+        return snapshot
+
     site: str = get_site(req)
     page_size: int = req.app.ctx.config["sitemap"]["pagesize"]
 
-    solr_query = {
-        "query": "*:*",
-        "filter": [
-            "type:person OR type:source OR type:institution",
-            "!project_s:[* TO *]",
-        ],
-        "limit": 0,
-    }
-    res: Results = await SolrConnection.search(solr_query, handler="/query")
-    num_pages: int = math.ceil(res.hits / page_size)
+    boundaries: list = await get_page_boundaries(page_size)
+    num_pages: int = len(boundaries)
 
     tmpl_vars = {"sitemap_pages": num_pages, "site": site}
 
@@ -45,27 +93,36 @@ async def sitemap_page(req, page_num: str):
     if pnum < 1:
         pnum = 1
 
+    if snapshot := await snapshot_response(req, page_file(pnum)):
+        return snapshot
+
     cfg = req.app.ctx.config
 
     page_size: int = cfg["sitemap"]["pagesize"]
-    offset: int = 0 if pnum == 1 else ((pnum - 1) * page_size)
-
-    solr_query = {
-        "query": "*:*",
-        "filter": [
-            "type:person OR type:source OR type:institution",
-            "!project_s:[* TO *]",
-        ],
-        "limit": page_size,
-        "offset": offset,
-        "fields": ["id", "type", "created", "updated"],
-        "sort": "created asc",
-    }
-
-    res: Results = await SolrConnection.search(solr_query, handler="/query")
+    boundaries: list = await get_page_boundaries(page_size)
+
+    # Each page runs from its boundary to the next one, so no offset is needed.
+    docs: list = []
+    if pnum <= len(boundaries):
+        next_boundary: Optional[tuple] = (
+            boundaries[pnum] if pnum < len(boundaries) else None
+        )
+        solr_query = {
+            "query": "*:*",
+            "filter": [
+                *SITEMAP_FILTERS,
+                *keyset_filters(boundaries[pnum - 1], next_boundary),
+            ],
+            "limit": page_size,
+            "fields": ["id", "type", "created", "updated"],
+            "sort": SITEMAP_SORT,
+        }
+
+        res: Results = await SolrConnection.search(solr_query, handler="/query")
+        docs = res.docs
 
     urlentries: list = []
-    for result in res.docs:
+    for result in docs:
         restype: str = result["type"]
         resid: str = re.sub(ID_SUB, "", result["id"])
 
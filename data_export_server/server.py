@@ -1,10 +1,16 @@
 import sentry_sdk
 import yaml
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    select_autoescape,
+)
 from sanic import Sanic
 
 from data_export_server.routes.sitemap import sitemap_blueprint
 from data_export_server.routes.opengraph import opengraph_blueprint
+from shared_helpers.caches import LRUCache
 
 app = Sanic("mp_dataexport")
 config: dict = yaml.safe_load(open("configuration.yml", "r"))
@@ -33,13 +39,21 @@ if debug_mode is False:
         release=f"muscatplus_server@{release}",
     )
 
+# Compiled templates are cached on disk, so that each worker does not need to compile
+# them again. Outside of debug mode the templates are not checked for changes.
 template_env = Environment(
     loader=FileSystemLoader("data_export_server/templates"),
     autoescape=select_autoescape(["xml"]),
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=debug_mode,
 )
 
 app.ctx.template_env = template_env
 
+app.ctx.og_card_cache = LRUCache(
+    "og_cards", config["social"].get("card_cache_size", 4096)
+)
+
 # register routes with their blueprints
 app.blueprint(sitemap_blueprint)
 app.blueprint(opengraph_blueprint)
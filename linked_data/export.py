@@ -1,10 +1,15 @@
 import argparse
 import asyncio
 import concurrent.futures
+import gzip
 import logging.config
+import os
+import re
 import sqlite3
 import subprocess
+import sys
 import timeit
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
@@ -13,22 +18,40 @@ import rdflib
 import uvloop
 import yaml
 from orjson import orjson
-from sanic.compat import Header
-from sanic.models.protocol_types import TransportProtocol
-from sanic.request import Request
 from small_asc.client import Solr
 
+from linked_data.stats import ExportStats, merge_stats
+from linked_data.state import (
+    STATE_DB_NAME,
+    add_current_ids,
+    begin_id_sync,
+    clear_deleted,
+    finish_id_sync,
+    get_deleted,
+    get_setting,
+    get_watermark,
+    open_state,
+    record_deleted,
+    set_setting,
+    set_watermark,
+)
 from search_server.resources.institutions.institution import Institution
 from search_server.resources.people.person import Person
 from search_server.resources.sources.full_source import FullSource
-from search_server.server import app
+from search_server.routes import blueprints
 from shared_helpers.jsonld import (
     RISM_JSONLD_SOURCE_CONTEXT,
     RISM_JSONLD_PERSON_CONTEXT,
     RISM_JSONLD_INSTITUTION_CONTEXT,
     RISM_JSONLD_DEFAULT_CONTEXT,
+    RouteContextMap,
 )
+from shared_helpers.identifiers import ID_SUB, get_identifier
 from shared_helpers.languages import load_translations, filter_languages
+from shared_helpers.serializer_context import (
+    SerializerContext,
+    url_templates_from_blueprints,
+)
 
 
 log_config: dict = yaml.safe_load(open("linked_data/logging.yml", "r"))
@@ -43,30 +66,22 @@ solr_conn = Solr(SOLR_SERVER)
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
+# The delay before the first retry of a failed document; doubled on each further attempt.
+RETRY_BACKOFF_SECONDS: float = 2.0
+# How often each worker process logs its progress.
+PROGRESS_INTERVAL_SECONDS: float = 30.0
 
-# Mock route for the request
-class Route:
-    def __init__(self):
-        self.name = ""
 
-
-# Alters the response to make all the URIs appear to be coming from the production site.
-# Since every URL in the serializers runs through the `get_identifier` function, it will
-# pick up on this info for constructing the URI.
-headers: Header = Header(
-    {
-        "X-Forwarded-Proto": "https",
-        "X-Forwarded-Host": "rism.online",
-    }
-)
 translations: dict = load_translations("locales/")
 filt_translations: dict = filter_languages({"en"}, translations)
 
-route = Route()
-
-req = Request(bytes("/foo", "ascii"), headers, "", "GET", TransportProtocol(), app)
-req.ctx.translations = filt_translations
-req.route = route
+# Stands in for the request in the serializers. All the URIs are constructed as if
+# they were coming from the production site.
+req = SerializerContext(
+    "https://rism.online",
+    filt_translations,
+    url_templates_from_blueprints(blueprints),
+)
 
 serializer_map: dict = {
     "source": FullSource,
@@ -74,6 +89,20 @@ serializer_map: dict = {
     "institution": Institution,
 }
 
+# Maps a record type to the route and route argument used to construct its URI. The URI
+# is used as the name of the graph for each record in the incremental (N-Quads) output.
+record_route_map: dict = {
+    "source": ("sources.source", "source_id"),
+    "person": ("people.person", "person_id"),
+    "institution": ("institutions.institution", "institution_id"),
+}
+
+# The table that holds the serialized records for each output format.
+format_table_map: dict = {
+    "nt": "serialized",
+    "ndjson": "serialized_json",
+}
+
 
 def to_turtle(data: dict) -> str:
     json_serialized: str = orjson.dumps(data)
@@ -85,86 +114,285 @@ def to_turtle(data: dict) -> str:
     return turtle
 
 
-async def create_id_groups(
-    num_groups: int, record_type: str, country_code: Optional[str]
-) -> list:
-    log.info("Creating ID groups")
+def to_nquads(ntriples: str, graph_uri: str) -> str:
+    """
+    Places each statement of an N-Triples document into a named graph, producing N-Quads.
+    Every N-Triples statement ends with " .", so the graph name can be inserted before it.
+
+    :param ntriples: An N-Triples document
+    :param graph_uri: The URI of the named graph
+    :return: An N-Quads document
+    """
+    return "".join(
+        f"{line[:-1]}<{graph_uri}> .\n"
+        for line in ntriples.splitlines()
+        if line.endswith(" .")
+    )
+
+
+def record_uri(docid: str, record_type: str) -> str:
+    viewname, route_arg = record_route_map[record_type]
+    return get_identifier(req, viewname, **{route_arg: re.sub(ID_SUB, "", docid)})
+
+
+def context_uri(record_type: str) -> str:
+    viewname, _ = record_route_map[record_type]
+    ctx_options = RouteContextMap.get(
+        f"mp_server.{viewname}", RouteContextMap["__default"]
+    )
+    return get_identifier(req, ctx_options.route)
+
+
+# Recorded in the export state, so that shards written with a different assignment
+# of records are not mixed with the current ones.
+PARTITIONER: str = "solr-hash"
+
+
+def id_request(fq: list, partition: int, num_partitions: int) -> dict:
+    """
+    The Solr request for the IDs of one partition of the documents. Solr's hash query
+    parser assigns each document to a partition by a hash of its ID, read from the
+    `partitionKeys` parameter. The assignment is stable across runs, so a record that is
+    re-exported in an incremental run replaces its previous version in the same shard.
+    With a single partition there is nothing to split, and the hash filter is left out.
+    """
+    request: dict = {
+        "query": "*:*",
+        "filter": fq,
+        "fields": ["id"],
+        "sort": "id asc",
+        "limit": 1000,
+    }
+
+    if num_partitions > 1:
+        request["filter"] = [
+            *fq,
+            f"{{!hash workers={num_partitions} worker={partition}}}",
+        ]
+        request["params"] = {"partitionKeys": "id"}
+
+    return request
+
+
+def base_filters(record_type: str, country_code: Optional[str]) -> list:
     fq = [f"type:{record_type}", "!project_s:[* TO *]"]
 
     if record_type == "source" and country_code:
         fq.append(f"country_codes_sm:{country_code}")
 
-    fl = ["id"]
+    return fq
+
 
+def export_filters(
+    record_type: str,
+    country_code: Optional[str],
+    since: Optional[tuple[str, str]] = None,
+) -> list:
+    fq = base_filters(record_type, country_code)
+
+    # Only select the documents that have changed since the last export.
+    if since:
+        since_field, since_value = since
+        fq.append(f"{since_field}:[{since_value} TO *]")
+
+    return fq
+
+
+async def count_documents(fq: list) -> int:
+    res = await solr_conn.search({"query": "*:*", "filter": fq, "limit": 0})
+    return res.hits
+
+
+async def sync_known_ids(
+    stateconn, record_type: str, country_code: Optional[str]
+) -> list[str]:
+    """
+    Walks all the IDs currently in the index for a record type and diffs them against the
+    IDs recorded by the previous export.
+
+    :return: A list of IDs that have been deleted since the previous export.
+    """
+    log.info("Checking for deleted %s records", record_type)
     res = await solr_conn.search(
-        {"query": "*:*", "filter": fq, "fields": fl, "sort": "id asc", "limit": 1000},
+        {
+            "query": "*:*",
+            "filter": base_filters(record_type, country_code),
+            "fields": ["id"],
+            "sort": "id asc",
+            "limit": 1000,
+        },
         cursor=True,
     )
-    log.debug("Gathering groups")
-    id_list: list = [sdoc["id"] async for sdoc in res]
 
-    log.debug("Gathering done, found %s total IDs", res.hits)
-    split_groups: list = [id_list[g::num_groups] for g in range(num_groups)]
+    begin_id_sync(stateconn)
+    batch: list[str] = []
+    async for sdoc in res:
+        batch.append(sdoc["id"])
+        if len(batch) >= 10000:
+            add_current_ids(stateconn, batch)
+            batch = []
+    add_current_ids(stateconn, batch)
+
+    deleted: list[str] = finish_id_sync(stateconn, record_type)
+    log.info("Found %s deleted %s records", len(deleted), record_type)
+
+    return deleted
 
-    log.info(
-        "Created %s groups from %s documents, first has %s IDs, last has %s IDs",
-        len(split_groups),
-        res.hits,
-        len(split_groups[0]),
-        len(split_groups[-1]),
-    )
 
-    return split_groups
+class DocumentNotFound(Exception):
+    pass
+
+
+async def fetch_and_serialize(
+    docid: str,
+    serializer,
+    ctx_val: dict,
+    session,
+    output_format: str,
+    stats: ExportStats,
+) -> tuple:
+    with stats.timer("fetch"):
+        this_doc = await solr_conn.get(docid)
+
+    if this_doc is None:
+        raise DocumentNotFound(f"No document for {docid}")
+    stats.incr("fetched")
+
+    with stats.timer("serialize"):
+        serialized = await serializer(
+            this_doc,
+            context={"request": req, "direct_request": True, "session": session},
+        ).data
+    stats.incr("serialized")
+
+    with stats.timer("convert"):
+        # JSON-LD output skips the RDF conversion entirely; the document is written as-is.
+        if output_format == "ndjson":
+            output: str = orjson.dumps({**ctx_val, **serialized}).decode("utf-8")
+        else:
+            serialized.update(ctx_val)
+            output = to_turtle(serialized)
+    stats.incr("converted")
+
+    if not output:
+        log.critical("No output! %s", docid)
+
+    return this_doc["type"], output
 
 
 async def run_serializer(
-    docid: str, serializer, ctx_val: dict, semaphore, session, sqlconn
+    docid: str,
+    record_type: str,
+    serializer,
+    ctx_val: dict,
+    semaphore,
+    session,
+    sqlconn,
+    retries: int,
+    output_format: str,
+    stats: ExportStats,
 ) -> None:
-    async with semaphore:
-        log.debug("Serializing %s", docid)
+    # Records that were already written in this run are skipped, so that a resumed
+    # run only does the outstanding work.
+    if sqlconn.execute("SELECT 1 FROM delta WHERE id = ?", (docid,)).fetchone():
+        log.debug("Skipping %s; already serialized", docid)
+        stats.incr("skipped")
+        return None
 
-        try:
-            this_doc = await solr_conn.get(docid)
-        except Exception as e:
-            log.critical(
-                "=========== Exception raised in get request for source %s: %s",
-                docid,
-                e,
+    last_error: str = ""
+
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            # Back off exponentially, outside the semaphore, so that a struggling Solr
+            # server gets some breathing room without blocking the other documents.
+            delay: float = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            log.warning(
+                "Retrying %s in %ss (attempt %s of %s)", docid, delay, attempt, retries
             )
-            return None
+            await asyncio.sleep(delay)
 
-        if this_doc is None:
-            log.error("No document for %s", docid)
+        async with semaphore:
+            log.debug("Serializing %s", docid)
 
-        try:
-            serialized = await serializer(
-                this_doc,
-                context={"request": req, "direct_request": True, "session": session},
-            ).data
-        except Exception as e:
-            log.critical(
-                "=========== Exception raised in serializer for source %s: %s", docid, e
-            )
+            try:
+                doc_type, output = await fetch_and_serialize(
+                    docid, serializer, ctx_val, session, output_format, stats
+                )
+            except DocumentNotFound as e:
+                # The document was deleted after its ID was listed. Retrying will not
+                # bring it back, and the ID sync after the export handles deletions.
+                log.warning("%s; skipping it", e)
+                stats.incr("missing")
+                return None
+            except Exception as e:
+                last_error = f"{type(e).__name__}: {e}"
+                log.error("Exception raised serializing %s: %s", docid, last_error)
+                continue
+
+            with stats.timer("write"), sqlconn:
+                # The table name comes from format_table_map, never from the input.
+                sqlconn.execute(
+                    f"INSERT OR REPLACE INTO {format_table_map[output_format]} VALUES (?, ?, ?)",  # noqa: S608
+                    (docid, doc_type, output),
+                )
+                sqlconn.execute(
+                    "INSERT OR REPLACE INTO delta VALUES (?, ?)",
+                    (docid, doc_type),
+                )
+                sqlconn.execute("DELETE FROM failed WHERE id = ?", (docid,))
+            stats.incr("written")
+
+            await asyncio.sleep(0.5)
             return None
 
-        serialized.update(ctx_val)
-        turtle: str = to_turtle(serialized)
-        if not turtle:
-            log.critical("No output! %s", docid)
+    log.critical(
+        "Giving up on %s after %s attempts: %s", docid, retries + 1, last_error
+    )
+    record_failure(sqlconn, docid, record_type, last_error, retries + 1)
+    stats.incr("failed")
+    return None
 
-        with sqlconn:
-            sqlconn.execute(
-                "INSERT INTO serialized VALUES (?, ?, ?)",
-                (docid, this_doc["type"], turtle),
-            )
 
-        sqlconn.commit()
-        await asyncio.sleep(0.5)
+def record_failure(
+    sqlconn, docid: str, record_type: str, error: str, attempts: int
+) -> None:
+    with sqlconn:
+        sqlconn.execute(
+            "INSERT OR REPLACE INTO failed VALUES (?, ?, ?, ?)",
+            (docid, record_type, error, attempts),
+        )
+
+
+def _log_task_exception(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        log.critical(
+            "===========================================   Exception raised! %s",
+            task.exception(),
+        )
+
 
+async def report_progress(stats: ExportStats, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        log.info(stats.progress())
 
-async def serialize(id_group: list, record_type: str, semaphore, dbname: str) -> None:
-    log.debug("Actually serializing! Processing %s IDs", len(id_group))
-    if record_type == "source":
+
+async def serialize(
+    fq: list,
+    record_type: str,
+    partition: int,
+    num_partitions: int,
+    semaphore,
+    in_flight,
+    dbname: str,
+    retries: int,
+    output_format: str,
+    stats: ExportStats,
+) -> None:
+    if output_format == "ndjson":
+        # Referencing the context, rather than embedding it, keeps each line compact.
+        ctx_val = {"@context": context_uri(record_type)}
+    elif record_type == "source":
         ctx_val = {"@context": RISM_JSONLD_SOURCE_CONTEXT}
     elif record_type == "person":
         ctx_val = {"@context": RISM_JSONLD_PERSON_CONTEXT}
@@ -184,34 +412,229 @@ async def serialize(id_group: list, record_type: str, semaphore, dbname: str) ->
         )
         return None
 
+    res = await solr_conn.search(id_request(fq, partition, num_partitions), cursor=True)
+    log.debug("Actually serializing! Processing %s IDs", res.hits)
+    stats.total = res.hits
+    reporter = asyncio.create_task(report_progress(stats, PROGRESS_INTERVAL_SECONDS))
+
     sqlconn = sqlite3.connect(dbname)
     async with aiohttp.ClientSession(
         json_serialize=lambda x: orjson.dumps(x).decode("utf-8")
     ) as session:
-        for docid in id_group:
+        async for sdoc in res:
+            await in_flight.acquire()
             task = asyncio.create_task(
-                run_serializer(docid, serializer, ctx_val, semaphore, session, sqlconn)
+                run_serializer(
+                    sdoc["id"],
+                    record_type,
+                    serializer,
+                    ctx_val,
+                    semaphore,
+                    session,
+                    sqlconn,
+                    retries,
+                    output_format,
+                    stats,
+                )
             )
             tasks.add(task)
             task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: in_flight.release())
+            task.add_done_callback(_log_task_exception)
 
-        for coro in asyncio.as_completed(tasks):
-            try:
-                _ = await coro
-            except Exception as e:
-                log.critical(
-                    "===========================================   Exception raised! %s",
-                    e,
-                )
+        if tasks:
+            await asyncio.wait(tasks)
 
+    reporter.cancel()
     sqlconn.commit()
     sqlconn.close()
 
 
-def do_serialize(id_group: list, resource_type: str, dbname: str):
+def do_serialize(
+    fq: list,
+    resource_type: str,
+    dbname: str,
+    retries: int,
+    output_format: str,
+    partition: int,
+    num_partitions: int,
+) -> dict:
     num_async_procs: int = 10
     semaphore = asyncio.Semaphore(num_async_procs)
-    asyncio.run(serialize(id_group, resource_type, semaphore, dbname))
+    # Bounds the number of documents waiting to be serialized, so that the cursor does
+    # not run ahead of the serializers and pull the whole partition into memory.
+    in_flight = asyncio.Semaphore(num_async_procs * 10)
+    stats = ExportStats(f"{resource_type} worker {partition}")
+    asyncio.run(
+        serialize(
+            fq,
+            resource_type,
+            partition,
+            num_partitions,
+            semaphore,
+            in_flight,
+            dbname,
+            retries,
+            output_format,
+            stats,
+        )
+    )
+    log.info(stats.progress())
+
+    return stats.to_dict()
+
+
+def remove_deleted(deleted: list[str], parallel_processes: int, output: Path) -> None:
+    for i in range(parallel_processes):
+        sqlconn = sqlite3.connect(str(Path(output, f"output_{i}.db")))
+        with sqlconn:
+            # The table names come from format_table_map, never from the input.
+            for table in format_table_map.values():
+                sqlconn.executemany(
+                    f"DELETE FROM {table} WHERE id = ?",  # noqa: S608
+                    ((d,) for d in deleted),
+                )
+        sqlconn.close()
+
+
+def count_failures(parallel_processes: int, output: Path, record_type: str) -> int:
+    total: int = 0
+    for i in range(parallel_processes):
+        sqlconn = sqlite3.connect(str(Path(output, f"output_{i}.db")))
+        total += sqlconn.execute(
+            "SELECT COUNT(*) FROM failed WHERE type = ?", (record_type,)
+        ).fetchone()[0]
+        sqlconn.close()
+
+    return total
+
+
+def write_failure_report(parallel_processes: int, output: Path) -> int:
+    """
+    Writes the IDs that could not be serialized, even after retrying, to a report
+    in the output directory. Running the export again with --resume will retry them.
+
+    :return: The number of unrecoverable IDs
+    """
+    report_path = Path(output, "failed_ids.tsv")
+    num_failed: int = 0
+
+    with open(report_path, "w") as report_out:
+        report_out.write("id\ttype\tattempts\terror\n")
+        for i in range(parallel_processes):
+            sqlconn = sqlite3.connect(str(Path(output, f"output_{i}.db")))
+            for docid, rec_type, error, attempts in sqlconn.execute(
+                "SELECT id, type, error, attempts FROM failed ORDER BY id"
+            ):
+                report_out.write(f"{docid}\t{rec_type}\t{attempts}\t{error}\n")
+                num_failed += 1
+            sqlconn.close()
+
+    if num_failed:
+        log.critical(
+            "%s documents could not be exported; see %s", num_failed, str(report_path)
+        )
+    else:
+        log.info("All documents were exported successfully")
+
+    return num_failed
+
+
+def write_delta(
+    parallel_processes: int, output: Path, run_stamp: str, deleted: dict
+) -> None:
+    """
+    Writes the changes from an incremental run so that they can be applied to a triple store.
+    Each changed record is written to an N-Quads file in its own named graph, where the
+    graph name is the URI of the record. A SPARQL Update file drops the previous graphs
+    for all changed and deleted records, and should be applied before loading the N-Quads.
+
+    :param parallel_processes: The number of output shards
+    :param output: The output directory
+    :param run_stamp: The timestamp of this run; used to name the delta directory
+    :param deleted: A dictionary of record type to a list of deleted IDs
+    :return: None
+    """
+    delta_path = Path(output, "delta", run_stamp.replace(":", ""))
+    delta_path.mkdir(parents=True, exist_ok=True)
+    log.info("Writing incremental changes to %s", str(delta_path))
+
+    drop_graphs: list[str] = []
+
+    for i in range(parallel_processes):
+        sqlconn = sqlite3.connect(str(Path(output, f"output_{i}.db")))
+        sql_stmt: str = (
+            "SELECT s.id, s.type, s.ttl FROM serialized s JOIN delta d ON s.id = d.id"
+        )
+
+        with open(Path(delta_path, f"changes_{i}.nq"), "w") as nq_out:
+            for docid, rec_type, ntriples in sqlconn.execute(sql_stmt):
+                graph_uri: str = record_uri(docid, rec_type)
+                drop_graphs.append(graph_uri)
+                nq_out.write(to_nquads(ntriples, graph_uri))
+
+        sqlconn.close()
+
+    for rec_type, deleted_ids in deleted.items():
+        drop_graphs.extend(record_uri(d, rec_type) for d in deleted_ids)
+
+    with open(Path(delta_path, "drop_graphs.ru"), "w") as ru_out:
+        for graph_uri in drop_graphs:
+            ru_out.write(f"DROP SILENT GRAPH <{graph_uri}> ;\n")
+
+    log.info(
+        "Wrote %s changed and %s deleted records",
+        len(drop_graphs) - sum(len(v) for v in deleted.values()),
+        sum(len(v) for v in deleted.values()),
+    )
+
+
+def write_json_delta(
+    parallel_processes: int, output: Path, run_stamp: str, deleted: dict
+) -> None:
+    """
+    Writes the changes from an incremental JSON-LD run. The changed records are written
+    as compressed JSON-LD lines, and the URIs of the deleted records to a separate file.
+    """
+    delta_path = Path(output, "delta", run_stamp.replace(":", ""))
+    delta_path.mkdir(parents=True, exist_ok=True)
+    log.info("Writing incremental changes to %s", str(delta_path))
+
+    num_changed: int = 0
+    for i in range(parallel_processes):
+        sqlconn = sqlite3.connect(str(Path(output, f"output_{i}.db")))
+        sql_stmt: str = (
+            "SELECT s.doc FROM serialized_json s JOIN delta d ON s.id = d.id"
+        )
+
+        with gzip.open(Path(delta_path, f"changes_{i}.ndjson.gz"), "wt") as json_out:
+            for (doc,) in sqlconn.execute(sql_stmt):
+                json_out.write(f"{doc}\n")
+                num_changed += 1
+
+        sqlconn.close()
+
+    num_deleted: int = 0
+    with open(Path(delta_path, "deleted.txt"), "w") as deleted_out:
+        for rec_type, deleted_ids in deleted.items():
+            for docid in deleted_ids:
+                deleted_out.write(f"{record_uri(docid, rec_type)}\n")
+                num_deleted += 1
+
+    log.info("Wrote %s changed and %s deleted records", num_changed, num_deleted)
+
+
+def write_json_output(parallel_processes: int, output: Path) -> None:
+    for i in range(parallel_processes):
+        db_name = Path(output, f"output_{i}.db")
+        json_path = Path(output, f"output_{i}.ndjson.gz")
+        log.info("Writing JSON-LD output to %s", str(json_path))
+
+        sqlconn = sqlite3.connect(str(db_name))
+        with gzip.open(json_path, "wt") as json_out:
+            for (doc,) in sqlconn.execute("SELECT doc FROM serialized_json"):
+                json_out.write(f"{doc}\n")
+        sqlconn.close()
 
 
 def main(args: argparse.Namespace, parallel_processes: int) -> bool:
@@ -226,6 +649,10 @@ def main(args: argparse.Namespace, parallel_processes: int) -> bool:
 
     log.info(f"Running with {parallel_processes} processes")
 
+    if args.resume and (args.empty or args.discard):
+        log.critical("An export cannot be both resumed and emptied or discarded.")
+        return False
+
     if args.empty:
         for i in range(parallel_processes):
             db_file = Path(args.output, f"output_{i}.db")
@@ -233,6 +660,101 @@ def main(args: argparse.Namespace, parallel_processes: int) -> bool:
                 log.info("Removing %s", str(db_file))
                 db_file.unlink(missing_ok=True)
 
+        state_file = Path(args.output, STATE_DB_NAME)
+        if state_file.exists():
+            log.info("Removing %s", str(state_file))
+            state_file.unlink(missing_ok=True)
+
+    stateconn = open_state(output_path)
+
+    # Records are assigned to shards by a hash of their ID, so an incremental or resumed run
+    # can only replace records in place if it uses the same number of shards, and the same
+    # hash, as the previous run.
+    previous_shards: Optional[str] = get_setting(stateconn, "num_shards")
+    previous_partitioner: Optional[str] = get_setting(stateconn, "partitioner")
+    if (args.incremental or args.resume) and previous_shards:
+        if int(previous_shards) != parallel_processes:
+            log.critical(
+                "The previous export used %s shards, but this run uses %s. Run a full export with --empty instead.",
+                previous_shards,
+                parallel_processes,
+            )
+            return False
+
+        if previous_partitioner != PARTITIONER:
+            log.critical(
+                "The previous export assigned records to shards differently. Run a full export with --empty instead."
+            )
+            return False
+
+    # The watermarks are shared between the output formats, so an incremental or resumed run
+    # in one format cannot follow a run in another.
+    previous_format: Optional[str] = get_setting(stateconn, "format")
+    if (
+        (args.incremental or args.resume)
+        and previous_format
+        and previous_format != args.format
+    ):
+        log.critical(
+            "The previous export was written as %s, but this run uses %s. Run a full export with --empty instead.",
+            previous_format,
+            args.format,
+        )
+        return False
+
+    # The known IDs and the watermarks cover the records selected by the country filter,
+    # so an incremental or resumed run with a different filter would take every record
+    # outside its own selection to be deleted.
+    previous_country: Optional[str] = get_setting(stateconn, "country")
+    if (
+        (args.incremental or args.resume)
+        and previous_country is not None
+        and previous_country != (args.country or "")
+    ):
+        log.critical(
+            "The previous export used the country filter '%s', but this run uses '%s'. Run a full export with --empty instead.",
+            previous_country,
+            args.country or "",
+        )
+        return False
+
+    set_setting(stateconn, "num_shards", str(parallel_processes))
+    set_setting(stateconn, "partitioner", PARTITIONER)
+    set_setting(stateconn, "format", args.format)
+    set_setting(stateconn, "country", args.country or "")
+
+    # The run stamp is taken before any documents are queried, so that documents updated
+    # while the export is running will be picked up again by the next incremental run. A
+    # resumed run keeps the stamp of the run it is resuming.
+    run_stamp: str
+    unfinished_run: Optional[str] = get_setting(stateconn, "current_run")
+    resuming: bool = bool(args.resume and unfinished_run)
+
+    if unfinished_run and not args.resume and not args.discard:
+        # The known IDs and the completed types of the unfinished run have already
+        # advanced, so starting afresh would lose the changes it has not yet written.
+        log.critical(
+            "The export started at %s did not finish. Finish it with --resume, or discard it with --discard.",
+            unfinished_run,
+        )
+        return False
+
+    if resuming:
+        log.info("Resuming the export started at %s", unfinished_run)
+        run_stamp = unfinished_run
+    else:
+        if args.resume:
+            log.warning("There is no unfinished export to resume; starting a new one.")
+        elif unfinished_run:
+            log.warning(
+                "Discarding the export started at %s; its changes will not be written to a delta.",
+                unfinished_run,
+            )
+        # datetime.UTC is only available from Python 3.11.
+        run_stamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")  # noqa: UP017
+        set_setting(stateconn, "current_run", run_stamp)
+        clear_deleted(stateconn)
+
     for i in range(parallel_processes):
         db_file = Path(args.output, f"output_{i}.db")
         db_name = str(db_file)
@@ -240,40 +762,79 @@ def main(args: argparse.Namespace, parallel_processes: int) -> bool:
         sqlconn = sqlite3.connect(db_name)
         sql_stmt: str = f"CREATE TABLE IF NOT EXISTS serialized(id TEXT PRIMARY KEY, type TEXT, ttl TEXT)"
         sqlconn.execute(sql_stmt)
+        sqlconn.execute(
+            "CREATE TABLE IF NOT EXISTS serialized_json(id TEXT PRIMARY KEY, type TEXT, doc TEXT)"
+        )
+        # The delta table tracks the records that were (re-)serialized in this run, and
+        # the failed table the records that could not be serialized. Both are kept
+        # when resuming, so that only the outstanding work is done.
+        if not resuming:
+            sqlconn.execute("DROP TABLE IF EXISTS delta")
+            sqlconn.execute("DROP TABLE IF EXISTS failed")
+        sqlconn.execute(
+            "CREATE TABLE IF NOT EXISTS delta(id TEXT PRIMARY KEY, type TEXT)"
+        )
+        sqlconn.execute(
+            "CREATE TABLE IF NOT EXISTS failed(id TEXT PRIMARY KEY, type TEXT, error TEXT, attempts INTEGER)"
+        )
         sqlconn.commit()
         sqlconn.close()
 
+    run_stats: dict = {}
+
     for rec_type in types_to_serialize:
+        if resuming and get_setting(stateconn, f"completed_{rec_type}") == run_stamp:
+            log.info("Skipping %s; it was completed in the run being resumed", rec_type)
+            continue
+
         log.info("Running serializer for %s", rec_type)
-        id_groups: list = asyncio.run(
-            create_id_groups(parallel_processes, rec_type, args.country)
-        )
-        log.debug(
-            "Got %s id groups, for %s parallel processes",
-            len(id_groups),
-            parallel_processes,
-        )
-        num_results: int = sum([len(x) for x in id_groups])
+
+        since: Optional[tuple[str, str]] = None
+        if args.incremental:
+            watermark: Optional[str] = get_watermark(
+                stateconn, rec_type, args.since_field
+            )
+            if watermark:
+                log.info(
+                    "Exporting %s records with %s since %s",
+                    rec_type,
+                    args.since_field,
+                    watermark,
+                )
+                since = (args.since_field, watermark)
+            else:
+                log.warning(
+                    "No previous export found for %s; exporting all records", rec_type
+                )
+
+        fq: list = export_filters(rec_type, args.country, since)
+        num_results: int = asyncio.run(count_documents(fq))
         log.info("The number of results we will process is %s", num_results)
         start_serialize = timeit.default_timer()
 
+        # Each process cursors its own hash partition of the documents directly from
+        # Solr, so no process has to wait for the full list of IDs to be gathered.
         futures = []
         with concurrent.futures.ProcessPoolExecutor(parallel_processes) as executor:
             for i in range(parallel_processes):
-                this_group = id_groups[i]
-                if not this_group:
-                    continue
-
                 db_file = Path(args.output, f"output_{i}.db")
                 db_name = str(db_file)
 
                 new_future = executor.submit(
-                    do_serialize, id_groups[i], rec_type, db_name
+                    do_serialize,
+                    fq,
+                    rec_type,
+                    db_name,
+                    args.retries,
+                    args.format,
+                    i,
+                    parallel_processes,
                 )
                 futures.append(new_future)
 
-        for f in concurrent.futures.as_completed(futures):
-            f.result()
+        worker_stats: list[dict] = [
+            f.result() for f in concurrent.futures.as_completed(futures)
+        ]
 
         end_serialize = timeit.default_timer()
         s_elapsed: float = end_serialize - start_serialize
@@ -284,21 +845,83 @@ def main(args: argparse.Namespace, parallel_processes: int) -> bool:
         )
         log.info(f"Total processing rate: {num_results / s_elapsed} docs/s")
 
-    for i in range(parallel_processes):
-        db_name = Path(args.output, f"output_{i}.db")
-        ttl_path = Path(args.output, f"output_{i}.nt")
+        type_stats: dict = merge_stats(worker_stats)
+        type_stats["elapsed"] = s_elapsed
+        run_stats[rec_type] = type_stats
+        log.info(
+            "Documents for %s: %s",
+            rec_type,
+            ", ".join(f"{k} {v}" for k, v in type_stats["counts"].items()),
+        )
+        log.info(
+            "Cumulative stage times for %s: %s",
+            rec_type,
+            ", ".join(f"{k} {v:.1f}s" for k, v in type_stats["timings"].items()),
+        )
+
+        deleted: list[str] = asyncio.run(
+            sync_known_ids(stateconn, rec_type, args.country)
+        )
+        if deleted:
+            remove_deleted(deleted, parallel_processes, args.output)
+            record_deleted(stateconn, rec_type, deleted)
+
+        # If some documents could not be exported, the watermark is left where it was,
+        # so that the next incremental run will select them again.
+        num_failed: int = count_failures(parallel_processes, args.output, rec_type)
+        if num_failed:
+            log.warning(
+                "%s %s documents failed; not advancing the watermark",
+                num_failed,
+                rec_type,
+            )
+        else:
+            set_watermark(stateconn, rec_type, args.since_field, run_stamp)
+            set_setting(stateconn, f"completed_{rec_type}", run_stamp)
+
+    if args.format == "ndjson":
+        write_json_output(parallel_processes, args.output)
+        if args.incremental:
+            write_json_delta(
+                parallel_processes, args.output, run_stamp, get_deleted(stateconn)
+            )
+    else:
+        for i in range(parallel_processes):
+            db_name = Path(args.output, f"output_{i}.db")
+            ttl_path = Path(args.output, f"output_{i}.nt")
+
+            if args.empty:
+                log.info("Removing %s", str(ttl_path))
+                ttl_path.unlink(missing_ok=True)
+
+            with open(ttl_path, "w") as ttl_out:
+                log.info("Writing TTL output to %s", str(ttl_path))
+                sql_stmt = f"SELECT ttl FROM serialized"
 
-        if args.empty:
-            log.info("Removing %s", str(ttl_path))
-            ttl_path.unlink(missing_ok=True)
+                subprocess.run(["sqlite3", str(db_name), sql_stmt], stdout=ttl_out)
 
-        with open(ttl_path, "w") as ttl_out:
-            log.info("Writing TTL output to %s", str(ttl_path))
-            sql_stmt = f"SELECT ttl FROM serialized"
+        if args.incremental:
+            write_delta(
+                parallel_processes, args.output, run_stamp, get_deleted(stateconn)
+            )
+
+    # Leave the run open if anything failed, so that it can be finished with --resume.
+    total_failed: int = write_failure_report(parallel_processes, args.output)
+    if not total_failed:
+        set_setting(stateconn, "current_run", "")
+
+    if args.stats:
+        log.info("Writing export statistics to %s", str(args.stats))
+        args.stats.write_bytes(
+            orjson.dumps(
+                {"run": run_stamp, "processes": parallel_processes, "types": run_stats},
+                option=orjson.OPT_INDENT_2,
+            )
+        )
 
-            subprocess.run(["sqlite3", str(db_name), sql_stmt], stdout=ttl_out)
+    stateconn.close()
 
-    return True
+    return total_failed == 0
 
 
 if __name__ == "__main__":
@@ -321,6 +944,54 @@ if __name__ == "__main__":
         "-q", "--quiet", action="store_true", help="Quiet output (log level WARNING)"
     )
     parser.add_argument("--include", action="extend", nargs="*")
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        help="The number of parallel processes, and output shards (default: the number of CPUs)",
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Only export records that have changed since the last export, and write the changes separately",
+    )
+    parser.add_argument(
+        "--since-field",
+        dest="since_field",
+        default="indexed",
+        choices=["indexed", "updated"],
+        help="The Solr timestamp field used to select changed records in an incremental export. It is compared with the time the previous run started, so 'updated' misses records edited before a run but indexed after it.",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        default="nt",
+        choices=["nt", "ndjson"],
+        help="The output format: N-Triples, or compressed JSON-LD documents, one per line",
+    )
+    parser.add_argument(
+        "-r",
+        "--resume",
+        action="store_true",
+        help="Resume an interrupted export, only serializing the outstanding and failed records",
+    )
+    parser.add_argument(
+        "--discard",
+        action="store_true",
+        help="Discard the state of an unfinished export and start a new one. The changes made in the unfinished export are not written to a delta.",
+    )
+    parser.add_argument(
+        "--stats",
+        type=Path,
+        help="Write the document counts and stage timings for the export to a JSON file",
+    )
+    parser.add_argument(
+        "--retries",
+        default=3,
+        type=int,
+        help="The number of times to retry a document that fails to serialize",
+    )
 
     incoming_args = parser.parse_args()
 
@@ -332,8 +1003,7 @@ if __name__ == "__main__":
         log.setLevel(logging.INFO)
 
     start = timeit.default_timer()
-    # num_procs: int = os.cpu_count()
-    num_procs: int = 6
+    num_procs: int = incoming_args.processes or os.cpu_count() or 1
 
     result: bool = main(incoming_args, num_procs)
 
@@ -344,3 +1014,7 @@ if __name__ == "__main__":
     log.info(
         f"Total time to run: {int(hours):02}:{int(minutes):02}:{round(seconds):02} (Total: {elapsed}s)"
     )
+
+    # Some documents could not be exported, or the export could not start.
+    if not result:
+        sys.exit(1)
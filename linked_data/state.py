@@ -0,0 +1,155 @@
+"""
+Persistent state for the linked data exporter. The state lives in a single SQLite
+database in the output directory and records, per record type, the watermark of the
+last successful export and the set of IDs that were present in the index at that time.
+
+Incremental exports use the watermark to select only the records that have changed,
+and diff the known ID set against the current index to detect deletions.
+"""
+
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+log = logging.getLogger("ld_export")
+
+STATE_DB_NAME: str = "export_state.db"
+
+
+def open_state(output_path: Path) -> sqlite3.Connection:
+    """
+    Opens (and creates, if necessary) the export state database in the output directory.
+
+    :param output_path: The export output directory
+    :return: An open SQLite connection
+    """
+    conn = sqlite3.connect(str(Path(output_path, STATE_DB_NAME)))
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS watermarks(type TEXT PRIMARY KEY, field TEXT, value TEXT)"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS known_ids(id TEXT PRIMARY KEY, type TEXT)")
+    conn.execute("CREATE INDEX IF NOT EXISTS known_ids_type ON known_ids(type)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS settings(key TEXT PRIMARY KEY, value TEXT)"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS deleted(id TEXT PRIMARY KEY, type TEXT)")
+    conn.commit()
+
+    return conn
+
+
+def get_watermark(
+    conn: sqlite3.Connection, record_type: str, field: str
+) -> Optional[str]:
+    """
+    Returns the timestamp of the last successful export for a record type, or None if
+    there is no watermark, or if the watermark was recorded against a different field.
+    """
+    row = conn.execute(
+        "SELECT field, value FROM watermarks WHERE type = ?", (record_type,)
+    ).fetchone()
+
+    if not row:
+        return None
+
+    stored_field, value = row
+    if stored_field != field:
+        log.warning(
+            "Watermark for %s was recorded on %s, not %s; ignoring it.",
+            record_type,
+            stored_field,
+            field,
+        )
+        return None
+
+    return value
+
+
+def set_watermark(
+    conn: sqlite3.Connection, record_type: str, field: str, value: str
+) -> None:
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+            (record_type, field, value),
+        )
+
+
+def get_setting(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_setting(conn: sqlite3.Connection, key: str, value: str) -> None:
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO settings VALUES (?, ?)", (key, value))
+
+
+def begin_id_sync(conn: sqlite3.Connection) -> None:
+    """
+    Prepares a scratch table to receive the IDs currently in the index. The IDs are
+    streamed into SQLite rather than held in memory so that the diff does not depend
+    on the size of the collection.
+    """
+    conn.execute("DROP TABLE IF EXISTS current_ids")
+    conn.execute("CREATE TABLE current_ids(id TEXT PRIMARY KEY)")
+    conn.commit()
+
+
+def add_current_ids(conn: sqlite3.Connection, ids: list[str]) -> None:
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO current_ids VALUES (?)", ((i,) for i in ids)
+        )
+
+
+def finish_id_sync(conn: sqlite3.Connection, record_type: str) -> list[str]:
+    """
+    Compares the IDs gathered in the scratch table with the known IDs for a record type,
+    and then replaces the known IDs with the current ones.
+
+    :return: A list of IDs that were known from a previous export but are no longer in the index.
+    """
+    deleted: list[str] = [
+        row[0]
+        for row in conn.execute(
+            "SELECT id FROM known_ids WHERE type = ? AND id NOT IN (SELECT id FROM current_ids)",
+            (record_type,),
+        )
+    ]
+
+    with conn:
+        conn.execute("DELETE FROM known_ids WHERE type = ?", (record_type,))
+        conn.execute(
+            "INSERT OR REPLACE INTO known_ids SELECT id, ? FROM current_ids",
+            (record_type,),
+        )
+        conn.execute("DROP TABLE current_ids")
+
+    return deleted
+
+
+def record_deleted(conn: sqlite3.Connection, record_type: str, ids: list[str]) -> None:
+    """
+    Keeps the IDs deleted in the current run, so that they are still available for the
+    incremental output if the run is interrupted and resumed.
+    """
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO deleted VALUES (?, ?)",
+            ((i, record_type) for i in ids),
+        )
+
+
+def get_deleted(conn: sqlite3.Connection) -> dict[str, list[str]]:
+    deleted: dict[str, list[str]] = {}
+    for docid, record_type in conn.execute("SELECT id, type FROM deleted"):
+        deleted.setdefault(record_type, []).append(docid)
+
+    return deleted
+
+
+def clear_deleted(conn: sqlite3.Connection) -> None:
+    with conn:
+        conn.execute("DELETE FROM deleted")
@@ -0,0 +1,111 @@
+"""
+Throughput statistics for the linked data exporter. Each worker process keeps its own
+counters and stage timers, reports its progress periodically, and returns its totals
+to the main process when it has finished, where they are merged and optionally
+written to a stats file.
+
+The stage timers are cumulative over all the documents a worker has in flight, so
+they will add up to more than the elapsed time. It is their proportions that show
+whether an export is bound by Solr, the serializers, the RDF conversion, or the disk.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+log = logging.getLogger("ld_export")
+
+COUNTERS: tuple = (
+    "fetched",
+    "serialized",
+    "converted",
+    "written",
+    "skipped",
+    "missing",
+    "failed",
+)
+STAGES: tuple = ("fetch", "serialize", "convert", "write")
+
+
+def format_duration(seconds: float) -> str:
+    hours, remainder = divmod(seconds, 60 * 60)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{int(hours):02}:{int(minutes):02}:{round(seconds):02}"
+
+
+class ExportStats:
+    def __init__(self, label: str, total: int = 0):
+        self.label: str = label
+        self.total: int = total
+        self.counts: dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.timings: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.started: float = time.perf_counter()
+
+    def incr(self, counter: str) -> None:
+        self.counts[counter] += 1
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts[c] for c in ("written", "skipped", "missing", "failed"))
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def progress(self) -> str:
+        elapsed: float = self.elapsed
+        rate: float = self.counts["written"] / elapsed if elapsed else 0.0
+        remaining: int = max(self.total - self.processed, 0)
+        eta: str = format_duration(remaining / rate) if rate else "--:--:--"
+        percent: float = 100 * self.processed / self.total if self.total else 100.0
+
+        stage_total: float = sum(self.timings.values())
+        stages: str = " ".join(
+            f"{stage} {100 * t / stage_total:.0f}%"
+            for stage, t in self.timings.items()
+            if stage_total
+        )
+
+        return (
+            f"{self.label}: {self.processed}/{self.total} ({percent:.1f}%), "
+            f"{rate:.1f} docs/s, ETA {eta}; {stages}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "total": self.total,
+            "elapsed": self.elapsed,
+            "counts": dict(self.counts),
+            "timings": dict(self.timings),
+        }
+
+
+def merge_stats(worker_stats: list[dict]) -> dict:
+    """
+    Adds up the totals returned by the worker processes for a record type.
+    """
+    merged: dict = {
+        "total": 0,
+        "counts": dict.fromkeys(COUNTERS, 0),
+        "timings": dict.fromkeys(STAGES, 0.0),
+        "workers": worker_stats,
+    }
+
+    for wstats in worker_stats:
+        merged["total"] += wstats["total"]
+        for counter, value in wstats["counts"].items():
+            merged["counts"][counter] += value
+        for stage, value in wstats["timings"].items():
+            merged["timings"][stage] += value
+
+    return merged
@@ -3,6 +3,8 @@ import logging
 import orjson
 import rdflib
 
+from shared_helpers.timing import timed_function
+
 log = logging.getLogger("mp_server")
 
 
@@ -19,6 +21,7 @@ def _to_graph_object(data: dict) -> rdflib.Graph:
     return rdflib.Graph().parse(data=json_serialized, format="application/ld+json")
 
 
+@timed_function("rdflib")
 def to_turtle(data: dict) -> str:
     log.debug("Creating graph from data")
     graph_object: rdflib.Graph = _to_graph_object(data)
@@ -26,11 +29,13 @@ def to_turtle(data: dict) -> str:
     return graph_object.serialize(format="turtle")
 
 
+@timed_function("rdflib")
 def to_expanded_jsonld(data: dict) -> str:
     graph_object: rdflib.Graph = _to_graph_object(data)
     return graph_object.serialize(format="json-ld")
 
 
+@timed_function("rdflib")
 def to_ntriples(data: dict) -> str:
     graph_object: rdflib.Graph = _to_graph_object(data)
     return graph_object.serialize(format="nt")
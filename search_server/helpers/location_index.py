@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import math
+import time
+from array import array
+from collections import defaultdict
+from typing import Optional
+
+from search_server.helpers.location_tiles import ClusterTiles
+from shared_helpers.index_version import get_index_version
+from shared_helpers.solr_connection import SolrConnection
+from shared_helpers.utilities import is_number
+
+"""
+An in-memory index of the locations of all the institutions, so that the institutions
+near to another one can be found without a geospatial query to Solr. The coordinates
+are kept in parallel arrays, and the institutions are bucketed in a grid of cells
+CELL_DEGREES wide. A radius query looks only at the cells that overlap the bounding box
+of the circle, and then checks the great-circle distance to each institution in them.
+
+The index is built in the background when the server starts, and again whenever the
+index version changes, together with the clusters of the locations used for map
+tiles. Until it is ready, the nearby institutions are found by Solr.
+"""
+
+log = logging.getLogger("mp_server")
+
+# How long to wait before trying again to build an index that could not be built.
+BUILD_RETRY_SECONDS: int = 60
+
+CELL_DEGREES: float = 0.1
+LAT_CELLS: int = round(180 / CELL_DEGREES)
+LON_CELLS: int = round(360 / CELL_DEGREES)
+# The mean radius of the earth, as used by Solr for geospatial queries.
+EARTH_RADIUS_KM: float = 6371.0087714
+KM_PER_DEGREE: float = EARTH_RADIUS_KM * math.pi / 180
+
+# The fields kept for each institution; enough to serialize it as a GeoJSON feature.
+LOCATION_FIELDS: list = [
+    "id",
+    "location_loc",
+    "name_s",
+    "department_s",
+    "city_s",
+    "siglum_s",
+    "institution_types_sm",
+]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1: float = math.radians(lat1)
+    phi2: float = math.radians(lat2)
+    d_phi: float = phi2 - phi1
+    d_lambda: float = math.radians(lon2 - lon1)
+
+    a: float = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _lat_cell(lat: float) -> int:
+    return min(LAT_CELLS - 1, max(0, math.floor((lat + 90) / CELL_DEGREES)))
+
+
+def _lon_cell(lon: float) -> int:
+    return math.floor((lon + 180) / CELL_DEGREES) % LON_CELLS
+
+
+def parse_location(location: Optional[str]) -> Optional[tuple[float, float]]:
+    """
+    Parses a `location_loc` value of the form "lat,lon".
+    """
+    if not location:
+        return None
+
+    lat, _, lon = location.partition(",")
+    if not is_number(lat) or not is_number(lon):
+        return None
+
+    return float(lat), float(lon)
+
+
+class LocationIndex:
+    def __init__(self, docs: list[dict], index_version: Optional[str]):
+        self.index_version: Optional[str] = index_version
+        self.docs: list[dict] = []
+        self.lats: array = array("d")
+        self.lons: array = array("d")
+        self.cells: dict[tuple[int, int], list[int]] = defaultdict(list)
+        self.tiles: Optional[ClusterTiles] = None
+
+        for doc in docs:
+            coordinates: Optional[tuple] = parse_location(doc.get("location_loc"))
+            if not coordinates:
+                continue
+
+            lat, lon = coordinates
+            self.cells[(_lat_cell(lat), _lon_cell(lon))].append(len(self.docs))
+            self.docs.append(doc)
+            self.lats.append(lat)
+            self.lons.append(lon)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float):
+        lat_span: float = radius_km / KM_PER_DEGREE
+        min_y: int = _lat_cell(lat - lat_span)
+        max_y: int = _lat_cell(lat + lat_span)
+
+        # The longitude span of the circle widens towards the poles; close enough to a
+        # pole, the circle covers every longitude.
+        cos_lat: float = math.cos(math.radians(min(89.9, abs(lat) + lat_span)))
+        lon_span: float = radius_km / (KM_PER_DEGREE * cos_lat)
+        if lon_span >= 180:
+            lon_cells = range(LON_CELLS)
+        else:
+            first_x: int = math.floor((lon - lon_span + 180) / CELL_DEGREES)
+            last_x: int = math.floor((lon + lon_span + 180) / CELL_DEGREES)
+            # Wraps around the antimeridian.
+            lon_cells = {x % LON_CELLS for x in range(first_x, last_x + 1)}
+
+        for y in range(min_y, max_y + 1):
+            for x in lon_cells:
+                yield from self.cells.get((y, x), ())
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        limit: int,
+        exclude_id: Optional[str] = None,
+    ) -> list[dict]:
+        """
+        Returns the institutions within a radius of a point, nearest first.
+
+        :param radius_km: The radius, in kilometres
+        :param limit: The maximum number of institutions to return
+        :param exclude_id: The id of an institution to leave out, usually the one at the point
+        :return: A list of institution documents
+        """
+        found: list[tuple[float, int]] = []
+        for i in self._candidates(lat, lon, radius_km):
+            if exclude_id and self.docs[i]["id"] == exclude_id:
+                continue
+
+            dist: float = haversine_km(lat, lon, self.lats[i], self.lons[i])
+            if dist <= radius_km:
+                found.append((dist, i))
+
+        found.sort()
+        return [self.docs[i] for _, i in found[:limit]]
+
+
+async def build_location_index() -> LocationIndex:
+    start: float = time.monotonic()
+    index_version: Optional[str] = await get_index_version(refresh=True)
+
+    res = await SolrConnection.search(
+        {
+            "query": "*:*",
+            "filter": ["type:institution", "location_loc:[* TO *]"],
+            "fields": LOCATION_FIELDS,
+            "sort": "id asc",
+            "limit": 5000,
+        },
+        cursor=True,
+        handler="/query",
+    )
+    docs: list[dict] = [doc async for doc in res]
+    index = LocationIndex(docs, index_version)
+    # Clustering takes a while, so it is kept off the event loop.
+    index.tiles = await asyncio.get_running_loop().run_in_executor(
+        None, ClusterTiles, index.lats, index.lons
+    )
+
+    log.info(
+        "Built the location index with %s institutions in %.2fs",
+        len(index),
+        time.monotonic() - start,
+    )
+    return index
+
+
+async def refresh_location_index(app) -> None:
+    """
+    Builds a new location index and swaps it in when it is ready. The previous
+    index, if any, is used until then. If there is no previous index, a failed build
+    is tried again every `BUILD_RETRY_SECONDS`, since otherwise nothing would start
+    another one.
+    """
+    try:
+        while True:
+            try:
+                app.ctx.location_index = await build_location_index()
+            except Exception:
+                log.exception("Could not build the location index")
+                if getattr(app.ctx, "location_index", None) is None:
+                    await asyncio.sleep(BUILD_RETRY_SECONDS)
+                    continue
+            break
+    finally:
+        app.ctx.location_index_building = False
+
+
+async def get_location_index(app) -> Optional[LocationIndex]:
+    """
+    Returns the current location index, starting a rebuild in the background if the
+    index version has changed since it was built.
+    """
+    location_index: Optional[LocationIndex] = getattr(app.ctx, "location_index", None)
+    if location_index is None or app.ctx.location_index_building:
+        return location_index
+
+    if await get_index_version() != location_index.index_version:
+        app.ctx.location_index_building = True
+        app.add_task(refresh_location_index(app))
+
+    return location_index
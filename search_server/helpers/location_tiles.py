@@ -0,0 +1,113 @@
+import math
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+"""
+A hierarchy of clusters of the institution locations, for serving map tiles. The
+locations are projected to Web Mercator, with the world spanning 0..1 on both axes.
+At each zoom level the clusters of the level above are grouped again in a grid of cells
+CLUSTER_RADIUS_PX pixels wide, so a cluster at one zoom level is always the sum of the
+clusters it splits into at the next. Above CLUSTER_MAX_ZOOM every institution is shown
+on its own.
+
+The clusters are bucketed by the tile they fall in, so a tile is a dictionary lookup.
+"""
+
+TILE_SIZE: int = 256
+CLUSTER_RADIUS_PX: int = 60
+CLUSTER_MAX_ZOOM: int = 14
+# The largest zoom level that tiles are served for.
+MAX_ZOOM: int = 20
+# Web Mercator is undefined at the poles, so latitudes are clamped to this.
+MAX_LATITUDE: float = 85.05112878
+
+
+class Cluster(NamedTuple):
+    x: float
+    y: float
+    count: int
+    # The position of the institution in the location index, if this is a single point.
+    doc_idx: Optional[int]
+
+
+def project(lat: float, lon: float) -> tuple[float, float]:
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat: float = math.sin(math.radians(lat))
+    x: float = (lon + 180) / 360
+    y: float = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def unproject(x: float, y: float) -> tuple[float, float]:
+    lon: float = x * 360 - 180
+    lat: float = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+def tile_for(x: float, y: float, zoom: int) -> tuple[int, int]:
+    n: int = 1 << zoom
+    return min(n - 1, max(0, int(x * n))), min(n - 1, max(0, int(y * n)))
+
+
+def _merge(level: list[Cluster], zoom: int) -> list[Cluster]:
+    cell: float = CLUSTER_RADIUS_PX / (TILE_SIZE * (1 << zoom))
+    groups: dict[tuple[int, int], list[Cluster]] = defaultdict(list)
+    for c in level:
+        groups[(int(c.x / cell), int(c.y / cell))].append(c)
+
+    merged: list[Cluster] = []
+    for members in groups.values():
+        if len(members) == 1:
+            merged.append(members[0])
+            continue
+
+        count: int = sum(m.count for m in members)
+        merged.append(
+            Cluster(
+                sum(m.x * m.count for m in members) / count,
+                sum(m.y * m.count for m in members) / count,
+                count,
+                None,
+            )
+        )
+    return merged
+
+
+class ClusterTiles:
+    def __init__(self, lats, lons):
+        """
+        :param lats: The latitudes of the institutions, in the order of the location index
+        :param lons: The longitudes of the institutions, in the same order
+        """
+        points: list[Cluster] = [
+            Cluster(*project(lats[i], lons[i]), 1, i) for i in range(len(lats))
+        ]
+
+        # The individual points, bucketed by their tile one level above the clusters.
+        self.points: dict[tuple[int, int], list[Cluster]] = self._bucket(
+            points, CLUSTER_MAX_ZOOM + 1
+        )
+        self.levels: list[dict[tuple[int, int], list[Cluster]]] = []
+
+        level: list[Cluster] = points
+        for zoom in range(CLUSTER_MAX_ZOOM, -1, -1):
+            level = _merge(level, zoom)
+            self.levels.append(self._bucket(level, zoom))
+        self.levels.reverse()
+
+    @staticmethod
+    def _bucket(level: list[Cluster], zoom: int) -> dict:
+        buckets: dict[tuple[int, int], list[Cluster]] = defaultdict(list)
+        for c in level:
+            buckets[tile_for(c.x, c.y, zoom)].append(c)
+        return dict(buckets)
+
+    def tile(self, zoom: int, x: int, y: int) -> list[Cluster]:
+        if zoom <= CLUSTER_MAX_ZOOM:
+            return self.levels[zoom].get((x, y), [])
+
+        # Above the clustered levels, the points are taken from the enclosing tile and
+        # filtered to the ones in the requested tile.
+        shift: int = zoom - CLUSTER_MAX_ZOOM - 1
+        enclosing: list[Cluster] = self.points.get((x >> shift, y >> shift), [])
+        return [c for c in enclosing if tile_for(c.x, c.y, zoom) == (x, y)]
@@ -13,6 +13,7 @@ from search_server.resources.search.pagination import (
     parse_page_number,
     parse_row_number,
 )
+from shared_helpers.caches import register_function_cache
 from shared_helpers.display_translators import SOURCE_SIGLA_COUNTRY_MAP
 
 log = logging.getLogger("mp_server")
@@ -128,6 +129,22 @@ def field_alias_map(filters_config: list) -> dict:
     return {f"{cnf['alias']}": f"{cnf['field']}" for cnf in filters_config}
 
 
+def time_allowed_for_route(cfg: dict, req) -> int:
+    """
+    The time, in milliseconds, that Solr may spend on the searches for a route, or 0 if
+    it is not limited. Routes are named as they are for `url_for`, e.g., "query.search".
+    :param cfg: The application configuration
+    :param req: The incoming request
+    :return: The time allowed, from the route's setting or the default.
+    """
+    time_allowed_cfg: dict = cfg["search"].get("time_allowed", {})
+    route_name: str = req.route.name.split(".", 1)[-1] if req.route else ""
+
+    return time_allowed_cfg.get("routes", {}).get(
+        route_name, time_allowed_cfg.get("default", 0)
+    )
+
+
 def facet_modifier_map(requested_values: list) -> dict:
     """
     Used to combine other fields with facet modifiers. For example, a facet alias of 'source-type' might
@@ -242,6 +259,9 @@ class SearchRequest:
             "mode", self._app_config["search"]["default_mode"]
         )
         self._extra_params: dict = {"multiThreaded": True}
+        # Solr stops a search that takes longer than this, and returns the results it has
+        # found so far, flagged as partial, so that an expensive query cannot hold up Solr.
+        self._time_allowed: int = time_allowed_for_route(self._app_config, req)
         self._page: Optional[str] = req.args.get("page", None)
         self._return_rows: Optional[str] = req.args.get("rows", None)
         self._result_sorting: Optional[str] = req.args.get("sort", None)
@@ -680,6 +700,9 @@ class SearchRequest:
         #  start: page:3 = ((3 - 1) * 20) = start:40
         start_row: int = 0 if page_num == 1 else ((page_num - 1) * return_rows)
 
+        if self._time_allowed:
+            self._extra_params["timeAllowed"] = self._time_allowed
+
         solr_query = {
             "query": self._compile_query(),
             "filter": self.filters,
@@ -806,3 +829,6 @@ def _fix_string(instr: str) -> str:
 
     # This should represent a string that is OK!
     return instr
+
+
+register_function_cache("fix_string", _fix_string)
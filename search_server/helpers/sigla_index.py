@@ -0,0 +1,183 @@
+import asyncio
+import bisect
+import logging
+import time
+import unicodedata
+from array import array
+from typing import Optional
+
+from shared_helpers.index_version import get_index_version
+from shared_helpers.solr_connection import SolrConnection
+
+"""
+An in-memory index of the sigla of all the institutions. It maps each siglum to its
+institution, so that siglum redirects do not need a Solr query, and it answers the
+siglum searches of the sigla UI. There are only some tens of thousands of sigla, and
+they change only when the index is updated.
+
+For searching, the institutions are ranked once, by the number of sources they hold.
+The sigla are kept sorted, so a siglum prefix is found with a binary search, and the
+matching institutions are returned in order of rank. A siglum search in Solr is a
+regular expression, which scores every match the same, so there too the results are in
+order of the number of sources, by which the query is boosted. Unlike the Solr search,
+the prefix is matched without regard to case or accents.
+
+The results from the index have no facets. The searches by name, city, country, or
+the whole record are ranked by relevance, and so are always sent to Solr.
+
+The index is built in the background when the server starts, and again whenever the
+index version changes. Until it is ready, and for any siglum it does not have, the
+institution is looked up in Solr.
+"""
+
+log = logging.getLogger("mp_server")
+
+# How long to wait before trying again to build an index that could not be built.
+BUILD_RETRY_SECONDS: int = 60
+
+SIGLA_FIELDS: list = [
+    "id",
+    "type",
+    "siglum_s",
+    "name_s",
+    "department_s",
+    "city_s",
+    "alternate_names_sm",
+    "gnd_country_codes_sm",
+    "total_sources_i",
+    "has_external_record_b",
+    "has_siglum_b",
+    "project_s",
+]
+
+
+def fold(value: str) -> str:
+    """
+    Removes accents and case, so that "D-Mbs" matches "d-mbs" and "PL-Kó" matches "pl-ko".
+    """
+    decomposed: str = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class SiglaSearchResults:
+    """
+    A page of results from the sigla index, with the attributes of a Solr Results
+    object that the search results serializer uses.
+    """
+
+    def __init__(self, hits: int, docs: list[dict]):
+        self.hits: int = hits
+        self.docs: list[dict] = docs
+        self.raw_response: dict = {}
+
+
+class SiglaIndex:
+    def __init__(self, docs: list[dict], index_version: Optional[str]):
+        self.index_version: Optional[str] = index_version
+        self.institutions: dict[str, str] = {}
+
+        for doc in docs:
+            siglum: str = doc["siglum_s"]
+            if siglum in self.institutions:
+                log.warning(
+                    "More than one institution has the siglum %s. This shouldn't happen.",
+                    siglum,
+                )
+                continue
+
+            self.institutions[siglum] = doc["id"]
+
+        # The institutions that can be searched, in order of rank.
+        self.ranked: list[dict] = sorted(
+            (d for d in docs if d.get("has_siglum_b") and "project_s" not in d),
+            key=lambda d: (-d.get("total_sources_i", 0), d["siglum_s"]),
+        )
+
+        sigla: list[tuple[str, int]] = sorted(
+            (fold(d["siglum_s"]), rank) for rank, d in enumerate(self.ranked)
+        )
+        self.sigla_keys: list[str] = [s for s, _ in sigla]
+        self.sigla_ranks: array = array("L", (r for _, r in sigla))
+
+    def __len__(self) -> int:
+        return len(self.institutions)
+
+    def institution_for_siglum(self, siglum: str) -> Optional[str]:
+        return self.institutions.get(siglum)
+
+    def search(self, query: str, offset: int, rows: int) -> SiglaSearchResults:
+        """
+        Finds the institutions with a siglum that starts with the query.
+
+        :return: A page of results, most sources first
+        """
+        folded: str = fold(query)
+        start: int = bisect.bisect_left(self.sigla_keys, folded)
+        end: int = bisect.bisect_left(self.sigla_keys, folded + "\U0010ffff", lo=start)
+        ranks: list[int] = sorted(self.sigla_ranks[start:end])
+        page: list[dict] = [self.ranked[r] for r in ranks[offset : offset + rows]]
+
+        return SiglaSearchResults(len(ranks), page)
+
+
+async def build_sigla_index() -> SiglaIndex:
+    start: float = time.monotonic()
+    index_version: Optional[str] = await get_index_version(refresh=True)
+
+    res = await SolrConnection.search(
+        {
+            "query": "*:*",
+            "filter": ["type:institution", "siglum_s:[* TO *]"],
+            "fields": SIGLA_FIELDS,
+            "sort": "id asc",
+            "limit": 10000,
+        },
+        cursor=True,
+        handler="/query",
+    )
+    docs: list[dict] = [doc async for doc in res]
+    index = SiglaIndex(docs, index_version)
+
+    log.info(
+        "Built the sigla index with %s sigla in %.2fs",
+        len(index),
+        time.monotonic() - start,
+    )
+    return index
+
+
+async def refresh_sigla_index(app) -> None:
+    """
+    Builds a new sigla index and swaps it in when it is ready. The previous
+    index, if any, is used until then. If there is no previous index, a failed build
+    is tried again every `BUILD_RETRY_SECONDS`, since otherwise nothing would start
+    another one.
+    """
+    try:
+        while True:
+            try:
+                app.ctx.sigla_index = await build_sigla_index()
+            except Exception:
+                log.exception("Could not build the sigla index")
+                if getattr(app.ctx, "sigla_index", None) is None:
+                    await asyncio.sleep(BUILD_RETRY_SECONDS)
+                    continue
+            break
+    finally:
+        app.ctx.sigla_index_building = False
+
+
+async def get_sigla_index(app) -> Optional[SiglaIndex]:
+    """
+    Returns the current sigla index, starting a rebuild in the background if the
+    index version has changed since it was built.
+    """
+    sigla_index: Optional[SiglaIndex] = getattr(app.ctx, "sigla_index", None)
+    if sigla_index is None or app.ctx.sigla_index_building:
+        return sigla_index
+
+    if await get_index_version() != sigla_index.index_version:
+        app.ctx.sigla_index_building = True
+        app.add_task(refresh_sigla_index(app))
+
+    return sigla_index
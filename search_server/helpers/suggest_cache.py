@@ -0,0 +1,82 @@
+from typing import Optional
+
+from shared_helpers.caches import TTLCache
+
+"""
+A short-lived cache of the suggestions returned by Solr, for when the in-memory
+suggestion index is not available. As a user types, each request asks for the
+suggestions for a longer prefix than the one before. If the suggestions for a shorter
+prefix are cached and were complete, the suggestions for the longer prefix are a subset
+of them, and can be found by filtering the cached list rather than by asking Solr again.
+
+A cached list is only complete if Solr returned fewer terms for each field than the
+number of suggestions requested; otherwise there may be terms matching the longer
+prefix that were not returned, and Solr must be asked.
+"""
+
+
+def matches_query(term: str, query: str) -> bool:
+    """
+    Terms match a query if they start with it, ignoring case, as in the suggestion index.
+    """
+    return term.casefold().startswith(query.casefold())
+
+
+class SuggestCache(TTLCache):
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__("suggestions", maxsize, ttl)
+        self.narrowed: int = 0
+
+    def get(self, key: tuple[str, str]) -> Optional[dict]:
+        """
+        Returns the cached suggestions for an (alias, query), or the suggestions for the
+        longest cached shorter prefix of the query, filtered to the ones that match it.
+
+        :return: A dictionary in the form of a Solr TermsComponent response, or None
+            if the suggestions must be fetched from Solr.
+        """
+        if self.peek(key) is not None:
+            return super().get(key)[0]
+
+        alias, query = key
+        for end in range(len(query) - 1, 0, -1):
+            prefix_entry: Optional[tuple] = self.peek((alias, query[:end]))
+            if prefix_entry is None:
+                continue
+
+            prefix_res, complete = prefix_entry
+            if not complete:
+                # A shorter prefix would have had at least as many matches.
+                break
+
+            terms: dict = {}
+            for field, flat in prefix_res.get("terms", {}).items():
+                v_iter = iter(flat)
+                narrowed_flat: list = []
+                for label, count in zip(v_iter, v_iter):  # noqa: B905
+                    if matches_query(label, query):
+                        narrowed_flat.extend((label, count))
+                terms[field] = narrowed_flat
+
+            narrowed_res: dict = {"terms": terms}
+            # A filtered list that was complete is still complete.
+            self.set(key, (narrowed_res, True))
+            self.narrowed += 1
+            return narrowed_res
+
+        self.misses += 1
+        return None
+
+    def store(self, alias: str, query: str, solr_res: dict, limit: int) -> None:
+        """
+        Caches the suggestions returned by Solr for a query.
+
+        :param limit: The number of terms for each field that Solr was asked for. A
+            field with at least this many terms may have been truncated.
+        """
+        terms: dict = solr_res.get("terms", {})
+        complete: bool = all(len(flat) // 2 < limit for flat in terms.values())
+        self.set((alias, query), ({"terms": terms}, complete))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "narrowed": self.narrowed}
@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import logging
+import time
+from array import array
+from typing import Optional, Sequence
+
+from small_asc.client import Results
+
+from shared_helpers.index_version import get_index_version
+from shared_helpers.solr_connection import SolrConnection
+
+"""
+An in-memory index of the terms in the fields used for suggestions, so that autocomplete
+requests can be answered without a round-trip to Solr. For each field the terms are kept
+in a list sorted by their case-folded forms, with their document counts in a parallel
+array. A prefix is found with a binary search, and the most frequent terms in the
+matching range are picked with a heap.
+
+The ranges for the shortest prefixes cover much of a field, so the most frequent terms
+for every prefix of up to `PRECOMPUTED_PREFIX_LENGTH` characters are found when the
+index is built, rather than on every keystroke.
+
+The index is built in the background when the server starts, and again whenever the
+index version changes. Until it is ready, suggestions are served by Solr.
+"""
+
+log = logging.getLogger("mp_server")
+
+# How long to wait before trying again to build an index that could not be built.
+BUILD_RETRY_SECONDS: int = 60
+
+# The last possible code point, used to find the end of a range of terms sharing a prefix.
+PREFIX_END: str = "\U0010ffff"
+# Prefixes up to this length have their most frequent terms found in advance.
+PRECOMPUTED_PREFIX_LENGTH: int = 2
+
+
+class FieldTerms:
+    __slots__ = ("terms", "counts", "top_size", "top_by_prefix")
+
+    def __init__(self, buckets: list[dict], top_size: int):
+        buckets = sorted(buckets, key=lambda b: (b["val"].casefold(), b["val"]))
+        self.terms: list[str] = [b["val"] for b in buckets]
+        self.counts: array = array("L", (b["count"] for b in buckets))
+        self.top_size: int = top_size
+        self.top_by_prefix: dict[str, array] = self._precompute_top()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _precompute_top(self) -> dict[str, array]:
+        """
+        Finds the most frequent terms for each short prefix. Since the terms are sorted by
+        their case-folded forms, the terms sharing a prefix are next to each other.
+        """
+        top_by_prefix: dict[str, array] = {}
+        for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+            start: int = 0
+            while start < len(self.terms):
+                prefix: str = self.terms[start].casefold()[:length]
+                end: int = start + 1
+                while end < len(self.terms) and (
+                    self.terms[end].casefold()[:length] == prefix
+                ):
+                    end += 1
+
+                # A shorter term is only a prefix of itself, and is found by a scan.
+                if len(prefix) == length:
+                    top_by_prefix[prefix] = array("L", self._scan(start, end))
+                start = end
+
+        return top_by_prefix
+
+    def _scan(self, start: int, end: int) -> list[int]:
+        return heapq.nlargest(
+            self.top_size, range(start, end), key=self.counts.__getitem__
+        )
+
+    def _bisect(self, folded: str, lo: int = 0) -> int:
+        # The leftmost position for a case-folded value; bisect only takes a key
+        # function from Python 3.10.
+        hi: int = len(self.terms)
+        while lo < hi:
+            mid: int = (lo + hi) // 2
+            if self.terms[mid].casefold() < folded:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def top(self, prefix: str, limit: int) -> list[tuple[str, int]]:
+        """
+        Returns the most frequent terms starting with a prefix, ignoring case.
+        """
+        folded: str = prefix.casefold()
+        top_idx: Sequence[int]
+        if limit <= self.top_size and folded in self.top_by_prefix:
+            top_idx = self.top_by_prefix[folded][:limit]
+        else:
+            start: int = self._bisect(folded)
+            # Every term in the range starts with the prefix, and no other term sorts
+            # between the prefix and the prefix followed by the last possible code point.
+            end: int = self._bisect(folded + PREFIX_END, lo=start)
+            top_idx = heapq.nlargest(
+                limit, range(start, end), key=self.counts.__getitem__
+            )
+
+        return [(self.terms[i], self.counts[i]) for i in top_idx]
+
+
+class SuggestIndex:
+    def __init__(
+        self,
+        fields: dict[str, FieldTerms],
+        index_version: Optional[str],
+        top_size: int,
+    ):
+        self.fields: dict[str, FieldTerms] = fields
+        self.index_version: Optional[str] = index_version
+        self.top_size: int = top_size
+
+    def has_fields(self, fields: list) -> bool:
+        return all(f in self.fields for f in fields)
+
+    def term_suggest(self, query: str, fields: list, limit: int) -> dict:
+        """
+        Returns suggestions in the same form as a Solr TermsComponent response, so that
+        they can be handled in the same way.
+        """
+        terms: dict = {}
+        for f in fields:
+            flat: list = []
+            for term, count in self.fields[f].top(query, limit):
+                flat.extend((term, count))
+            terms[f] = flat
+
+        return {"terms": terms}
+
+
+async def _load_field(field: str, top_size: int) -> FieldTerms:
+    res: Results = await SolrConnection.search(
+        {
+            "query": "*:*",
+            "limit": 0,
+            "facet": {
+                field: {"type": "terms", "field": field, "limit": -1, "mincount": 1}
+            },
+        }
+    )
+    buckets: list = res.raw_response.get("facets", {}).get(field, {}).get("buckets", [])
+    return FieldTerms(buckets, top_size)
+
+
+async def build_suggest_index(fields: list, top_size: int) -> SuggestIndex:
+    """
+    Loads the terms of the suggestion fields.
+
+    :param fields: The suggestion fields
+    :param top_size: The number of suggestions that are usually asked for, which are
+        found in advance for the shortest prefixes
+    """
+    start: float = time.monotonic()
+    index_version: Optional[str] = await get_index_version(refresh=True)
+
+    field_terms: list = await asyncio.gather(
+        *[_load_field(f, top_size) for f in fields]
+    )
+    # gather returns one result for each field; zip(strict=) needs Python 3.10.
+    index = SuggestIndex(
+        dict(zip(fields, field_terms)),  # noqa: B905
+        index_version,
+        top_size,
+    )
+
+    log.info(
+        "Built the suggestion index with %s terms in %s fields in %.2fs",
+        sum(len(t) for t in field_terms),
+        len(fields),
+        time.monotonic() - start,
+    )
+    return index
+
+
+async def refresh_suggest_index(app, fields: list, top_size: int) -> None:
+    """
+    Builds a new suggestion index and swaps it in when it is ready. The previous
+    index, if any, is used until then. If there is no previous index, a failed build
+    is tried again every `BUILD_RETRY_SECONDS`, since otherwise nothing would start
+    another one.
+    """
+    try:
+        while True:
+            try:
+                app.ctx.suggest_index = await build_suggest_index(fields, top_size)
+            except Exception:
+                log.exception("Could not build the suggestion index")
+                if getattr(app.ctx, "suggest_index", None) is None:
+                    await asyncio.sleep(BUILD_RETRY_SECONDS)
+                    continue
+            break
+    finally:
+        app.ctx.suggest_index_building = False
+
+
+async def get_suggest_index(app) -> Optional[SuggestIndex]:
+    """
+    Returns the current suggestion index, starting a rebuild in the background if the
+    index version has changed since it was built.
+    """
+    suggest_index: Optional[SuggestIndex] = getattr(app.ctx, "suggest_index", None)
+    if suggest_index is None or app.ctx.suggest_index_building:
+        return suggest_index
+
+    if await get_index_version() != suggest_index.index_version:
+        app.ctx.suggest_index_building = True
+        app.add_task(
+            refresh_suggest_index(
+                app, list(suggest_index.fields), suggest_index.top_size
+            )
+        )
+
+    return suggest_index
@@ -11,6 +11,7 @@ from orjson import orjson
 
 from shared_helpers.identifiers import ID_SUB, get_identifier
 from shared_helpers.resvg import render_svg
+from shared_helpers.timing import timed_function
 
 log = logging.getLogger("mp_server")
 verovio.enableLog(False)
@@ -40,6 +41,7 @@ vrv_tk = verovio.toolkit()
 vrv_tk.setOptions(VEROVIO_BASE_OPTIONS)
 
 
+@timed_function("verovio")
 def render_pae(
     pae: str, use_crc: bool = False, enlarged: bool = False, is_mensural: bool = False
 ) -> Optional[tuple]:
@@ -129,6 +131,7 @@ async def render_url(url: str) -> Optional[str]:
         return svg
 
 
+@timed_function("verovio")
 def render_mei(req, incipit: dict) -> Optional[str]:
     """
     Renders an MEI result from PAE input. Includes information for the MEI header
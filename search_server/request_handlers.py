@@ -10,6 +10,7 @@ from search_server.exceptions import InvalidQueryException
 from search_server.helpers.linked_data import to_expanded_jsonld, to_ntriples, to_turtle
 from shared_helpers.identifiers import get_identifier
 from shared_helpers.jsonld import RouteContextMap
+from shared_helpers.timing import timed
 
 log = logging.getLogger("mp_server")
 
@@ -19,11 +20,12 @@ async def send_json_response(
 ) -> response.HTTPResponse:
     response_headers: dict = {"Content-Type": "application/ld+json; charset=utf-8"}
 
-    return response.json(
-        serialized_results,
-        headers=response_headers,
-        option=orjson.OPT_INDENT_2 if debug_response else 0,
-    )
+    with timed("json"):
+        return response.json(
+            serialized_results,
+            headers=response_headers,
+            option=orjson.OPT_INDENT_2 if debug_response else 0,
+        )
 
 
 async def handle_request(
@@ -45,7 +47,8 @@ async def handle_request(
     """
     accept: Optional[str] = req.headers.get("Accept")
 
-    data_obj: Optional[dict] = await handler(req, **kwargs)
+    with timed("handler"):
+        data_obj: Optional[dict] = await handler(req, **kwargs)
 
     # This will return a 404 for both the cases where the response is None, and where
     # it is an empty dictionary.
@@ -143,7 +146,8 @@ async def handle_search(
         return response.text(status_msg, status=406)
 
     try:
-        data_obj: dict = await handler(req, **kwargs)
+        with timed("handler"):
+            data_obj: dict = await handler(req, **kwargs)
     except InvalidQueryException as e:
         return response.text(f"Invalid search query. {e}", status=400)
     except SolrError as e:
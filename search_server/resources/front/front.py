@@ -1,3 +1,5 @@
+from typing import Optional
+
 import orjson
 import ypres
 from sanic import response
@@ -5,6 +7,7 @@ from small_asc.client import Results
 
 from search_server.exceptions import InvalidQueryException
 from search_server.helpers.search_request import SearchRequest
+from search_server.resources.search.base_search import report_partial_results
 from search_server.resources.search.facets import get_facets
 from shared_helpers.identifiers import get_identifier
 from shared_helpers.solr_connection import SolrConnection
@@ -37,6 +40,7 @@ class Front(ypres.DictSerializer):
     ftype = ypres.StaticField(label="type", value="rism:Front")
     endpoints = ypres.MethodField()
     facets = ypres.MethodField()
+    query_validation = ypres.MethodField(label="queryValidation")
 
     def get_fid(self, obj: Results) -> str:
         req = self.context.get("request")
@@ -50,3 +54,6 @@ class Front(ypres.DictSerializer):
     def get_facets(self, obj: Results) -> dict:
         req = self.context.get("request")
         return get_facets(req, obj)
+
+    def get_query_validation(self, obj: Results) -> Optional[dict]:
+        return report_partial_results(obj)
@@ -3,6 +3,7 @@ from typing import Optional
 
 import ypres
 
+from search_server.helpers.location_index import LocationIndex, get_location_index
 from shared_helpers.formatters import format_institution_label
 from shared_helpers.identifiers import ID_SUB, get_identifier
 from shared_helpers.solr_connection import SolrConnection
@@ -50,25 +51,43 @@ class InstitutionGeoJson(ypres.AsyncDictSerializer):
 
 
 async def get_nearby_orgs(req, coordinates: list, pimary_obj_id: str) -> list[dict]:
-    locval = ",".join(coordinates)
-    nearby_orgs_query = {
-        "query": "*:*",
-        "filter": [
-            "type:institution",
-            "{!geofilt sfield=location_loc}",
-            f"!id:{pimary_obj_id}",
-        ],
-        "params": {"pt": locval, "d": 10},
-    }
-
-    results = await SolrConnection.search(
-        nearby_orgs_query, cursor=True, handler="/query"
-    )
-    if not results:
+    """
+    Finds the institutions within a radius of a location, nearest first. The radius (in km)
+    and the maximum number of institutions are set in the configuration.
+    """
+    cfg: dict = req.app.ctx.config.get("institutions", {})
+    radius: float = cfg.get("nearby_radius", 10)
+    limit: int = cfg.get("nearby_limit", 100)
+
+    # If the location index is loaded, the nearby institutions are found in memory.
+    location_index: Optional[LocationIndex] = await get_location_index(req.app)
+    if location_index:
+        lat, lon = coordinates
+        nearby: list[dict] = location_index.nearby(
+            float(lat), float(lon), radius, limit, exclude_id=pimary_obj_id
+        )
+    else:
+        locval = ",".join(coordinates)
+        nearby_orgs_query = {
+            "query": "*:*",
+            "filter": [
+                "type:institution",
+                "{!geofilt sfield=location_loc}",
+                f"!id:{pimary_obj_id}",
+            ],
+            "sort": "geodist() asc",
+            "limit": limit,
+            "params": {"pt": locval, "d": radius, "sfield": "location_loc"},
+        }
+
+        results = await SolrConnection.search(nearby_orgs_query, handler="/query")
+        nearby = results.docs
+
+    if not nearby:
         return []
 
     return await GeoJsonFeature(
-        results, many=True, context={"is_primary": False, "request": req}
+        nearby, many=True, context={"is_primary": False, "request": req}
     ).data
 
 
@@ -0,0 +1,86 @@
+import gzip
+from typing import Optional
+
+import orjson
+from sanic import response
+
+from search_server.helpers.location_index import LocationIndex, get_location_index
+from search_server.helpers.location_tiles import MAX_ZOOM, Cluster, unproject
+from search_server.resources.institutions.geojson import GeoJsonFeature
+from shared_helpers.caches import LRUCache
+from shared_helpers.identifiers import get_site
+
+
+async def _tile_features(req, location_index: LocationIndex, clusters: list) -> list:
+    features: list = []
+    single: list[dict] = []
+    for c in clusters:
+        if c.doc_idx is not None:
+            single.append(location_index.docs[c.doc_idx])
+            continue
+
+        lat, lon = unproject(c.x, c.y)
+        features.append(
+            {
+                "type": "Feature",
+                "properties": {"cluster": True, "count": c.count},
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            }
+        )
+
+    if single:
+        features.extend(
+            await GeoJsonFeature(
+                single, many=True, context={"is_primary": False, "request": req}
+            ).data
+        )
+
+    return features
+
+
+async def handle_institution_tile_request(
+    req, zoom: int, x: int, y: int
+) -> response.HTTPResponse:
+    """
+    Returns a GeoJSON FeatureCollection of the institutions in a map tile. Where several
+    institutions are close together at the zoom level of the tile they are returned as
+    a single feature, with the number of institutions it stands for.
+
+    The tiles are cached gzip-compressed for each version of the index.
+    """
+    if not 0 <= zoom <= MAX_ZOOM or not (0 <= x < 1 << zoom and 0 <= y < 1 << zoom):
+        return response.text("The requested resource was not found", status=404)
+
+    if not req.app.ctx.config.get("institutions", {}).get("location_index", False):
+        return response.text("Map tiles are not enabled on this server", status=404)
+
+    location_index: Optional[LocationIndex] = await get_location_index(req.app)
+    if not location_index or not location_index.tiles:
+        # Only ask the client to retry if the index is on its way.
+        headers: dict = (
+            {"Retry-After": "60"} if req.app.ctx.location_index_building else {}
+        )
+        return response.text(
+            "Map tiles are not available yet", status=503, headers=headers
+        )
+
+    tile_cache: LRUCache = req.app.ctx.tile_cache
+    cache_key: tuple = (location_index.index_version, zoom, x, y, get_site(req))
+    content: Optional[bytes] = tile_cache.get(cache_key)
+
+    if content is None:
+        clusters: list[Cluster] = location_index.tiles.tile(zoom, x, y)
+        feature_collection: dict = {
+            "type": "FeatureCollection",
+            "features": await _tile_features(req, location_index, clusters),
+        }
+        content = gzip.compress(orjson.dumps(feature_collection))
+        tile_cache.set(cache_key, content)
+
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in req.headers.get("Accept-Encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        content = gzip.decompress(content)
+
+    return response.raw(content, content_type="application/geo+json", headers=headers)
@@ -10,6 +10,24 @@ from search_server.resources.search.sorting import get_sorting
 from shared_helpers.solr_connection import execute_query
 
 
+def report_partial_results(
+    obj: Results, query_validation: Optional[dict] = None
+) -> Optional[dict]:
+    """
+    Adds `partialResults` to the query validation report if Solr stopped the search at
+    the time allowed (see `time_allowed_for_route`), since the results and the counts
+    are then incomplete.
+
+    :param obj: The Solr results
+    :param query_validation: The query validation report, if there is one
+    :return: The report, or None if there is nothing to report.
+    """
+    if obj.raw_response.get("responseHeader", {}).get("partialResults"):
+        return {**(query_validation or {}), "partialResults": True}
+
+    return query_validation
+
+
 class BaseSearchResults(ypres.AsyncSerializer):
     """
     A Base Search Results serializer. Consumes a Solr response directly, and will manage the pagination
@@ -30,6 +48,7 @@ class BaseSearchResults(ypres.AsyncSerializer):
     sorts = ypres.MethodField()
     query_fields = ypres.MethodField(label="queryFields")
     page_sizes = ypres.MethodField(label="pageSizes")
+    query_validation = ypres.MethodField(label="queryValidation")
 
     def get_sid(self, obj: Results) -> str:
         """
@@ -94,6 +113,9 @@ class BaseSearchResults(ypres.AsyncSerializer):
 
         return query_fields or None
 
+    def get_query_validation(self, obj: Results) -> Optional[dict]:
+        return report_partial_results(obj, self.context.get("query_validation"))
+
     @abstractmethod
     def get_modes(self, obj: Results) -> Optional[dict]:
         return None
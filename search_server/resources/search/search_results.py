@@ -35,14 +35,6 @@ CSS_REPLACEMENT_PATTERN: Pattern = re.compile(
 
 
 class SearchResults(BaseSearchResults):
-    query_validation = ypres.MethodField(label="queryValidation")
-
-    def get_query_validation(self, obj: Results) -> Optional[dict]:
-        if "query_validation" not in self.context:
-            return None
-
-        return self.context["query_validation"]
-
     def get_modes(self, obj: Results) -> Optional[dict]:
         is_probe: bool = self.context.get("probe_request", False)
         if is_probe:
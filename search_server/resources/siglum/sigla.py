@@ -5,6 +5,7 @@ from urllib.parse import unquote
 
 from small_asc.client import Results
 
+from search_server.helpers.sigla_index import SiglaIndex, get_sigla_index
 from search_server.resources.search.pagination import parse_page_number
 from search_server.resources.search.search_results import SearchResults
 from shared_helpers.identifiers import ID_SUB
@@ -13,6 +14,8 @@ from shared_helpers.solr_connection import SolrConnection
 log = logging.getLogger("mp_export")
 
 INVALID_SIGLUM = re.compile(r"^[\w-]+$")
+# Characters with a special meaning in a Lucene regular expression.
+REGEX_SPECIAL_CHARS = re.compile(r'([.?+*|{}\[\]()"\\#@&<>~/^$-])')
 
 
 async def handle_institution_sigla_request(req, siglum: str) -> Optional[str]:
@@ -28,22 +31,31 @@ async def handle_institution_sigla_request(req, siglum: str) -> Optional[str]:
         )
         return None
 
-    # ensure characters are handled as UTF-8 using the 'unquote' method.
-    fq: list = ["type:institution", f"siglum_s:{incoming_sig}"]
-    institution_record: Results = await SolrConnection.search(
-        {"query": "*:*", "filter": fq, "fields": ["id"]}, handler="/query"
+    # If the sigla index is loaded, look the siglum up there first. A siglum that is
+    # not in the index may have been added since it was built, so Solr is still asked.
+    sigla_index: Optional[SiglaIndex] = await get_sigla_index(req.app)
+    institution_record_id: Optional[str] = (
+        sigla_index.institution_for_siglum(incoming_sig) if sigla_index else None
     )
 
-    if institution_record.hits == 0:
-        return None
-
-    if institution_record.hits > 1:
-        log.warning(
-            "More than one result was returned for siglum %s. This shouldn't happen.",
-            siglum,
+    if not institution_record_id:
+        # ensure characters are handled as UTF-8 using the 'unquote' method.
+        fq: list = ["type:institution", f"siglum_s:{incoming_sig}"]
+        institution_record: Results = await SolrConnection.search(
+            {"query": "*:*", "filter": fq, "fields": ["id"]}, handler="/query"
         )
 
-    institution_record_id: str = institution_record.docs[0]["id"]
+        if institution_record.hits == 0:
+            return None
+
+        if institution_record.hits > 1:
+            log.warning(
+                "More than one result was returned for siglum %s. This shouldn't happen.",
+                siglum,
+            )
+
+        institution_record_id = institution_record.docs[0]["id"]
+
     institution_id = re.sub(ID_SUB, "", institution_record_id)
 
     return f"/institutions/{institution_id}"
@@ -82,6 +94,17 @@ async def handle_siglum_search_request(req) -> Optional[dict]:
     if query_type not in query_solr_fields:
         return None
 
+    # If the sigla index is loaded, a siglum search is answered from memory. The other
+    # query types are ranked by relevance, which only Solr can do.
+    sigla_index: Optional[SiglaIndex] = (
+        await get_sigla_index(req.app) if query_type == "siglum" else None
+    )
+    if sigla_index:
+        return await SearchResults(
+            sigla_index.search(query, start_row, rows),
+            context={"request": req},
+        ).data
+
     fq: list[str] = ["type:institution", "!project_s:*", "has_siglum_b:true"]
 
     query_field: str = query_solr_fields[query_type]
@@ -89,7 +112,8 @@ async def handle_siglum_search_request(req) -> Optional[dict]:
         solr_query = f"{query}"
     elif query_type == "siglum":
         # We need to do strict left-edge matching, which we can get if we do a regex search.
-        solr_query = f"{query_field}:/{query}.*/"
+        escaped_query: str = REGEX_SPECIAL_CHARS.sub(r"\\\1", query)
+        solr_query = f"{query_field}:/{escaped_query}.*/"
     else:
         solr_query = f"{query_field}:{query}"
 
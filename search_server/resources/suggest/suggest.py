@@ -9,6 +9,8 @@ from sanic import request, response
 from small_asc.client import SolrError
 
 from search_server.helpers.search_request import suggest_fields_for_alias
+from search_server.helpers.suggest_cache import SuggestCache
+from search_server.helpers.suggest_index import SuggestIndex, get_suggest_index
 from search_server.request_handlers import send_json_response
 from shared_helpers.solr_connection import SolrConnection
 
@@ -95,18 +97,46 @@ async def handle_suggest_request(
     field_map: dict = suggest_fields_for_alias(facet_definitions)
     fields: list = field_map.get(alias, [])
 
-    # Since we will be using a regex, ensure any special characters are escaped before handing the
-    # query off to Solr.
-    escaped_query: str = re.escape(query)
-
-    try:
-        solr_res: dict = await SolrConnection.term_suggest(
-            {"query": escaped_query, "fields": fields}
+    # The number of terms fetched for each field. The cache relies on knowing this, to
+    # tell whether a list of suggestions might have been cut short.
+    suggest_limit: int = cfg["search"]["suggestions"]
+
+    # If the suggestion index is loaded, the suggestions are answered from memory.
+    suggest_index: Optional[SuggestIndex] = await get_suggest_index(req.app)
+    if suggest_index and suggest_index.has_fields(fields):
+        solr_res: dict = suggest_index.term_suggest(query, fields, suggest_limit)
+    else:
+        # Otherwise, the suggestions for this query, or for a shorter prefix of it, may
+        # have been fetched from Solr by a recent request.
+        suggest_cache: Optional[SuggestCache] = getattr(
+            req.app.ctx, "suggest_cache", None
+        )
+        cached_res: Optional[dict] = (
+            suggest_cache.get((alias, query)) if suggest_cache else None
         )
-    except SolrError:
-        msg: str = "Error sending suggest request"
-        log.exception(msg)
-        return response.text(msg, status=500)
+
+        if cached_res is not None:
+            solr_res = cached_res
+        else:
+            # Since we will be using a regex, ensure any special characters are escaped before handing the
+            # query off to Solr.
+            escaped_query: str = re.escape(query)
+
+            try:
+                solr_res = await SolrConnection.term_suggest(
+                    {
+                        "query": escaped_query,
+                        "fields": fields,
+                        "terms.limit": suggest_limit,
+                    }
+                )
+            except SolrError:
+                msg: str = "Error sending suggest request"
+                log.exception(msg)
+                return response.text(msg, status=500)
+
+            if suggest_cache:
+                suggest_cache.store(alias, query, solr_res, suggest_limit)
 
     suggest_results: dict = SuggestionResults(
         solr_res,
@@ -0,0 +1,33 @@
+from sanic import Blueprint
+
+from search_server.routes.api import api_blueprint
+from search_server.routes.countries import countries_blueprint
+from search_server.routes.external import external_blueprint
+from search_server.routes.festivals import festivals_blueprint
+from search_server.routes.incipits import incipits_blueprint
+from search_server.routes.institutions import institutions_blueprint
+from search_server.routes.people import people_blueprint
+from search_server.routes.places import places_blueprint
+from search_server.routes.query import query_blueprint
+from search_server.routes.sigla import sigla_blueprint
+from search_server.routes.sources import sources_blueprint
+from search_server.routes.subjects import subjects_blueprint
+from search_server.routes.works import works_blueprint
+
+# All the blueprints served by the search server. Batch jobs use these to construct
+# identifiers without setting up the application.
+blueprints: list[Blueprint] = [
+    sources_blueprint,
+    people_blueprint,
+    places_blueprint,
+    institutions_blueprint,
+    subjects_blueprint,
+    incipits_blueprint,
+    festivals_blueprint,
+    countries_blueprint,
+    works_blueprint,
+    query_blueprint,
+    api_blueprint,
+    external_blueprint,
+    sigla_blueprint,
+]
@@ -1,3 +1,5 @@
+import re
+
 from sanic import Blueprint, response
 
 from search_server.request_handlers import handle_request, handle_search
@@ -9,6 +11,7 @@ from search_server.resources.institutions.institution_search import (
     handle_institution_probe_request,
     handle_institution_search_request,
 )
+from search_server.resources.institutions.tiles import handle_institution_tile_request
 
 institutions_blueprint: Blueprint = Blueprint(
     "institutions", url_prefix="/institutions"
@@ -20,6 +23,19 @@ async def institution_list(req):
     return response.text("Not implemented", status=501)
 
 
+@institutions_blueprint.route("/tiles/<zoom:int>/<x:int>/<tile_y:str>")
+async def location_tile(req, zoom: int, x: int, tile_y: str):
+    """
+    A map tile with the locations of all the institutions, clustered for the zoom level.
+
+    For example, `/institutions/tiles/4/8/5.geojson`
+    """
+    if not (match := re.fullmatch(r"(\d+)\.geojson", tile_y)):
+        return response.text("The requested resource was not found", status=404)
+
+    return await handle_institution_tile_request(req, zoom, x, int(match.group(1)))
+
+
 @institutions_blueprint.route("/<institution_id:str>")
 async def institution(req, institution_id: str):
     """
@@ -1,4 +1,9 @@
+import asyncio
+import hmac
 import logging
+import os
+import time
+from pathlib import Path
 from typing import Optional
 
 import orjson
@@ -7,22 +12,44 @@ import yaml
 from sanic import Sanic, response
 from small_asc.client import Results
 
+from search_server.helpers.location_index import refresh_location_index
+from search_server.helpers.search_request import suggest_fields_for_alias
+from search_server.helpers.sigla_index import refresh_sigla_index
+from search_server.helpers.suggest_cache import SuggestCache
+from search_server.helpers.suggest_index import refresh_suggest_index
 from search_server.resources.front.front import handle_front_request
-from search_server.routes.api import api_blueprint
-from search_server.routes.countries import countries_blueprint
-from search_server.routes.external import external_blueprint
-from search_server.routes.festivals import festivals_blueprint
-from search_server.routes.incipits import incipits_blueprint
-from search_server.routes.institutions import institutions_blueprint
-from search_server.routes.people import people_blueprint
-from search_server.routes.places import places_blueprint
-from search_server.routes.query import query_blueprint
-from search_server.routes.sigla import sigla_blueprint
-from search_server.routes.sources import sources_blueprint
-from search_server.routes.subjects import subjects_blueprint
-from search_server.routes.works import works_blueprint
+from search_server.routes import blueprints
+from shared_helpers.caches import LRUCache
 from shared_helpers.languages import load_translations, negotiate_languages
+from shared_helpers.memory import (
+    GROUPINGS,
+    compare_snapshot,
+    memory_report,
+    save_snapshot,
+    start_tracing,
+    stop_tracing,
+)
+from shared_helpers.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_FLIGHT,
+    merge_snapshots,
+    read_snapshots,
+    render,
+    snapshot,
+    write_snapshot,
+)
+from shared_helpers.profiler import SamplingProfiler
+from shared_helpers.slow_requests import (
+    RequestLog,
+    configure_slow_request_log,
+    start_request_log,
+    write_slow_request,
+)
 from shared_helpers.solr_connection import SolrConnection
+from shared_helpers.timing import clear_timing, start_timing
+
+# How often each worker writes a snapshot of its metrics, in seconds.
+METRICS_SNAPSHOT_INTERVAL: int = 15
 
 config: dict = yaml.safe_load(open("configuration.yml"))  # noqa: SIM115
 debug_mode: bool = config["common"]["debug"]
@@ -47,19 +74,8 @@ if debug_mode is False:
 app = Sanic("mp_server", dumps=orjson.dumps)
 
 # register routes with their blueprints
-app.blueprint(sources_blueprint)
-app.blueprint(people_blueprint)
-app.blueprint(places_blueprint)
-app.blueprint(institutions_blueprint)
-app.blueprint(subjects_blueprint)
-app.blueprint(incipits_blueprint)
-app.blueprint(festivals_blueprint)
-app.blueprint(countries_blueprint)
-app.blueprint(works_blueprint)
-app.blueprint(query_blueprint)
-app.blueprint(api_blueprint)
-app.blueprint(external_blueprint)
-app.blueprint(sigla_blueprint)
+for bp in blueprints:
+    app.blueprint(bp)
 
 app.config.FORWARDED_SECRET = config["common"]["secret"]
 app.config.KEEP_ALIVE_TIMEOUT = 75  # matches nginx default keepalive
@@ -85,6 +101,92 @@ app.ctx.context_uri = context_uri
 # Make the application configuration object available in the app context
 app.ctx.config = config
 
+# Suggestions fetched from Solr are kept for a short time, so that the suggestions for a
+# longer prefix can be found from them as the user types.
+app.ctx.suggest_cache = SuggestCache(
+    config["search"].get("suggest_cache_size", 10000),
+    config["search"].get("suggest_cache_ttl", 300),
+)
+
+# Rendered map tiles, gzip-compressed.
+app.ctx.tile_cache = LRUCache(
+    "location_tiles", config.get("institutions", {}).get("tile_cache_size", 4096)
+)
+
+# Requests slower than this, in seconds, are logged, with the Solr requests they made.
+slow_requests_config: dict = config.get("slow_requests", {})
+slow_request_threshold: float = slow_requests_config.get("threshold_ms", 0) / 1000
+if slow_request_threshold:
+    configure_slow_request_log(
+        slow_requests_config.get("file", "logs/slow-requests.jsonl"),
+        slow_requests_config.get("max_bytes", 10 * 1024 * 1024),
+        slow_requests_config.get("backups", 5),
+    )
+
+
+@app.after_server_start
+async def load_suggest_index(app):
+    """
+    Starts building the in-memory index of suggestion terms, if it is enabled. Until it
+    is ready, suggestions are served by Solr.
+    """
+    app.ctx.suggest_index_building = False
+    if not config["search"].get("suggest_index", False):
+        return
+
+    suggest_fields: set = {
+        f
+        for fields in suggest_fields_for_alias(
+            config["search"]["facet_definitions"]
+        ).values()
+        for f in fields
+    }
+    app.ctx.suggest_index_building = True
+    app.add_task(
+        refresh_suggest_index(
+            app, sorted(suggest_fields), config["search"]["suggestions"]
+        )
+    )
+
+
+@app.after_server_start
+async def load_location_index(app):
+    """
+    Starts building the in-memory index of institution locations, if it is enabled.
+    Until it is ready, nearby institutions are found by Solr.
+    """
+    app.ctx.location_index_building = False
+    if not config.get("institutions", {}).get("location_index", False):
+        return
+
+    app.ctx.location_index_building = True
+    app.add_task(refresh_location_index(app))
+
+
+@app.after_server_start
+async def load_sigla_index(app):
+    """
+    Starts building the in-memory map of sigla to institutions, if it is enabled.
+    Until it is ready, sigla are looked up in Solr.
+    """
+    app.ctx.sigla_index_building = False
+    if not config.get("institutions", {}).get("sigla_index", False):
+        return
+
+    app.ctx.sigla_index_building = True
+    app.add_task(refresh_sigla_index(app))
+
+
+@app.before_server_start
+async def start_memory_tracing(app):
+    """
+    Traces memory allocations from the start, if it is enabled, so that the memory
+    diagnostics can report where the memory of a worker was allocated. Tracing can also
+    be started and stopped on a running worker through the diagnostics.
+    """
+    if frames := config.get("diagnostics", {}).get("tracemalloc_frames", 0):
+        start_tracing(frames)
+
 
 @app.on_request
 def do_language_negotiation(req):
@@ -105,11 +207,283 @@ def do_language_negotiation(req):
     req.ctx.translations = negotiate_languages(req, translations)
 
 
+async def write_metrics_snapshots(metrics_dir: str):
+    while True:
+        try:
+            write_snapshot(metrics_dir)
+        except OSError:
+            log.exception("Could not write the metrics snapshot")
+        await asyncio.sleep(METRICS_SNAPSHOT_INTERVAL)
+
+
+@app.after_server_start
+async def start_metrics_snapshots(app):
+    """
+    If a metrics directory is set, each worker writes a snapshot of its metrics there, so
+    that the metrics of all the workers can be reported by whichever one is scraped.
+    """
+    if metrics_dir := config.get("metrics", {}).get("dir"):
+        Path(metrics_dir).mkdir(parents=True, exist_ok=True)
+        app.add_task(write_metrics_snapshots(metrics_dir))
+
+
+def finish_request_metrics(req) -> None:
+    # Only the first call for a request counts.
+    if not getattr(req.ctx, "in_flight", False):
+        return
+
+    req.ctx.in_flight = False
+    HTTP_REQUESTS_IN_FLIGHT.dec()
+
+
+@app.on_request
+def start_request_metrics(req):
+    """
+    Counts the request as in flight until it has a response, or, if its handler is
+    cancelled, such as when the client disconnects, until the connection is closed or
+    handles its next request. Neither the response middleware nor the response signal
+    run for a cancelled handler.
+    """
+    if req.conn_info is not None:
+        if previous := getattr(req.conn_info.ctx, "current_request", None):
+            finish_request_metrics(previous)
+        req.conn_info.ctx.current_request = req
+
+    req.ctx.request_start = time.perf_counter()
+    req.ctx.in_flight = True
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+
+
+@app.signal("http.lifecycle.response")
+async def record_request_metrics(request, response):
+    # Unlike response middleware, this signal is also sent for the responses returned
+    # by middleware, and for error responses.
+    start: Optional[float] = getattr(request.ctx, "request_start", None)
+    if start is None:
+        return
+
+    finish_request_metrics(request)
+    route: str = request.route.name if request.route else "unmatched"
+    HTTP_REQUEST_DURATION.observe(
+        time.perf_counter() - start, route=route, status=response.status
+    )
+
+
+@app.signal("http.lifecycle.complete")
+async def finish_connection_metrics(conn_info):
+    if current_request := getattr(conn_info.ctx, "current_request", None):
+        finish_request_metrics(current_request)
+        conn_info.ctx.current_request = None
+
+
+def has_secret(req, header: str) -> bool:
+    """
+    Whether the request has the header with the configured secret as its value. The
+    comparison takes the same time however much of the value matches. A missing or
+    empty header never matches, nor does anything if no secret is configured.
+    """
+    value: str = req.headers.get(header, "")
+    secret: str = config["common"].get("secret") or ""
+    if not value or not secret:
+        return False
+
+    # Header values may hold any byte, which compare_digest does not take in a str.
+    return hmac.compare_digest(
+        value.encode("utf-8", "surrogateescape"), secret.encode("utf-8")
+    )
+
+
+@app.on_request
+def start_server_timing(req):
+    """
+    Times the stages of handling a request, and reports them in a Server-Timing header.
+    This is enabled for all requests in the configuration, or for a single request with
+    an X-Server-Timing header that has the configured secret as its value.
+    """
+    if config["common"].get("server_timing", False) or (
+        has_secret(req, "X-Server-Timing")
+    ):
+        req.ctx.timing = start_timing()
+    else:
+        clear_timing()
+
+
+@app.on_response
+def add_server_timing(req, resp):
+    if timing := getattr(req.ctx, "timing", None):
+        resp.headers["Server-Timing"] = timing.header()
+
+
+@app.on_request
+def start_slow_request_log(req):
+    """
+    If the slow-request log is enabled, captures the Solr requests and times the stages
+    of every request, so that they can be logged if the request turns out to be slow.
+    """
+    if not slow_request_threshold:
+        return
+
+    req.ctx.request_log = start_request_log()
+    # The Server-Timing collector, if this request has one, also times the stages.
+    req.ctx.stage_timing = getattr(req.ctx, "timing", None) or start_timing()
+
+
+@app.on_response
+def log_slow_request(req, resp):
+    request_log: Optional[RequestLog] = getattr(req.ctx, "request_log", None)
+    start: Optional[float] = getattr(req.ctx, "request_start", None)
+    if request_log is None or start is None:
+        return
+
+    duration: float = time.perf_counter() - start
+    if duration < slow_request_threshold:
+        return
+
+    stages: dict[str, list] = req.ctx.stage_timing.stages
+    negotiated: dict = getattr(req.ctx, "translations", None) or {}
+    write_slow_request(
+        {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "pid": os.getpid(),
+            "route": req.route.name if req.route else "unmatched",
+            "path": req.path,
+            "query": req.query_string,
+            "accept": req.headers.get("Accept"),
+            # The language codes of a label that is translated into every language.
+            "languages": sorted(negotiated.get("general.rism", {})),
+            "status": resp.status,
+            "duration_ms": round(duration * 1000, 1),
+            "stages": {
+                stage: {"ms": round(total * 1000, 1), "count": count}
+                for stage, (total, count) in stages.items()
+            },
+            "solr": request_log.solr_requests,
+            "verovio_renders": stages.get("verovio", [0.0, 0])[1],
+            "response_bytes": len(resp.body) if resp.body is not None else None,
+        }
+    )
+
+
+@app.on_request
+def start_profiler(req):
+    """
+    Profiles a single request with a sampling profiler, if it has an X-Profile header
+    with the configured secret as its value. The profile, as collapsed stacks, is written
+    to the profiling directory if one is set; otherwise it is sent instead of the response.
+    """
+    if not has_secret(req, "X-Profile"):
+        return
+
+    profiler = SamplingProfiler(
+        asyncio.current_task(),
+        config.get("profiling", {}).get("interval_ms", 1) / 1000,
+    )
+    profiler.start()
+    req.ctx.profiler = profiler
+
+
+@app.on_response
+def finish_profiler(req, resp):
+    """
+    The profile replaces the body of the response, rather than being returned as a new
+    response, so that the response middleware registered before this still runs.
+    """
+    profiler: Optional[SamplingProfiler] = getattr(req.ctx, "profiler", None)
+    if not profiler:
+        return
+
+    profiler.stop()
+    log.warning(
+        "Profiled %s: %s samples in %.3fs",
+        req.path,
+        profiler.num_samples,
+        profiler.duration,
+    )
+
+    profile_dir: Optional[str] = config.get("profiling", {}).get("dir")
+    if not profile_dir:
+        resp.status = 200
+        resp.body = profiler.collapsed().encode("utf-8")
+        resp.headers["Content-Type"] = "text/plain; charset=utf-8"
+        resp.headers.pop("Content-Encoding", None)
+        return
+
+    route: str = req.route.name if req.route else "unmatched"
+    filename: str = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{route}.collapsed"
+    Path(profile_dir).mkdir(parents=True, exist_ok=True)
+    Path(profile_dir, filename).write_text(profiler.collapsed())
+    resp.headers["X-Profile-File"] = filename
+
+
 @app.route("/")
 async def front(req):
     return await handle_front_request(req)
 
 
+@app.route("/metrics")
+async def metrics(req):
+    """
+    Metrics for all the workers in the Prometheus text format, or for only the worker
+    that answers if there is no metrics directory set.
+    """
+    metrics_dir: Optional[str] = config.get("metrics", {}).get("dir")
+    if metrics_dir:
+        write_snapshot(metrics_dir)
+        current: dict = merge_snapshots(read_snapshots(metrics_dir))
+    else:
+        current = snapshot()
+
+    return response.text(
+        render(current), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.route("/diagnostics/memory")
+async def memory_diagnostics(req):
+    """
+    Memory accounting for the worker that answers, for finding leaks. Only answered for
+    requests with an X-Diagnostics header that has the configured secret as its value.
+
+    Query parameters:
+     - `trace`: "on" (with an optional number of `frames`) or "off", to start or stop
+        tracing allocations
+     - `snapshot`: save a snapshot with this name
+     - `compare`: report the changes since the snapshot with this name
+     - `group`: group the allocations by "subsystem" (the default), "filename" or "lineno"
+     - `limit`: the number of entries in each list
+    """
+    if not has_secret(req, "X-Diagnostics"):
+        return response.text("The requested resource was not found", status=404)
+
+    group_by: str = req.args.get("group", "subsystem")
+    if group_by not in GROUPINGS:
+        return response.text(f"Unknown grouping {group_by}", status=400)
+
+    try:
+        limit: int = int(req.args.get("limit", 25))
+        frames: int = int(req.args.get("frames", 1))
+    except ValueError:
+        return response.text("The limit and frames must be numbers", status=400)
+
+    if (trace := req.args.get("trace")) == "on":
+        start_tracing(frames)
+    elif trace == "off":
+        stop_tracing()
+
+    if snapshot_name := req.args.get("snapshot"):
+        save_snapshot(snapshot_name)
+
+    if compare_name := req.args.get("compare"):
+        comparison: Optional[dict] = compare_snapshot(compare_name, group_by, limit)
+        if comparison is None:
+            return response.text(
+                f"No snapshot {compare_name} in worker {os.getpid()}", status=404
+            )
+        return response.json(comparison)
+
+    return response.json(memory_report(group_by, limit))
+
+
 @app.route("/about")
 async def about(req):
     cfg: dict = req.app.ctx.config
@@ -0,0 +1,126 @@
+"""
+In-process caches. Each cache is registered by name when it is created, so that the
+sizes and hit rates of all the caches in a worker can be reported together.
+
+  >>> from shared_helpers.caches import LRUCache
+  >>> cards = LRUCache("og_cards", 4096)
+  >>> cards.set(("source_1", "tw"), "<html>...</html>")
+  >>> cards.get(("source_1", "tw"))
+
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_registry: dict[str, "LRUCache"] = {}
+_function_caches: dict[str, Callable] = {}
+
+
+class LRUCache:
+    """
+    A dictionary with a maximum size, that evicts the least recently used entry
+    when it is full.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        self.name: str = name
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict = OrderedDict()
+        _registry[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value: Optional[Any] = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class TTLCache(LRUCache):
+    """
+    An LRU cache whose entries also expire a given number of seconds after they are set.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        super().__init__(name, maxsize)
+        self.ttl: float = ttl
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns an entry without counting a hit or a miss, or changing its recency.
+        """
+        entry: Optional[tuple] = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+
+        return value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value: Optional[Any] = self.peek(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        super().set(key, (time.monotonic() + self.ttl, value))
+
+
+def register_function_cache(name: str, func: Callable) -> Callable:
+    """
+    Registers a function wrapped in `functools.lru_cache`, so that its cache is
+    reported with the others.
+    """
+    _function_caches[name] = func
+    return func
+
+
+def cache_stats() -> dict[str, dict]:
+    """
+    Returns the statistics for all the caches in this process, by name.
+    """
+    stats: dict[str, dict] = {name: cache.stats() for name, cache in _registry.items()}
+    for name, func in _function_caches.items():
+        info = func.cache_info()
+        stats[name] = {
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+        }
+
+    return stats
@@ -1,6 +1,8 @@
 import re
 from typing import Optional, Pattern
 
+from shared_helpers.serializer_context import SerializerContext
+
 ID_SUB: Pattern = re.compile(
     r"source_|person_|holding_|institution_|subject_|related_|place_|festival_|mg_|dobject_|work_"
 )
@@ -71,11 +73,14 @@ def get_identifier(request: "sanic.request.Request", viewname: str, **kwargs) ->
     Takes a request object, parses it out, and returns a templated identifier suitable
     for use in an "id" field, including the incoming request information on host and scheme (http/https).
 
-    :param request: A Sanic request object
+    :param request: A Sanic request object, or a SerializerContext outside of a web request
     :param viewname: A string of the view for which we will retrieve the URL. Matches the function name in server.py.
     :param kwargs: A set of keywords matching the template formatting variables
     :return: A templated string
     """
+    if isinstance(request, SerializerContext):
+        return request.identifier(viewname, **kwargs)
+
     fwd_scheme_header = request.headers.get("X-Forwarded-Proto")
     fwd_host_header = request.headers.get("X-Forwarded-Host")
 
@@ -96,9 +101,12 @@ def get_site(req) -> str:
 
     Does NOT add a trailing slash.
 
-    :param req: A Sanic request object
+    :param req: A Sanic request object, or a SerializerContext outside of a web request
     :return: A templated string
     """
+    if isinstance(req, SerializerContext):
+        return req.base_url
+
     fwd_scheme_header = req.headers.get("X-Forwarded-Proto")
     fwd_host_header = req.headers.get("X-Forwarded-Host")
 
@@ -0,0 +1,61 @@
+import logging
+import time
+from typing import Optional
+
+from small_asc.client import Results
+
+from shared_helpers.solr_connection import SolrConnection
+
+"""
+Keeps track of the version of the index, so that anything derived from the index
+(snapshots, in-memory lookups, caches) can be rebuilt after a re-index. The version is
+the 'indexed' timestamp of the most recent indexer document. It is checked against Solr
+at most once per INDEX_VERSION_TTL seconds, so it is cheap to call on every request.
+
+  >>> from shared_helpers.index_version import get_index_version
+  >>> version = await get_index_version()
+
+"""
+
+log = logging.getLogger("mp_server")
+
+INDEX_VERSION_TTL: float = 60.0
+
+_index_version: dict = {"value": None, "checked": 0.0}
+
+
+async def get_index_version(refresh: bool = False) -> Optional[str]:
+    """
+    Returns the current index version, or None if there is no indexer document.
+
+    :param refresh: Always check the version against Solr
+    :return: The timestamp of the last indexer run
+    """
+    now: float = time.monotonic()
+    if (
+        not refresh
+        and _index_version["value"]
+        and now - _index_version["checked"] < INDEX_VERSION_TTL
+    ):
+        return _index_version["value"]
+
+    idx_results: Results = await SolrConnection.search(
+        {
+            "query": "*:*",
+            "filter": ["type:indexer"],
+            "sort": "indexed desc",
+            "limit": 1,
+            "fields": ["indexed"],
+        }
+    )
+
+    version: Optional[str] = (
+        idx_results.docs[0]["indexed"] if idx_results.hits > 0 else None
+    )
+    if version != _index_version["value"]:
+        log.info("Index version is now %s", version)
+
+    _index_version["value"] = version
+    _index_version["checked"] = now
+
+    return version
@@ -0,0 +1,244 @@
+import gc
+import os
+import sysconfig
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from shared_helpers.caches import cache_stats
+
+"""
+Memory accounting for a worker: its resident size, the sizes of its caches, the state of
+the garbage collector, the number of objects of each type, and, if tracemalloc is
+tracing, where the memory was allocated.
+
+To find a leak, save a snapshot, let the worker handle some traffic, and compare with
+it. The allocations are grouped by "subsystem": the third-party package, or the module
+of this application, that made them. Allocations made in the standard library are
+counted against the code that called it, so that, for example, copying the translations
+is counted against the module that copies them.
+
+  >>> from shared_helpers.memory import compare_snapshot, save_snapshot
+  >>> save_snapshot("before")
+  >>> ...
+  >>> compare_snapshot("before", "subsystem", 20)
+
+Each worker keeps its own snapshots, and only the last few are kept.
+"""
+
+GROUPINGS: tuple = ("subsystem", "filename", "lineno")
+MAX_SNAPSHOTS: int = 4
+
+_STDLIB_DIR: str = sysconfig.get_paths()["stdlib"]
+_APP_DIR: str = os.getcwd()
+_IGNORED_FILES: tuple = (
+    tracemalloc.__file__,
+    __file__,
+    "<frozen importlib._bootstrap>",
+    "<frozen importlib._bootstrap_external>",
+    "<unknown>",
+)
+
+
+class MemorySnapshot(NamedTuple):
+    allocations: Optional[tracemalloc.Snapshot]
+    objects: Counter
+
+
+_snapshots: dict[str, MemorySnapshot] = {}
+
+
+def start_tracing(frames: int) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing() -> None:
+    tracemalloc.stop()
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    The resident set size of this process, or None where it is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def gc_stats() -> dict:
+    return {
+        "counts": gc.get_count(),
+        "thresholds": gc.get_threshold(),
+        "collections": [g["collections"] for g in gc.get_stats()],
+        "collected": [g["collected"] for g in gc.get_stats()],
+        "uncollectable": len(gc.garbage),
+    }
+
+
+def object_counts() -> Counter:
+    """
+    The number of objects of each type that the garbage collector tracks. Atomic objects,
+    like strings and numbers, are not tracked, and so are not counted.
+    """
+    return Counter(
+        f"{type(o).__module__}.{type(o).__qualname__}" for o in gc.get_objects()
+    )
+
+
+def subsystem(filename: str) -> str:
+    """
+    The package, or the module of this application, that a file belongs to.
+    """
+    if "site-packages" in filename:
+        return Path(filename.split("site-packages", 1)[1]).parts[1].split(".")[0]
+
+    if filename.startswith(_APP_DIR):
+        module_path = Path(filename).relative_to(_APP_DIR).with_suffix("")
+        return ".".join(module_path.parts)
+
+    if filename.startswith(_STDLIB_DIR):
+        return f"stdlib.{Path(filename).stem}"
+
+    return filename
+
+
+def _traceback_subsystem(traceback: tracemalloc.Traceback) -> str:
+    # The frames are sorted from the oldest to the most recent. Count the allocation
+    # against the most recent frame outside the standard library.
+    for frame in reversed(traceback):
+        if not frame.filename.startswith(_STDLIB_DIR):
+            return subsystem(frame.filename)
+
+    return subsystem(traceback[-1].filename)
+
+
+def _take_allocations() -> Optional[tracemalloc.Snapshot]:
+    if not tracemalloc.is_tracing():
+        return None
+
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, f) for f in _IGNORED_FILES]
+    )
+
+
+def _grouped(snapshot: tracemalloc.Snapshot, group_by: str) -> dict[str, tuple]:
+    """
+    The size and number of allocations, by the grouping key.
+    """
+    if group_by == "filename":
+        return {
+            s.traceback[0].filename: (s.size, s.count)
+            for s in snapshot.statistics("filename")
+        }
+
+    if group_by == "lineno":
+        return {
+            str(s.traceback[0]): (s.size, s.count)
+            for s in snapshot.statistics("lineno")
+        }
+
+    sizes: Counter = Counter()
+    counts: Counter = Counter()
+    for trace in snapshot.traces:
+        key: str = _traceback_subsystem(trace.traceback)
+        sizes[key] += trace.size
+        counts[key] += 1
+
+    return {k: (sizes[k], counts[k]) for k in sizes}
+
+
+def allocations_report(group_by: str, limit: int) -> dict:
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+
+    current, peak = tracemalloc.get_traced_memory()
+    grouped: dict = _grouped(_take_allocations(), group_by)
+    top: list = sorted(grouped.items(), key=lambda g: g[1][0], reverse=True)[:limit]
+
+    return {
+        "tracing": True,
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced": current,
+        "peak": peak,
+        "top": [{"key": k, "size": size, "count": count} for k, (size, count) in top],
+    }
+
+
+def memory_report(group_by: str = "subsystem", limit: int = 25) -> dict:
+    return {
+        "pid": os.getpid(),
+        "rss": rss_bytes(),
+        "caches": cache_stats(),
+        "gc": gc_stats(),
+        "objects": dict(object_counts().most_common(limit)),
+        "allocations": allocations_report(group_by, limit),
+        "snapshots": list(_snapshots),
+    }
+
+
+def save_snapshot(name: str) -> None:
+    if name not in _snapshots and len(_snapshots) >= MAX_SNAPSHOTS:
+        del _snapshots[next(iter(_snapshots))]
+
+    _snapshots[name] = MemorySnapshot(_take_allocations(), object_counts())
+
+
+def compare_snapshot(
+    name: str, group_by: str = "subsystem", limit: int = 25
+) -> Optional[dict]:
+    """
+    The change in the allocations and the numbers of objects since a saved snapshot,
+    largest first. Returns None if there is no snapshot with that name.
+    """
+    saved: Optional[MemorySnapshot] = _snapshots.get(name)
+    if saved is None:
+        return None
+
+    current_objects: Counter = object_counts()
+    object_diffs: list = sorted(
+        (
+            (t, current_objects[t] - saved.objects[t], current_objects[t])
+            for t in current_objects.keys() | saved.objects.keys()
+            if current_objects[t] != saved.objects[t]
+        ),
+        key=lambda d: abs(d[1]),
+        reverse=True,
+    )[:limit]
+
+    allocation_diffs: Optional[list] = None
+    current_allocations: Optional[tracemalloc.Snapshot] = _take_allocations()
+    if saved.allocations and current_allocations:
+        before: dict = _grouped(saved.allocations, group_by)
+        after: dict = _grouped(current_allocations, group_by)
+        diffs: list = sorted(
+            (
+                (
+                    k,
+                    after.get(k, (0, 0))[0] - before.get(k, (0, 0))[0],
+                    after.get(k, (0, 0))[1] - before.get(k, (0, 0))[1],
+                    after.get(k, (0, 0))[0],
+                )
+                for k in after.keys() | before.keys()
+            ),
+            key=lambda d: abs(d[1]),
+            reverse=True,
+        )
+        allocation_diffs = [
+            {"key": k, "size_diff": size_diff, "count_diff": count_diff, "size": size}
+            for k, size_diff, count_diff, size in diffs[:limit]
+            if size_diff or count_diff
+        ]
+
+    return {
+        "pid": os.getpid(),
+        "since": name,
+        "rss": rss_bytes(),
+        "objects": [
+            {"type": t, "diff": diff, "count": count} for t, diff, count in object_diffs
+        ],
+        "allocations": allocation_diffs,
+    }
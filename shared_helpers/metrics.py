@@ -0,0 +1,263 @@
+import bisect
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from shared_helpers.caches import cache_stats
+
+"""
+Counters, gauges and histograms for monitoring the server, in the Prometheus text format.
+
+Each worker process keeps its own metrics. So that they can be scraped from any worker,
+every worker writes a snapshot of its metrics to a shared directory from time to time,
+and the worker that answers a scrape adds up the snapshots of all the workers.
+
+  >>> from shared_helpers.metrics import Histogram
+  >>> REQUEST_DURATION = Histogram("request_duration_seconds", "...", ("route",))
+  >>> REQUEST_DURATION.observe(0.25, route="mp_server.sources.source")
+
+"""
+
+DEFAULT_BUCKETS: tuple = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Snapshots of workers that have not written one for this long are left out.
+STALE_SNAPSHOT_SECONDS: int = 300
+
+_registry: dict[str, "Metric"] = {}
+
+
+class Metric:
+    metric_type: str = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name: str = f"mp_{name}"
+        self.documentation: str = documentation
+        self.labelnames: tuple = labelnames
+        self.values: dict[tuple, object] = {}
+        _registry[self.name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.metric_type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": [[list(k), v] for k, v in self.values.items()],
+        }
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key: tuple = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value: float, **labels) -> None:
+        """
+        Sets a counter that is kept elsewhere, such as the hits of a cache.
+        """
+        self.values[self._key(labels)] = value
+
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: tuple = buckets
+
+    def observe(self, value: float, **labels) -> None:
+        key: tuple = self._key(labels)
+        # The count in each bucket (not cumulative), then the overflow, sum and count.
+        counts: Optional[list] = self.values.get(key)
+        if counts is None:
+            counts = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            self.values[key] = counts
+
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "The time taken to respond to a request, by route.",
+    ("route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "The number of requests being handled."
+)
+SOLR_REQUEST_DURATION = Histogram(
+    "solr_request_duration_seconds",
+    "The wall time of a Solr request, by request handler.",
+    ("handler",),
+)
+SOLR_QTIME = Histogram(
+    "solr_qtime_seconds",
+    "The QTime reported by Solr for a request, by request handler.",
+    ("handler",),
+)
+SOLR_PARTIAL_RESULTS = Counter(
+    "solr_partial_results_total",
+    "Searches that Solr stopped at the time allowed, by request handler.",
+    ("handler",),
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds",
+    "The time spent in each stage of handling requests, such as Verovio or resvg.",
+    ("stage",),
+)
+CACHE_HITS = Counter("cache_hits_total", "Cache hits, by cache.", ("cache",))
+CACHE_MISSES = Counter("cache_misses_total", "Cache misses, by cache.", ("cache",))
+CACHE_SIZE = Gauge("cache_size", "The number of entries in a cache.", ("cache",))
+
+
+def snapshot() -> dict:
+    for name, stats in cache_stats().items():
+        CACHE_HITS.set(stats["hits"], cache=name)
+        CACHE_MISSES.set(stats["misses"], cache=name)
+        CACHE_SIZE.set(stats["size"], cache=name)
+
+    return {name: metric.snapshot() for name, metric in _registry.items()}
+
+
+def write_snapshot(metrics_dir: str) -> None:
+    """
+    Writes the snapshot of the metrics of this worker to the shared directory.
+    """
+    path = Path(metrics_dir, f"worker-{os.getpid()}.json")
+    tmp_path: Path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(orjson.dumps(snapshot()))
+    os.replace(tmp_path, path)
+
+
+def read_snapshots(metrics_dir: str) -> list[dict]:
+    """
+    Reads the snapshots of all the workers, removing the ones that have not been
+    updated recently.
+    """
+    snapshots: list[dict] = []
+    now: float = time.time()
+    for path in Path(metrics_dir).glob("worker-*.json"):
+        try:
+            if now - path.stat().st_mtime > STALE_SNAPSHOT_SECONDS:
+                path.unlink(missing_ok=True)
+                continue
+            snapshots.append(orjson.loads(path.read_bytes()))
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            # The worker may have been replacing it.
+            continue
+
+    return snapshots
+
+
+def merge_snapshots(snapshots: list[dict]) -> dict:
+    """
+    Adds up the snapshots of several workers. Counters, gauges and histogram buckets
+    are all summed.
+    """
+    merged: dict = {}
+    for snap in snapshots:
+        for name, metric in snap.items():
+            if name not in merged:
+                merged[name] = {**metric, "values": {}}
+
+            values: dict = merged[name]["values"]
+            for labels, value in metric["values"]:
+                key: tuple = tuple(labels)
+                if key not in values:
+                    values[key] = value
+                elif isinstance(value, list):
+                    # The workers share the buckets, so the lists are the same
+                    # length; zip's strict= needs Python 3.10.
+                    values[key] = [a + b for a, b in zip(values[key], value)]  # noqa: B905
+                else:
+                    values[key] += value
+
+    for metric in merged.values():
+        metric["values"] = [[list(k), v] for k, v in metric["values"].items()]
+
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: list, labels: list, extra: Optional[dict] = None) -> str:
+    # A metric's values have a label for each of its names. (strict= needs 3.10.)
+    pairs: list = list(zip(labelnames, labels))  # noqa: B905
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ""
+
+    formatted: str = ",".join(f'{n}="{_escape(str(v))}"' for n, v in pairs)
+    return f"{{{formatted}}}"
+
+
+def render(metrics: dict) -> str:
+    """
+    Formats a snapshot in the Prometheus text exposition format.
+    """
+    lines: list[str] = []
+    for name, metric in sorted(metrics.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames: list = metric["labelnames"]
+
+        for labels, value in metric["values"]:
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {value}")
+                continue
+
+            cumulative: int = 0
+            # The value also holds the overflow, sum and count after the buckets, which
+            # zip leaves out.
+            for upper, count in zip(metric["buckets"], value):  # noqa: B905
+                cumulative += count
+                le: dict = {"le": str(upper)}
+                lines.append(
+                    f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}"
+                )
+            inf_labels: str = _format_labels(labelnames, labels, {"le": "+Inf"})
+            lines.append(f"{name}_bucket{inf_labels} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {value[-2]}")
+            lines.append(
+                f"{name}_count{_format_labels(labelnames, labels)} {value[-1]}"
+            )
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Optional
+
+"""
+A sampling profiler for a single request. A thread samples the stack of the task
+handling the request at a fixed interval. The result is written as "collapsed stacks",
+which can be read by flamegraph.pl, speedscope and similar tools: one line per stack,
+with the time it was seen for in microseconds. (Each sample is weighted by the time
+since the one before, since the sampling thread must wait for the GIL, and so samples
+less often while Python code is running than while the loop is waiting.)
+
+When the task is running, the sample is the stack of the event loop thread from the
+task's coroutine down. When it is waiting (on Solr, say), the sample is the chain of
+coroutines it is awaiting, ending with what it is waiting for, so that time spent
+waiting is attributed as well. Other requests running at the same time on the same
+event loop are not included.
+"""
+
+DEFAULT_INTERVAL: float = 0.001
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    filename: str = os.path.relpath(code.co_filename)
+    if filename.startswith(".."):
+        filename = os.path.basename(code.co_filename)
+
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, task: asyncio.Task, interval: float = DEFAULT_INTERVAL):
+        self.task: asyncio.Task = task
+        self.interval: float = interval
+        self.samples: Counter = Counter()
+        self.num_samples: int = 0
+        self.duration: float = 0.0
+        self._thread_id: int = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start: float = 0.0
+
+    def _running_stack(self, root: FrameType) -> Optional[list[str]]:
+        frame: Optional[FrameType] = sys._current_frames().get(self._thread_id)
+        stack: list[str] = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            if frame is root:
+                stack.reverse()
+                return stack
+            frame = frame.f_back
+
+        # The task was suspended before the sample was taken.
+        return None
+
+    def _awaiting_stack(self) -> list[str]:
+        stack: list[str] = []
+        awaited = self.task.get_coro()
+        while awaited is not None:
+            frame: Optional[FrameType] = getattr(awaited, "cr_frame", None) or getattr(
+                awaited, "gi_frame", None
+            )
+            if frame is None:
+                # A future, or something other than a coroutine.
+                stack.append(f"[awaiting {type(awaited).__name__}]")
+                break
+
+            stack.append(_frame_label(frame))
+            awaited = getattr(awaited, "cr_await", None) or getattr(
+                awaited, "gi_yieldfrom", None
+            )
+
+        return stack
+
+    def _sample(self, weight: int) -> None:
+        coro = self.task.get_coro()
+        root: Optional[FrameType] = getattr(coro, "cr_frame", None)
+        if root is None:
+            return
+
+        stack: Optional[list[str]] = None
+        if getattr(coro, "cr_running", False):
+            stack = self._running_stack(root)
+        if stack is None:
+            stack = self._awaiting_stack()
+
+        self.samples[";".join(stack)] += weight
+        self.num_samples += 1
+
+    def _run(self) -> None:
+        last: float = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now: float = time.perf_counter()
+            self._sample(int((now - last) * 1_000_000))
+            last = now
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._start
+
+    def collapsed(self) -> str:
+        """
+        Returns the samples in the collapsed stack format, with times in microseconds.
+        """
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.samples.most_common()
+        )
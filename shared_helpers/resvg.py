@@ -1,9 +1,12 @@
 import logging
 import subprocess  # noqa: S404
 
+from shared_helpers.timing import timed_function
+
 log = logging.getLogger("mp_server")
 
 
+@timed_function("resvg")
 def render_svg(
     svginput: str, outpath: str, resvg_path: str, font_path: str, zoom_factor: str = "1"
 ) -> bool:
@@ -0,0 +1,74 @@
+"""
+A stand-in for a Sanic request, for serializing records outside of a web request
+(e.g., in the linked data exporter). The serializers only need a request to construct
+identifiers and to find the translations, so this carries a base URL, the translations,
+and a table of URL templates for the routes. The templates are computed once from the
+blueprints, so identifiers are built with string formatting rather than by the router.
+
+    >>> from search_server.routes import blueprints
+    >>> ctx = SerializerContext("https://rism.online", translations, url_templates_from_blueprints(blueprints))
+    >>> FullSource(doc, context={"request": ctx, "direct_request": True}).data
+
+"""
+
+import re
+from types import SimpleNamespace
+from typing import Iterable, Optional, Pattern
+from urllib.parse import urlencode
+
+from sanic import Blueprint
+
+ROUTE_PARAM: Pattern = re.compile(r"<(\w+)(?::[^>]+)?>")
+
+
+def url_templates_from_blueprints(blueprints: Iterable[Blueprint]) -> dict[str, str]:
+    """
+    Builds a table of route names (e.g., "sources.source") to URL templates
+    (e.g., "/sources/{source_id}"). Trailing slashes are removed, as they are by
+    `app.url_for` for routes that do not have strict slashes.
+
+    :param blueprints: The blueprints whose routes should be included
+    :return: A dictionary of route names to URL templates
+    """
+    templates: dict[str, str] = {}
+
+    for bp in blueprints:
+        prefix: str = bp.url_prefix or ""
+        for route in bp._future_routes:
+            path: str = "/" + f"{prefix}{route.uri}".strip("/")
+            templates[route.name] = ROUTE_PARAM.sub(r"{\1}", path)
+
+    return templates
+
+
+class SerializerContext:
+    def __init__(self, base_url: str, translations: dict, url_templates: dict):
+        self.base_url: str = base_url.rstrip("/")
+        self.url_templates: dict[str, str] = url_templates
+        self.ctx = SimpleNamespace(translations=translations)
+
+    def identifier(self, viewname: str, **kwargs) -> str:
+        """
+        Constructs the full URL for a route, matching the output of `get_identifier` for
+        a real request. Keyword arguments that are not route parameters are added to the
+        query string, as they are by `app.url_for`.
+
+        Raises ValueError if the route is not known.
+        """
+        template: Optional[str] = self.url_templates.get(viewname)
+        if template is None:
+            raise ValueError(f"No URL template for the route {viewname}")
+
+        params: dict = {}
+        query: dict = {}
+        for key, value in kwargs.items():
+            if f"{{{key}}}" in template:
+                params[key] = value
+            else:
+                query[key] = value
+
+        url: str = f"{self.base_url}{template.format(**params)}"
+        if query:
+            url = f"{url}?{urlencode(query, doseq=True)}"
+
+        return url
@@ -0,0 +1,104 @@
+import logging
+import logging.handlers
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Optional
+
+import orjson
+
+"""
+A log of the requests that are slower than a threshold, as JSON lines, with the Solr
+requests that each one made, so that the records and queries that are slow to serve
+can be found.
+
+While a request is being handled, the Solr requests it makes are captured in a context
+variable, as the stages are for the Server-Timing header (see `shared_helpers.timing`),
+so they can be captured anywhere without passing the request down.
+
+  >>> from shared_helpers.slow_requests import start_request_log
+  >>> request_log = start_request_log()
+  >>> ...
+  >>> request_log.solr_requests
+
+"""
+
+_request_log: ContextVar[Optional["RequestLog"]] = ContextVar(
+    "request_log", default=None
+)
+
+slow_log = logging.getLogger("mp_slow_requests")
+slow_log.propagate = False
+
+
+class RequestLog:
+    def __init__(self):
+        self.solr_requests: list[dict] = []
+
+    def add_solr_request(
+        self,
+        method: str,
+        handler: str,
+        body: Any,
+        duration: float,
+        qtime: Optional[int] = None,
+    ) -> None:
+        self.solr_requests.append(
+            {
+                "method": method,
+                "handler": handler,
+                "body": body,
+                "qtime_ms": qtime,
+                "wall_ms": round(duration * 1000, 1),
+            }
+        )
+
+
+def start_request_log() -> RequestLog:
+    """
+    Starts capturing the Solr requests of the current request.
+    """
+    request_log = RequestLog()
+    _request_log.set(request_log)
+    return request_log
+
+
+def record_solr_request(
+    method: str, handler: str, body: Any, start: float, qtime: Optional[int] = None
+) -> None:
+    """
+    Records a Solr request, started at `start`, if the current request is being logged.
+    """
+    if (request_log := _request_log.get()) is not None:
+        request_log.add_solr_request(
+            method, handler, body, time.perf_counter() - start, qtime
+        )
+
+
+def worker_log_path(filename: str) -> Path:
+    """
+    The log file of this worker, e.g. "logs/slow-requests-1234.jsonl". Each worker
+    process writes its own file, since each one rotates its file on its own count of
+    bytes, and would otherwise move the file out from under the others.
+    """
+    path = Path(filename)
+    return path.with_name(f"{path.stem}-{os.getpid()}{path.suffix}")
+
+
+def configure_slow_request_log(filename: str, max_bytes: int, backups: int) -> None:
+    path: Path = worker_log_path(filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # The file is only created when a slow request is logged, so that processes that
+    # do not handle requests leave no empty files.
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    slow_log.addHandler(handler)
+    slow_log.setLevel(logging.INFO)
+
+
+def write_slow_request(record: dict) -> None:
+    # Solr request bodies can hold values that are not JSON types, such as sets of fields.
+    slow_log.info(orjson.dumps(record, default=str).decode("utf-8"))
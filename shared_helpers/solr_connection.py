@@ -1,9 +1,19 @@
 import logging
+import os
+import time
 from typing import NewType, Optional
 
 import yaml
 from small_asc.client import Results, Solr
 
+from shared_helpers.metrics import (
+    SOLR_PARTIAL_RESULTS,
+    SOLR_QTIME,
+    SOLR_REQUEST_DURATION,
+)
+from shared_helpers.slow_requests import record_solr_request
+from shared_helpers.timing import timed_function
+
 """
 A Singleton for a global Solr connection. Methods that wish
 to make use of a global Solr connection can import this module
@@ -20,9 +30,70 @@ log = logging.getLogger("mp_server")
 with open("configuration.yml") as yml:
     config: dict = yaml.safe_load(yml)
 
-solr_url = config["solr"]["server"]
+# The server can be set in the environment, so that the benchmarks can point the
+# application at a stand-in for Solr.
+solr_url = os.environ.get("MP_SOLR_SERVER", config["solr"]["server"])
+
+
+class TimedSolr(Solr):
+    """
+    Records the time taken by each Solr request in the timing of the current request,
+    and in the Solr metrics, and captures the request for the slow-request log. (The
+    later pages of a cursor are fetched as the results are iterated, and so are counted
+    in the stage that iterates them.)
+    """
+
+    @timed_function("solr")
+    async def search(self, *args, **kwargs):
+        handler: str = kwargs.get("handler", "default")
+        start: float = time.perf_counter()
+        res: Results = await super().search(*args, **kwargs)
+        SOLR_REQUEST_DURATION.observe(time.perf_counter() - start, handler=handler)
+
+        response_header: dict = res.raw_response.get("responseHeader", {})
+        qtime: Optional[int] = response_header.get("QTime")
+        if qtime is not None:
+            SOLR_QTIME.observe(qtime / 1000, handler=handler)
+
+        if response_header.get("partialResults"):
+            SOLR_PARTIAL_RESULTS.inc(handler=handler)
+            log.warning(
+                "Solr returned partial results for %s", args[0] if args else None
+            )
+
+        record_solr_request("search", handler, args[0] if args else None, start, qtime)
+
+        return res
+
+    @timed_function("solr")
+    async def get(self, *args, **kwargs):
+        handler: str = kwargs.get("handler", "/get")
+        start: float = time.perf_counter()
+        res: Optional[dict] = await super().get(*args, **kwargs)
+        SOLR_REQUEST_DURATION.observe(time.perf_counter() - start, handler=handler)
+        record_solr_request("get", handler, args[0] if args else None, start)
+
+        return res
+
+    @timed_function("solr")
+    async def term_suggest(self, *args, **kwargs):
+        handler: str = kwargs.get("handler", "default")
+        start: float = time.perf_counter()
+        res: dict = await super().term_suggest(*args, **kwargs)
+        SOLR_REQUEST_DURATION.observe(time.perf_counter() - start, handler=handler)
+
+        qtime: Optional[int] = res.get("responseHeader", {}).get("QTime")
+        if qtime is not None:
+            SOLR_QTIME.observe(qtime / 1000, handler=handler)
+
+        record_solr_request(
+            "term_suggest", handler, args[0] if args else None, start, qtime
+        )
+
+        return res
+
 
-SolrConnection: Solr = Solr(solr_url)
+SolrConnection: Solr = TimedSolr(solr_url)
 
 log.debug("Solr connection set to %s", solr_url)
 
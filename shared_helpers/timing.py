@@ -0,0 +1,107 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from shared_helpers.metrics import STAGE_DURATION
+
+"""
+Collects the time spent in each stage of handling a request (Solr, serialization,
+rendering, and so on) so that it can be reported in a `Server-Timing` response header.
+The collector for the current request is kept in a context variable, so the stages can
+be timed anywhere in the code without passing the request down. Outside of a request
+that is being timed, the stages are only recorded in the stage metrics.
+
+  >>> from shared_helpers.timing import timed
+  >>> with timed("solr"):
+  ...     res = await SolrConnection.search({"query": "Some query"})
+
+"""
+
+_collector: ContextVar[Optional["TimingCollector"]] = ContextVar(
+    "timing_collector", default=None
+)
+
+
+class TimingCollector:
+    def __init__(self):
+        self.start: float = time.perf_counter()
+        # The total duration, in seconds, and the number of calls for each stage.
+        self.stages: dict[str, list] = {}
+
+    def add(self, stage: str, duration: float) -> None:
+        totals: list = self.stages.setdefault(stage, [0.0, 0])
+        totals[0] += duration
+        totals[1] += 1
+
+    def header(self) -> str:
+        """
+        Formats the stages as a Server-Timing header value, with the durations in
+        milliseconds, and the total time since the collector was started.
+        """
+        metrics: list[str] = [
+            f'{stage};dur={duration * 1000:.1f};desc="{count}x"'
+            for stage, (duration, count) in self.stages.items()
+        ]
+        metrics.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+
+        return ", ".join(metrics)
+
+
+def start_timing() -> TimingCollector:
+    """
+    Starts timing the stages of the current request.
+    """
+    collector = TimingCollector()
+    _collector.set(collector)
+    return collector
+
+
+def clear_timing() -> None:
+    """
+    Stops timing the stages in the current context. The requests on a keep-alive
+    connection are handled one after another in the same task, and so share a context;
+    this is called for every request that is not timed, so that it is not counted in
+    the collector of an earlier one.
+    """
+    _collector.set(None)
+
+
+@contextmanager
+def timed(stage: str):
+    collector: Optional[TimingCollector] = _collector.get()
+    start: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration: float = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=stage)
+        if collector is not None:
+            collector.add(stage, duration)
+
+
+def timed_function(stage: str) -> Callable:
+    """
+    A decorator that times every call of a function, or a coroutine function, as a stage.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
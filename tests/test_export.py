@@ -0,0 +1,26 @@
+from linked_data.export import id_request
+
+FQ: list = ["type:source", "!project_s:[* TO *]"]
+
+
+def test_id_request_partitions_by_id_hash():
+    request: dict = id_request(FQ, 2, 4)
+
+    assert request["filter"] == [*FQ, "{!hash workers=4 worker=2}"]
+    assert request["params"] == {"partitionKeys": "id"}
+    assert request["sort"] == "id asc"
+    assert request["fields"] == ["id"]
+
+
+def test_id_request_single_partition_has_no_hash_filter():
+    request: dict = id_request(FQ, 0, 1)
+
+    assert request["filter"] == FQ
+    assert "params" not in request
+
+
+def test_id_request_does_not_modify_filters():
+    fq: list = list(FQ)
+    id_request(fq, 1, 3)
+
+    assert fq == FQ
@@ -0,0 +1,33 @@
+import re
+
+from search_server.routes import blueprints
+from search_server.server import app
+from shared_helpers.serializer_context import (
+    SerializerContext,
+    url_templates_from_blueprints,
+)
+
+
+def test_serializer_context_matches_url_for():
+    templates: dict = url_templates_from_blueprints(blueprints)
+    ctx = SerializerContext("https://rism.online", {}, templates)
+
+    for viewname, template in templates.items():
+        params: dict = dict.fromkeys(re.findall(r"{(\w+)}", template), "1234")
+        expected: str = app.url_for(
+            viewname,
+            _external=True,
+            _scheme="https",
+            _server="rism.online",
+            **params,
+        )
+        assert ctx.identifier(viewname, **params) == expected
+
+
+def test_serializer_context_query_args():
+    ctx = SerializerContext(
+        "https://rism.online", {}, url_templates_from_blueprints(blueprints)
+    )
+    assert ctx.identifier("query.search", mode="sources") == (
+        "https://rism.online/search?mode=sources"
+    )
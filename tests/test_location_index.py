@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from search_server.helpers import location_index
+from search_server.helpers.location_index import (
+    CELL_DEGREES,
+    LocationIndex,
+    haversine_km,
+)
+
+
+def doc(docid: str, lat: float, lon: float) -> dict:
+    return {"id": docid, "location_loc": f"{lat},{lon}"}
+
+
+def ids(docs: list[dict]) -> list[str]:
+    return [d["id"] for d in docs]
+
+
+def test_haversine_km():
+    # One degree of longitude along the equator.
+    assert haversine_km(0, 0, 0, 1) == pytest.approx(111.195, abs=0.01)
+    assert haversine_km(0, 179.5, 0, -179.5) == pytest.approx(111.195, abs=0.01)
+
+
+def test_skips_documents_without_a_location():
+    index = LocationIndex(
+        [doc("a", 47.0, 8.0), {"id": "b"}, {"id": "c", "location_loc": "x,y"}], "1"
+    )
+
+    assert len(index) == 1
+
+
+def test_nearby_across_a_cell_boundary():
+    # On either side of the boundary between two cells, in both directions.
+    boundary: float = 47.0
+    index = LocationIndex(
+        [
+            doc("south", boundary - CELL_DEGREES / 100, 8.0),
+            doc("north", boundary + CELL_DEGREES / 100, 8.0),
+            doc("east", boundary, 8.0 + CELL_DEGREES / 100),
+            doc("west", boundary, 8.0 - CELL_DEGREES / 100),
+        ],
+        "1",
+    )
+
+    assert sorted(ids(index.nearby(boundary, 8.0, 1, 10))) == [
+        "east",
+        "north",
+        "south",
+        "west",
+    ]
+
+
+def test_nearby_across_the_antimeridian():
+    index = LocationIndex(
+        [doc("fiji", -17.0, 179.95), doc("samoa", -17.0, -179.95)], "1"
+    )
+
+    assert ids(index.nearby(-17.0, -179.99, 20, 10)) == ["samoa", "fiji"]
+    assert ids(index.nearby(-17.0, 179.99, 20, 10)) == ["fiji", "samoa"]
+
+
+def test_nearby_near_a_pole():
+    index = LocationIndex([doc("a", 89.95, 0.0), doc("b", 89.95, 180.0)], "1")
+
+    assert sorted(ids(index.nearby(89.99, 90.0, 20, 10))) == ["a", "b"]
+
+
+def test_nearby_distance_cap():
+    # About 5.6 and 11.1 kilometres north of the point.
+    index = LocationIndex(
+        [doc("near", 47.05, 8.0), doc("far", 47.1, 8.0), doc("here", 47.0, 8.0)], "1"
+    )
+
+    assert ids(index.nearby(47.0, 8.0, 10, 10)) == ["here", "near"]
+    assert ids(index.nearby(47.0, 8.0, 11.2, 10)) == ["here", "near", "far"]
+    assert ids(index.nearby(47.0, 8.0, 5.5, 10)) == ["here"]
+
+
+def test_nearby_limit_and_exclude():
+    index = LocationIndex(
+        [doc("here", 47.0, 8.0), doc("near", 47.01, 8.0), doc("far", 47.02, 8.0)], "1"
+    )
+
+    assert ids(index.nearby(47.0, 8.0, 10, 2)) == ["here", "near"]
+    assert ids(index.nearby(47.0, 8.0, 10, 2, exclude_id="here")) == ["near", "far"]
+
+
+def test_retries_a_failed_first_build(monkeypatch):
+    attempts: list = []
+    built = object()
+
+    async def flaky_build():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("Solr is down")
+        return built
+
+    monkeypatch.setattr(location_index, "build_location_index", flaky_build)
+    monkeypatch.setattr(location_index, "BUILD_RETRY_SECONDS", 0)
+    app = SimpleNamespace(ctx=SimpleNamespace(location_index_building=True))
+
+    asyncio.run(location_index.refresh_location_index(app))
+
+    assert len(attempts) == 2
+    assert app.ctx.location_index is built
+    assert app.ctx.location_index_building is False
@@ -0,0 +1,79 @@
+import pytest
+
+from search_server.helpers.location_tiles import (
+    CLUSTER_MAX_ZOOM,
+    MAX_ZOOM,
+    ClusterTiles,
+    project,
+    tile_for,
+    unproject,
+)
+
+# Two institutions in Bern, about two kilometres apart, and one in Vienna.
+LATS: list = [46.9480, 46.9600, 48.2082]
+LONS: list = [7.4474, 7.4300, 16.3738]
+
+
+def all_clusters(tiles: ClusterTiles, zoom: int) -> list:
+    return [c for clusters in tiles.levels[zoom].values() for c in clusters]
+
+
+def test_project_round_trip():
+    x, y = project(46.948, 7.4474)
+    lat, lon = unproject(x, y)
+
+    assert lat == pytest.approx(46.948)
+    assert lon == pytest.approx(7.4474)
+    assert project(0, 0) == (0.5, 0.5)
+
+
+def test_tile_for_clamps_to_the_world():
+    assert tile_for(0.5, 0.5, 1) == (1, 1)
+    assert tile_for(1.0, 1.0, 2) == (3, 3)
+    assert tile_for(-0.1, 0.0, 2) == (0, 0)
+
+
+def test_clusters_keep_the_count_at_every_zoom():
+    tiles = ClusterTiles(LATS, LONS)
+
+    assert len(tiles.levels) == CLUSTER_MAX_ZOOM + 1
+    for zoom in range(CLUSTER_MAX_ZOOM + 1):
+        assert sum(c.count for c in all_clusters(tiles, zoom)) == len(LATS)
+
+
+def test_close_points_are_clustered_at_low_zoom():
+    tiles = ClusterTiles(LATS, LONS)
+    clusters: list = sorted(all_clusters(tiles, 4), key=lambda c: c.count)
+
+    assert [c.count for c in clusters] == [1, 2]
+    single, bern = clusters
+    assert single.doc_idx == 2
+    assert bern.doc_idx is None
+
+    # A cluster is placed at the centre of the points in it.
+    lat, lon = unproject(bern.x, bern.y)
+    assert lat == pytest.approx((LATS[0] + LATS[1]) / 2, abs=0.01)
+    assert lon == pytest.approx((LONS[0] + LONS[1]) / 2, abs=0.01)
+
+
+def test_points_are_separate_at_high_zoom():
+    tiles = ClusterTiles(LATS, LONS)
+    clusters: list = all_clusters(tiles, CLUSTER_MAX_ZOOM)
+
+    assert sorted(c.doc_idx for c in clusters) == [0, 1, 2]
+
+
+def test_tile_above_the_clustered_levels():
+    tiles = ClusterTiles(LATS, LONS)
+    x, y = tile_for(*project(LATS[0], LONS[0]), MAX_ZOOM)
+
+    assert [c.doc_idx for c in tiles.tile(MAX_ZOOM, x, y)] == [0]
+    assert tiles.tile(MAX_ZOOM, x + 1, y) == []
+
+
+def test_tile_lookup():
+    tiles = ClusterTiles(LATS, LONS)
+    x, y = tile_for(*project(LATS[2], LONS[2]), 6)
+
+    assert [c.doc_idx for c in tiles.tile(6, x, y)] == [2]
+    assert sum(c.count for c in tiles.tile(0, 0, 0)) == len(LATS)
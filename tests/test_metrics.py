@@ -0,0 +1,105 @@
+from shared_helpers.metrics import Histogram, merge_snapshots, render
+
+BUCKETS: tuple = (0.1, 1.0)
+
+
+def histogram_snapshot(name: str, values: list) -> dict:
+    return {
+        name: {
+            "type": "histogram",
+            "help": "Test durations.",
+            "labelnames": ["route"],
+            "values": values,
+            "buckets": list(BUCKETS),
+        }
+    }
+
+
+def test_observe_counts_each_value_in_one_bucket():
+    histogram = Histogram(
+        "test_observe_seconds", "Test durations.", ("route",), BUCKETS
+    )
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value, route="search")
+
+    # An observation on a bucket's upper bound is counted in that bucket.
+    assert histogram.values[("search",)] == [2, 1, 1, 5.65, 4]
+
+
+def test_observe_keeps_labels_apart():
+    histogram = Histogram("test_labels_seconds", "Test durations.", ("route",), BUCKETS)
+    histogram.observe(0.5, route="search")
+    histogram.observe(0.5, route="record")
+
+    assert histogram.values[("search",)] == [0, 1, 0, 0.5, 1]
+    assert histogram.values[("record",)] == [0, 1, 0, 0.5, 1]
+
+
+def test_merge_snapshots_sums_counters_and_buckets():
+    counter_a: dict = {
+        "mp_requests": {
+            "type": "counter",
+            "help": "Requests.",
+            "labelnames": [],
+            "values": [[[], 3]],
+        }
+    }
+    counter_b: dict = {"mp_requests": {**counter_a["mp_requests"], "values": [[[], 4]]}}
+    histogram_a: dict = histogram_snapshot(
+        "mp_duration", [[["search"], [1, 0, 0, 0.05, 1]]]
+    )
+    histogram_b: dict = histogram_snapshot(
+        "mp_duration",
+        [[["search"], [0, 1, 1, 2.5, 2]], [["record"], [1, 0, 0, 0.01, 1]]],
+    )
+
+    merged: dict = merge_snapshots(
+        [{**counter_a, **histogram_a}, {**counter_b, **histogram_b}]
+    )
+
+    assert merged["mp_requests"]["values"] == [[[], 7]]
+    assert merged["mp_duration"]["values"] == [
+        [["search"], [1, 1, 1, 2.55, 3]],
+        [["record"], [1, 0, 0, 0.01, 1]],
+    ]
+
+
+def test_merge_snapshots_does_not_modify_the_snapshots():
+    snapshot: dict = histogram_snapshot(
+        "mp_duration", [[["search"], [1, 0, 0, 0.05, 1]]]
+    )
+
+    merge_snapshots([snapshot, snapshot])
+
+    assert snapshot["mp_duration"]["values"] == [[["search"], [1, 0, 0, 0.05, 1]]]
+
+
+def test_render_histogram_buckets_are_cumulative():
+    rendered: str = render(
+        histogram_snapshot("mp_duration", [[["search"], [2, 1, 1, 5.65, 4]]])
+    )
+
+    assert rendered.splitlines() == [
+        "# HELP mp_duration Test durations.",
+        "# TYPE mp_duration histogram",
+        'mp_duration_bucket{route="search",le="0.1"} 2',
+        'mp_duration_bucket{route="search",le="1.0"} 3',
+        'mp_duration_bucket{route="search",le="+Inf"} 4',
+        'mp_duration_sum{route="search"} 5.65',
+        'mp_duration_count{route="search"} 4',
+    ]
+
+
+def test_render_escapes_label_values():
+    rendered: str = render(
+        {
+            "mp_cache_size": {
+                "type": "gauge",
+                "help": "Cache size.",
+                "labelnames": ["cache"],
+                "values": [[['say "hi"\\'], 2]],
+            }
+        }
+    )
+
+    assert 'mp_cache_size{cache="say \\"hi\\"\\\\"} 2' in rendered.splitlines()
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+from search_server.helpers import sigla_index
+from search_server.helpers.sigla_index import SiglaIndex, fold
+
+DOCS: list = [
+    {
+        "id": "institution_1",
+        "siglum_s": "D-Mbs",
+        "total_sources_i": 50,
+        "has_siglum_b": True,
+    },
+    {
+        "id": "institution_2",
+        "siglum_s": "D-Mh",
+        "total_sources_i": 5,
+        "has_siglum_b": True,
+    },
+    {
+        "id": "institution_3",
+        "siglum_s": "D-B",
+        "total_sources_i": 500,
+        "has_siglum_b": True,
+    },
+    {
+        "id": "institution_4",
+        "siglum_s": "PL-Kó",
+        "total_sources_i": 10,
+        "has_siglum_b": True,
+    },
+    {
+        "id": "institution_5",
+        "siglum_s": "D-Mu",
+        "total_sources_i": 80,
+        "has_siglum_b": False,
+    },
+    {
+        "id": "institution_6",
+        "siglum_s": "D-Ma",
+        "total_sources_i": 90,
+        "has_siglum_b": True,
+        "project_s": "diamm",
+    },
+]
+
+
+def sigla(docs: list[dict]) -> list[str]:
+    return [d["siglum_s"] for d in docs]
+
+
+def test_fold():
+    assert fold("PL-Kó") == "pl-ko"
+    assert fold("D-Mbs") == "d-mbs"
+
+
+def test_institution_for_siglum():
+    index = SiglaIndex(DOCS, "1")
+
+    assert index.institution_for_siglum("D-Mbs") == "institution_1"
+    # Institutions that cannot be searched are still redirected to.
+    assert index.institution_for_siglum("D-Mu") == "institution_5"
+    assert index.institution_for_siglum("D-MBS") is None
+    assert len(index) == len(DOCS)
+
+
+def test_duplicate_siglum_keeps_the_first():
+    index = SiglaIndex(
+        [*DOCS, {"id": "institution_7", "siglum_s": "D-B", "has_siglum_b": True}], "1"
+    )
+
+    assert index.institution_for_siglum("D-B") == "institution_3"
+
+
+def test_search_ranks_by_sources():
+    index = SiglaIndex(DOCS, "1")
+    results = index.search("D-", 0, 20)
+
+    # The institutions without a siglum flag, or from a project, are left out.
+    assert sigla(results.docs) == ["D-B", "D-Mbs", "D-Mh"]
+    assert results.hits == 3
+    assert results.raw_response == {}
+
+
+def test_search_is_a_prefix_match_ignoring_case_and_accents():
+    index = SiglaIndex(DOCS, "1")
+
+    assert sigla(index.search("d-m", 0, 20).docs) == ["D-Mbs", "D-Mh"]
+    assert sigla(index.search("pl-ko", 0, 20).docs) == ["PL-Kó"]
+    assert index.search("Mbs", 0, 20).hits == 0
+
+
+def test_search_pages():
+    index = SiglaIndex(DOCS, "1")
+    results = index.search("D", 1, 1)
+
+    assert sigla(results.docs) == ["D-Mbs"]
+    assert results.hits == 3
+
+
+def test_retries_a_failed_first_build(monkeypatch):
+    attempts: list = []
+    built = object()
+
+    async def flaky_build():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("Solr is down")
+        return built
+
+    monkeypatch.setattr(sigla_index, "build_sigla_index", flaky_build)
+    monkeypatch.setattr(sigla_index, "BUILD_RETRY_SECONDS", 0)
+    app = SimpleNamespace(ctx=SimpleNamespace(sigla_index_building=True))
+
+    asyncio.run(sigla_index.refresh_sigla_index(app))
+
+    assert len(attempts) == 2
+    assert app.ctx.sigla_index is built
+    assert app.ctx.sigla_index_building is False
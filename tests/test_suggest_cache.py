@@ -0,0 +1,68 @@
+from search_server.helpers.suggest_cache import SuggestCache
+
+
+def terms_response(field: str, *terms: tuple[str, int]) -> dict:
+    flat: list = []
+    for term, count in terms:
+        flat.extend((term, count))
+    return {"terms": {field: flat}}
+
+
+def test_narrows_a_complete_shorter_prefix():
+    cache = SuggestCache(100, 60)
+    cache.store(
+        "composer",
+        "mo",
+        terms_response("name_s", ("Mozart", 10), ("Monteverdi", 5), ("mozarteum", 2)),
+        10,
+    )
+
+    narrowed = cache.get(("composer", "moz"))
+
+    assert narrowed == terms_response("name_s", ("Mozart", 10), ("mozarteum", 2))
+    assert cache.narrowed == 1
+    assert cache.misses == 0
+
+
+def test_narrowed_suggestions_are_cached():
+    cache = SuggestCache(100, 60)
+    cache.store("composer", "m", terms_response("name_s", ("Mozart", 10)), 10)
+
+    cache.get(("composer", "moza"))
+    # A longer query is narrowed from the longest cached prefix.
+    assert cache.get(("composer", "mozar")) == terms_response("name_s", ("Mozart", 10))
+    assert cache.get(("composer", "moza")) == terms_response("name_s", ("Mozart", 10))
+    assert cache.hits == 1
+    assert cache.narrowed == 2
+
+
+def test_truncated_prefix_is_not_narrowed():
+    cache = SuggestCache(100, 60)
+    # As many terms as were asked for, so there may be others matching "moz".
+    cache.store(
+        "composer",
+        "mo",
+        terms_response("name_s", ("Monteverdi", 10), ("Morales", 5)),
+        2,
+    )
+
+    assert cache.get(("composer", "moz")) is None
+    assert cache.narrowed == 0
+    assert cache.misses == 1
+
+
+def test_any_truncated_field_makes_the_prefix_incomplete():
+    cache = SuggestCache(100, 60)
+    solr_res: dict = {
+        "terms": {"name_s": ["Mozart", 10], "variant_names_sm": ["Mo", 3, "Moz", 1]}
+    }
+    cache.store("composer", "mo", solr_res, 2)
+
+    assert cache.get(("composer", "moz")) is None
+
+
+def test_aliases_are_kept_apart():
+    cache = SuggestCache(100, 60)
+    cache.store("composer", "mo", terms_response("name_s", ("Mozart", 10)), 10)
+
+    assert cache.get(("place", "moz")) is None
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+from search_server.helpers import suggest_index
+from search_server.helpers.suggest_index import FieldTerms, SuggestIndex
+
+BUCKETS: list = [
+    {"val": "Mozart, Wolfgang Amadeus", "count": 50},
+    {"val": "Monteverdi, Claudio", "count": 20},
+    {"val": "mozart, leopold", "count": 30},
+    {"val": "Morales, Cristóbal de", "count": 5},
+    {"val": "Bach, Johann Sebastian", "count": 60},
+    {"val": "M", "count": 1},
+    {"val": "Straße", "count": 4},
+]
+
+
+def test_top_precomputed_prefix():
+    terms = FieldTerms(BUCKETS, 3)
+
+    assert "m" in terms.top_by_prefix
+    assert "mo" in terms.top_by_prefix
+    assert terms.top("M", 3) == [
+        ("Mozart, Wolfgang Amadeus", 50),
+        ("mozart, leopold", 30),
+        ("Monteverdi, Claudio", 20),
+    ]
+    assert terms.top("mo", 2) == [
+        ("Mozart, Wolfgang Amadeus", 50),
+        ("mozart, leopold", 30),
+    ]
+
+
+def test_top_matches_a_scan():
+    terms = FieldTerms(BUCKETS, 2)
+
+    # A longer prefix, and a limit larger than the precomputed lists, are scanned.
+    assert terms.top("MOZ", 5) == [
+        ("Mozart, Wolfgang Amadeus", 50),
+        ("mozart, leopold", 30),
+    ]
+    assert terms.top("m", 5) == [
+        ("Mozart, Wolfgang Amadeus", 50),
+        ("mozart, leopold", 30),
+        ("Monteverdi, Claudio", 20),
+        ("Morales, Cristóbal de", 5),
+        ("M", 1),
+    ]
+
+
+def test_top_no_matches():
+    terms = FieldTerms(BUCKETS, 3)
+
+    assert terms.top("x", 3) == []
+    assert terms.top("mozz", 3) == []
+    assert terms.top("zzz", 3) == []
+
+
+def test_top_case_folding():
+    terms = FieldTerms(BUCKETS, 3)
+
+    assert terms.top("STRASS", 3) == [("Straße", 4)]
+    assert terms.top("st", 3) == [("Straße", 4)]
+
+
+def test_term_suggest_response():
+    index = SuggestIndex({"name_s": FieldTerms(BUCKETS, 3)}, "1", 3)
+
+    assert index.has_fields(["name_s"])
+    assert not index.has_fields(["name_s", "place_s"])
+    assert index.term_suggest("ba", ["name_s"], 3) == {
+        "terms": {"name_s": ["Bach, Johann Sebastian", 60]}
+    }
+
+
+def test_retries_a_failed_first_build(monkeypatch):
+    attempts: list = []
+    built = object()
+
+    async def flaky_build(fields, top_size):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("Solr is down")
+        return built
+
+    monkeypatch.setattr(suggest_index, "build_suggest_index", flaky_build)
+    monkeypatch.setattr(suggest_index, "BUILD_RETRY_SECONDS", 0)
+    app = SimpleNamespace(ctx=SimpleNamespace(suggest_index_building=True))
+
+    asyncio.run(suggest_index.refresh_suggest_index(app, ["name_s"], 10))
+
+    assert len(attempts) == 2
+    assert app.ctx.suggest_index is built
+    assert app.ctx.suggest_index_building is False